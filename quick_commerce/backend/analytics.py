@@ -0,0 +1,69 @@
+"""
+Sales and operations rollups.
+
+``sales_rollup_hourly`` and ``sales_rollup_daily`` hold orders, cancellations,
+deliveries, summed delivery minutes and revenue per local hour or day
+(``config.LOCAL_UTC_OFFSET_MINUTES``) and delivery city;
+``medicine_sales_daily`` holds units and revenue per medicine per day. A
+background task folds in orders created or updated since the last run's
+watermark every ``ANALYTICS_ROLLUP_SECONDS`` (``crud.apply_order_rollups``)
+so ``GET /analytics/summary`` never scans ``orders`` or ``order_items``.
+
+    python -m backend.analytics rollup     # fold in changed orders now
+    python -m backend.analytics rebuild    # recompute every rollup from orders
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from starlette.concurrency import run_in_threadpool
+
+from . import config, crud
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ROLLUP_SECONDS = 60
+ANALYTICS_SUMMARY_MAX_DAYS = 90
+
+def rollup() -> dict:
+    db = SessionLocal()
+    try:
+        return crud.apply_order_rollups(db)
+    finally:
+        db.close()
+
+async def run_rollup_aggregator():
+    while True:
+        try:
+            result = await run_in_threadpool(rollup)
+            if result["changed"]:
+                logger.info("Rolled up %d changed orders (%d read)", result["changed"], result["processed"])
+        except Exception:
+            logger.exception("Analytics rollup failed")
+        await asyncio.sleep(ANALYTICS_ROLLUP_SECONDS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.analytics", description="Analytics rollup tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rollup", help="fold orders changed since the watermark into the rollups")
+    commands.add_parser("rebuild", help="drop the rollups and recompute them from every order")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        db = SessionLocal()
+        try:
+            crud.reset_order_rollups(db)
+        finally:
+            db.close()
+        hours, minutes = divmod(abs(config.LOCAL_UTC_OFFSET_MINUTES), 60)
+        sign = "-" if config.LOCAL_UTC_OFFSET_MINUTES < 0 else "+"
+        print(f"Rebuilding rollups in local time (UTC{sign}{hours:02d}:{minutes:02d})")
+    result = rollup()
+    print(f"Read {result['processed']} orders, {result['changed']} changed; watermark {result['watermark']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Long-poll wake-ups for delivery partner work lists.
+
+``GET /delivery/assignments?wait=N`` holds a request whose If-None-Match still
+matches the partner's work list until that list may have changed. Assignments
+and status transitions published through ``events`` wake the waiting partners
+in this process at once; changes made by other worker processes are picked up
+by re-reading the list every ``ASSIGNMENT_RECHECK_SECONDS``.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+from . import events
+
+ASSIGNMENT_WAIT_MAX_SECONDS = 30
+ASSIGNMENT_RECHECK_SECONDS = 5
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class AssignmentWaiters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[int, Set[asyncio.Future]] = defaultdict(set)
+
+    def subscribe(self, partner_id: int) -> asyncio.Future:
+        # Subscribe before reading the work list so a change committed in
+        # between still wakes the waiter
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiters[partner_id].add(future)
+        return future
+
+    def unsubscribe(self, partner_id: int, future: asyncio.Future):
+        with self._lock:
+            waiters = self._waiters.get(partner_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[partner_id]
+
+    def notify(self, partner_ids: Iterable[int]):
+        # Called from writer threads; futures are resolved on their own loop
+        with self._lock:
+            futures = [future for partner_id in set(partner_ids) for future in self._waiters.pop(partner_id, ())]
+        for future in futures:
+            future.get_loop().call_soon_threadsafe(_wake, future)
+
+waiters = AssignmentWaiters()
+
+async def wait(future: asyncio.Future, timeout: float) -> bool:
+    """True if woken by a change, False on timeout."""
+    try:
+        await asyncio.wait_for(asyncio.shield(future), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+@events.on_order_assignments
+def _wake_on_assignment(assignments):
+    waiters.notify(
+        partner_id for assignment in assignments
+        for partner_id in (assignment.delivery_partner_id, assignment.previous_partner_id)
+        if partner_id is not None
+    )
+
+@events.on_order_transitions
+def _wake_on_transition(transitions):
+    waiters.notify(
+        transition.delivery_partner_id for transition in transitions if transition.delivery_partner_id is not None
+    )
@@ -0,0 +1,262 @@
+"""
+In-process caches for hot read paths.
+
+Entries are per worker process, so every cache here is either keyed on
+versions the writers bump in the database, expires on a short TTL, or is
+invalidated explicitly by the CRUD writers that change its inputs.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import FrozenSet, Iterable, NamedTuple, Optional
+
+# Cart summaries: keyed on the user's cart version and the catalog version,
+# which every writer bumps in its transaction, so an entry is never served
+# after a cart or price change made through any worker. The TTL only bounds
+# how long idle carts stay in memory.
+CART_SUMMARY_TTL_SECONDS = 300
+
+_cart_summaries = {}
+_cart_lock = threading.Lock()
+
+def get_cart_summary(user_id: int, key: tuple):
+    with _cart_lock:
+        entry = _cart_summaries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, entry_key, summary = entry
+        if entry_key != key or expires_at < time.monotonic():
+            del _cart_summaries[user_id]
+            return None
+    return summary
+
+def set_cart_summary(user_id: int, key: tuple, summary: dict):
+    with _cart_lock:
+        _cart_summaries[user_id] = (time.monotonic() + CART_SUMMARY_TTL_SECONDS, key, summary)
+
+# Catalog change events
+class CatalogChange(NamedTuple):
+    medicine_ids: Optional[FrozenSet[int]]  # None: any medicine may have changed
+    category_ids: FrozenSet[int]
+
+_catalog_listeners = []
+
+def on_catalog_change(listener):
+    """Register ``listener(change)`` to be called with a ``CatalogChange``."""
+    _catalog_listeners.append(listener)
+    return listener
+
+def publish_catalog_change(medicine_ids=None, category_ids=()):
+    change = CatalogChange(
+        None if medicine_ids is None else frozenset(medicine_ids),
+        frozenset(category_ids)
+    )
+    for listener in _catalog_listeners:
+        listener(change)
+
+# Catalog response cache
+CATALOG_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CATALOG_CACHE_SIGNAL_PATH = "catalog_cache.signal"
+# The signal log is replaced by a single clear-everything record once it
+# grows past this size, so it stays small without coordination
+CATALOG_CACHE_SIGNAL_MAX_BYTES = 1024 * 1024
+CLEAR_ALL_TAG = "*"
+
+class CatalogCache:
+    """LRU of pre-serialized JSON response bodies, bounded by total bytes.
+
+    Entries carry tags (``medicine:<id>``, ``category:<id>``, ``medicines``,
+    ``categories``) so writers can drop exactly the responses they affect.
+    Other worker processes learn about writes through a shared, append-only
+    signal log: every invalidation appends one line naming its writer and the
+    tags it dropped, and a worker that sees new lines from other writers
+    evicts the same tags before serving the next read. A ``*`` line, or a
+    log that was replaced, clears the whole cache.
+    """
+
+    def __init__(self, max_bytes: int = CATALOG_CACHE_MAX_BYTES, signal_path: str = CATALOG_CACHE_SIGNAL_PATH):
+        self.max_bytes = max_bytes
+        self.signal_path = signal_path
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_used = 0
+        self._entries = OrderedDict()  # key -> (body, tags)
+        self._keys_by_tag = defaultdict(set)
+        self._lock = threading.RLock()
+        self._seen_signal = self._read_signal()  # (inode, bytes consumed)
+        self.catalog_state = None  # (version, updated_at) from catalog_state
+
+    def get_catalog_state(self):
+        self._sync()
+        return self.catalog_state
+
+    def get(self, key) -> Optional[bytes]:
+        self._sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, body: bytes, tags: Iterable[str], generation: int):
+        # Responses built before an invalidation must not be stored after it
+        with self._lock:
+            if generation != self.generation or len(body) > self.max_bytes:
+                return
+            self._discard(key)
+            tags = frozenset(tags)
+            self._entries[key] = (body, tags)
+            self.bytes_used += len(body)
+            for tag in tags:
+                self._keys_by_tag[tag].add(key)
+            while self.bytes_used > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def set_catalog_state(self, state, generation: int):
+        with self._lock:
+            if generation == self.generation:
+                self.catalog_state = state
+
+    def invalidate(self, tags: Iterable[str], signal: bool = True):
+        tags = frozenset(tags)
+        with self._lock:
+            self.generation += 1
+            self.catalog_state = None
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._discard(key)
+        if signal:
+            self._write_signal(tags)
+
+    def clear(self, signal: bool = True):
+        with self._lock:
+            self.generation += 1
+            self.catalog_state = None
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self.bytes_used = 0
+        if signal:
+            self._write_signal({CLEAR_ALL_TAG})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "generation": self.generation
+        }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        body, tags = entry
+        self.bytes_used -= len(body)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    @property
+    def _writer_id(self) -> str:
+        # The pid is read on every write so forked workers get their own id
+        return f"{os.getpid()}.{id(self):x}"
+
+    def _read_signal(self):
+        try:
+            stat = os.stat(self.signal_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size)
+
+    def _write_signal(self, tags):
+        # O_APPEND writes of a single line do not interleave between processes
+        line = f"{self._writer_id} {' '.join(sorted(tags))}\n".encode()
+        try:
+            fd = os.open(self.signal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > CATALOG_CACHE_SIGNAL_MAX_BYTES:
+                self._rotate_signal()
+        except OSError:
+            return
+
+    def _rotate_signal(self):
+        # Lines appended to the old file by a concurrent writer are covered by
+        # the clear-everything record that starts the new one
+        line = f"{self._writer_id} {CLEAR_ALL_TAG}\n".encode()
+        temp_path = f"{self.signal_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as signal:
+            signal.write(line)
+        os.replace(temp_path, self.signal_path)
+        with self._lock:
+            self._seen_signal = (os.stat(self.signal_path).st_ino, len(line))
+
+    def _sync(self):
+        # One stat per read; the file is only opened when it has grown
+        current = self._read_signal()
+        if current == self._seen_signal:
+            return
+        with self._lock:
+            seen = self._seen_signal
+            if current is None:
+                self._seen_signal = None
+                return
+            inode, size = current
+            replaced = seen is None or seen[0] != inode or size < seen[1]
+            offset = 0 if replaced else seen[1]
+            try:
+                with open(self.signal_path, "rb") as signal:
+                    signal.seek(offset)
+                    data = signal.read(size - offset)
+            except OSError:
+                data, replaced = b"", True
+            # A line still being written is picked up by the next read
+            complete = data[:data.rfind(b"\n") + 1]
+            self._seen_signal = (inode, offset + len(complete))
+
+            clear_all = replaced
+            tags = set()
+            writer_id = self._writer_id
+            for line in complete.decode("utf-8", "replace").splitlines():
+                writer, _, line_tags = line.partition(" ")
+                if writer == writer_id:
+                    continue
+                line_tags = line_tags.split()
+                if CLEAR_ALL_TAG in line_tags:
+                    clear_all = True
+                    break
+                tags.update(line_tags)
+            if clear_all:
+                self.clear(signal=False)
+            elif tags:
+                self.invalidate(tags, signal=False)
+
+catalog_cache = CatalogCache()
+
+@on_catalog_change
+def _invalidate_catalog_responses(change: CatalogChange):
+    if change.medicine_ids is None:
+        catalog_cache.clear()
+        return
+    tags = {f"medicine:{medicine_id}" for medicine_id in change.medicine_ids}
+    tags.update(f"category:{category_id}" for category_id in change.category_ids)
+    tags.add("medicines")
+    if change.category_ids:
+        tags.add("categories")
+    catalog_cache.invalidate(tags)
@@ -0,0 +1,10 @@
+"""
+Service-wide settings shared by modules that must agree on them.
+
+The service delivers in a single timezone. Dosing slots, reminder times and
+the hourly and daily analytics rollups are all local to
+``LOCAL_UTC_OFFSET_MINUTES``; changing it moves existing rollup boundaries,
+so run ``python -m backend.analytics rebuild`` afterwards.
+"""
+
+LOCAL_UTC_OFFSET_MINUTES = 330  # IST
@@ -1,10 +1,34 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, or_, func, case, insert, update, text, literal, bindparam, select, union_all
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-import uuid
-from . import models, schemas, auth
-from .models import UserRole, OrderStatus, DeliveryType
+from collections import defaultdict
+import json
+from . import models, schemas, auth, cache, config, events, ids, dosing
+from .models import UserRole, OrderStatus, DeliveryType, StockMovementReason, JobStatus
+
+CONFLICT_RETRY_ATTEMPTS = 3
+
+# Optimistic concurrency
+def check_version(obj, expected_version: Optional[int]):
+    # The ORM's version_id_col check only covers the window between load and
+    # flush; a version the client read earlier (If-Match) is checked here.
+    if expected_version is not None and obj.version != expected_version:
+        raise StaleDataError(
+            f"{type(obj).__name__} {obj.id} is at version {obj.version}, expected {expected_version}"
+        )
+
+def retry_on_conflict(db: Session, operation, *args, attempts: int = CONFLICT_RETRY_ATTEMPTS, **kwargs):
+    # For internal read-modify-write callers with no client-held version:
+    # each attempt starts from a rolled-back session and re-reads the rows.
+    for attempt in range(attempts):
+        try:
+            return operation(db, *args, **kwargs)
+        except StaleDataError:
+            db.rollback()
+            if attempt == attempts - 1:
+                raise
 
 # User CRUD operations
 def get_user_by_username(db: Session, username: str):
@@ -56,18 +80,71 @@ def verify_phone(db: Session, phone: str, verification_code: str):
             return user
     return None
 
+# Catalog version and change log
+def _chunks(items, size=500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def record_catalog_write(db: Session, medicine_ids=(), category_id: Optional[int] = None, deleted: bool = False):
+    # Called inside every catalog write transaction, before commit, so the
+    # catalog version (HTTP validators) and the change log (delta sync) move
+    # atomically with the data they describe. The log keeps only the latest
+    # entry per medicine, so it grows with the catalog, not with churn.
+    now = datetime.utcnow()
+    db.query(models.CatalogState).filter(models.CatalogState.id == 1).update(
+        {"version": models.CatalogState.version + 1, "updated_at": now},
+        synchronize_session=False
+    )
+    for chunk in _chunks(set(medicine_ids)):
+        db.query(models.CatalogChangeLog).filter(
+            models.CatalogChangeLog.medicine_id.in_(chunk)
+        ).delete(synchronize_session=False)
+        db.execute(insert(models.CatalogChangeLog), [
+            {"medicine_id": medicine_id, "deleted": deleted, "changed_at": now} for medicine_id in chunk
+        ])
+    if category_id is not None:
+        # Category edits change the category embedded in every medicine row
+        in_category = db.query(models.Medicine.id).filter(models.Medicine.category_id == category_id)
+        db.query(models.CatalogChangeLog).filter(
+            models.CatalogChangeLog.medicine_id.in_(in_category.scalar_subquery())
+        ).delete(synchronize_session=False)
+        db.execute(insert(models.CatalogChangeLog).from_select(
+            ["medicine_id", "deleted", "changed_at"],
+            db.query(models.Medicine.id, literal(False), literal(now)).filter(
+                models.Medicine.category_id == category_id
+            )
+        ))
+
+def get_catalog_state(db: Session):
+    state = cache.catalog_cache.get_catalog_state()
+    if state is None:
+        generation = cache.catalog_cache.generation
+        state = db.query(models.CatalogState.version, models.CatalogState.updated_at).filter(
+            models.CatalogState.id == 1
+        ).one()
+        state = (state.version, state.updated_at)
+        cache.catalog_cache.set_catalog_state(state, generation)
+    return state
+
 # Category CRUD operations
 def get_categories(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Category).offset(skip).limit(limit).all()
 
+def get_category_id_map(db: Session):
+    # Lower-cased category name -> id, for resolving names during imports
+    return {name.strip().lower(): category_id for category_id, name in db.query(models.Category.id, models.Category.name)}
+
 def get_category(db: Session, category_id: int):
     return db.query(models.Category).filter(models.Category.id == category_id).first()
 
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.dict())
     db.add(db_category)
+    record_catalog_write(db)
     db.commit()
     db.refresh(db_category)
+    cache.publish_catalog_change((), [db_category.id])
     return db_category
 
 def update_category(db: Session, category_id: int, category: schemas.CategoryUpdate):
@@ -75,26 +152,41 @@ def update_category(db: Session, category_id: int, category: schemas.CategoryUpd
     if db_category:
         for field, value in category.dict(exclude_unset=True).items():
             setattr(db_category, field, value)
+        # Medicine representations embed their category
+        db.execute(update(models.Medicine).where(models.Medicine.category_id == category_id).values(
+            version=models.Medicine.version + 1
+        ))
+        record_catalog_write(db, category_id=category_id)
         db.commit()
         db.refresh(db_category)
+        cache.publish_catalog_change((), [category_id])
     return db_category
 
 def delete_category(db: Session, category_id: int):
     db_category = get_category(db, category_id)
     if db_category:
         db.delete(db_category)
+        record_catalog_write(db, category_id=category_id)
         db.commit()
+        cache.publish_catalog_change((), [category_id])
     return db_category
 
 # Medicine CRUD operations
 def get_medicines(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Medicine).filter(models.Medicine.is_available == True).offset(skip).limit(limit).all()
+    return db.query(models.Medicine).options(joinedload(models.Medicine.category)).filter(
+        models.Medicine.is_available == True
+    ).order_by(models.Medicine.id).offset(skip).limit(limit).all()
 
 def get_medicine(db: Session, medicine_id: int):
     return db.query(models.Medicine).filter(models.Medicine.id == medicine_id).first()
 
-def search_medicines(db: Session, search_params: schemas.MedicineSearch):
-    query = db.query(models.Medicine).filter(models.Medicine.is_available == True)
+def get_medicine_state(db: Session, medicine_id: int):
+    return db.query(
+        models.Medicine.version, models.Medicine.created_at, models.Medicine.updated_at
+    ).filter(models.Medicine.id == medicine_id).first()
+
+def _apply_search_filters(query, search_params: schemas.MedicineSearch):
+    query = query.filter(models.Medicine.is_available == True)
     
     if search_params.q:
         query = query.filter(
@@ -117,51 +209,368 @@ def search_medicines(db: Session, search_params: schemas.MedicineSearch):
     if search_params.max_price:
         query = query.filter(models.Medicine.price <= search_params.max_price)
     
-    return query.all()
+    return query
+
+def search_medicines(db: Session, search_params: schemas.MedicineSearch):
+    return _apply_search_filters(
+        db.query(models.Medicine).options(joinedload(models.Medicine.category)), search_params
+    ).all()
+
+# Facet buckets shared by the SQL and in-memory facet paths
+PRICE_BUCKET_EDGES = (0, 50, 100, 250, 500, 1000)
+LOW_STOCK_THRESHOLD = 10
+
+def price_bucket(price: float) -> int:
+    for index, edge in enumerate(PRICE_BUCKET_EDGES[1:]):
+        if price < edge:
+            return index
+    return len(PRICE_BUCKET_EDGES) - 1
+
+def stock_bucket(stock: int) -> str:
+    if stock <= 0:
+        return "out_of_stock"
+    if stock <= LOW_STOCK_THRESHOLD:
+        return "low_stock"
+    return "in_stock"
+
+def get_medicine_facet_cells(db: Session, search_params: schemas.MedicineSearch):
+    # One grouped pass over the filtered set; the caller rolls the cells up
+    # into per-facet counts
+    price_bucket_expr = case(
+        *[(models.Medicine.price < edge, index) for index, edge in enumerate(PRICE_BUCKET_EDGES[1:])],
+        else_=len(PRICE_BUCKET_EDGES) - 1
+    )
+    stock_bucket_expr = case(
+        (models.Medicine.stock_quantity <= 0, "out_of_stock"),
+        (models.Medicine.stock_quantity <= LOW_STOCK_THRESHOLD, "low_stock"),
+        else_="in_stock"
+    )
+    query = db.query(
+        models.Medicine.category_id, models.Medicine.prescription_required,
+        stock_bucket_expr, price_bucket_expr, func.count(models.Medicine.id)
+    )
+    return _apply_search_filters(query, search_params).group_by(
+        models.Medicine.category_id, models.Medicine.prescription_required, stock_bucket_expr, price_bucket_expr
+    ).all()
+
+# Stock ledger: every stock change appends stock_movements rows in the same
+# transaction that updates the medicines.stock_quantity projection
+def log_stock_deltas(db: Session, deltas: dict, reason: StockMovementReason, reference: Optional[str] = None):
+    now = datetime.utcnow()
+    rows = [
+        {"medicine_id": medicine_id, "quantity": delta, "reason": reason, "reference": reference, "created_at": now}
+        for medicine_id, delta in deltas.items() if delta
+    ]
+    if rows:
+        db.execute(insert(models.StockMovement.__table__), rows)
+
+def log_stock_levels(db: Session, levels: dict, reason: StockMovementReason, reference: Optional[str] = None):
+    # For absolute writes: logs new level - current projection, computed in
+    # SQL, so it must run before the projection is overwritten
+    if not levels:
+        return
+    movements = models.StockMovement.__table__
+    stock = bindparam("stock", type_=models.Medicine.stock_quantity.type)
+    db.execute(insert(movements).from_select(
+        ["medicine_id", "quantity", "reason", "reference", "created_at"],
+        select(
+            models.Medicine.id, stock - models.Medicine.stock_quantity,
+            bindparam("reason", type_=movements.c.reason.type),
+            bindparam("reference", type_=movements.c.reference.type),
+            bindparam("now", type_=movements.c.created_at.type)
+        ).where(models.Medicine.id == bindparam("medicine_id"), models.Medicine.stock_quantity != stock)
+    ), [
+        {"medicine_id": medicine_id, "stock": level, "reason": reason, "reference": reference,
+         "now": datetime.utcnow()}
+        for medicine_id, level in levels.items()
+    ])
 
 def create_medicine(db: Session, medicine: schemas.MedicineCreate):
     db_medicine = models.Medicine(**medicine.dict())
     db.add(db_medicine)
+    db.flush()
+    log_stock_deltas(db, {db_medicine.id: db_medicine.stock_quantity}, StockMovementReason.RESTOCK)
+    retire_expired_medicines(db, [db_medicine.id])
+    record_catalog_write(db, [db_medicine.id])
     db.commit()
     db.refresh(db_medicine)
+    cache.publish_catalog_change([db_medicine.id])
     return db_medicine
 
-def update_medicine(db: Session, medicine_id: int, medicine: schemas.MedicineUpdate):
+def update_medicine(db: Session, medicine_id: int, medicine: schemas.MedicineUpdate,
+                    expected_version: Optional[int] = None):
     db_medicine = get_medicine(db, medicine_id)
     if db_medicine:
-        for field, value in medicine.dict(exclude_unset=True).items():
+        check_version(db_medicine, expected_version)
+        changes = medicine.dict(exclude_unset=True)
+        if changes.get("stock_quantity") is not None:
+            log_stock_levels(db, {medicine_id: changes["stock_quantity"]}, StockMovementReason.ADJUSTMENT)
+        for field, value in changes.items():
             setattr(db_medicine, field, value)
+        db.flush()
+        retire_expired_medicines(db, [medicine_id])
+        record_catalog_write(db, [medicine_id])
         db.commit()
         db.refresh(db_medicine)
+        cache.publish_catalog_change([medicine_id])
     return db_medicine
 
-def update_medicine_stock(db: Session, medicine_id: int, stock_update: schemas.StockUpdate):
+def update_medicine_stock(db: Session, medicine_id: int, stock_update: schemas.StockUpdate,
+                          expected_version: Optional[int] = None):
     db_medicine = get_medicine(db, medicine_id)
     if db_medicine:
+        check_version(db_medicine, expected_version)
+        log_stock_levels(db, {medicine_id: stock_update.stock_quantity}, StockMovementReason.ADJUSTMENT)
         db_medicine.stock_quantity = stock_update.stock_quantity
         db_medicine.is_available = stock_update.stock_quantity > 0
+        db.flush()
+        retire_expired_medicines(db, [medicine_id])
+        record_catalog_write(db, [medicine_id])
         db.commit()
         db.refresh(db_medicine)
+        cache.publish_catalog_change([medicine_id])
     return db_medicine
 
+def apply_stock_sync(db: Session, pending: dict):
+    # pending: medicine_id -> (absolute base or None, delta). Entries are staged
+    # in a temp table and applied with one UPDATE ... FROM; is_available is
+    # derived from the new stock exactly as in update_medicine_stock.
+    if not pending:
+        return {"applied": 0, "not_found": []}
+    db.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS stock_sync "
+        "(medicine_id INTEGER PRIMARY KEY, base INTEGER, delta INTEGER NOT NULL)"
+    ))
+    db.execute(text("DELETE FROM stock_sync"))
+    db.execute(
+        text("INSERT INTO stock_sync (medicine_id, base, delta) VALUES (:medicine_id, :base, :delta)"),
+        [{"medicine_id": medicine_id, "base": base, "delta": delta} for medicine_id, (base, delta) in pending.items()]
+    )
+    not_found = [row[0] for row in db.execute(text(
+        "SELECT s.medicine_id FROM stock_sync s LEFT JOIN medicines m ON m.id = s.medicine_id WHERE m.id IS NULL"
+    ))]
+    new_stock = "MAX(COALESCE(s.base, medicines.stock_quantity) + s.delta, 0)"
+    db.execute(text(f"""
+        INSERT INTO stock_movements (medicine_id, quantity, reason, reference, created_at)
+        SELECT medicines.id, {new_stock} - medicines.stock_quantity,
+            CASE WHEN s.base IS NULL AND s.delta > 0
+                THEN '{StockMovementReason.RESTOCK.name}' ELSE '{StockMovementReason.ADJUSTMENT.name}' END,
+            'stock sync', :now
+        FROM stock_sync s JOIN medicines ON medicines.id = s.medicine_id
+        WHERE {new_stock} != medicines.stock_quantity
+    """), {"now": datetime.utcnow()})
+    applied = db.execute(text(f"""
+        UPDATE medicines SET
+            stock_quantity = {new_stock},
+            is_available = {new_stock} > 0,
+            updated_at = CURRENT_TIMESTAMP,
+            version = medicines.version + 1
+        FROM stock_sync s WHERE s.medicine_id = medicines.id
+    """)).rowcount
+    db.execute(text("DELETE FROM stock_sync"))
+    changed = pending.keys() - set(not_found)
+    retire_expired_medicines(db, changed)
+    record_catalog_write(db, changed)
+    db.commit()
+    cache.publish_catalog_change(changed)
+    return {"applied": applied, "not_found": sorted(not_found)}
+
+def retire_expired_medicines(db: Session, medicine_ids=None, now: Optional[datetime] = None):
+    # Set-based flip of available-but-expired medicines to unavailable, so
+    # catalog reads never need a per-row date check. Writers pass the ids they
+    # just touched (a restock must not resurrect expired stock); the sweeper
+    # passes None. Remaining units are written off to the stock ledger.
+    # Returns the retired ids.
+    now = now or datetime.utcnow()
+    movements = models.StockMovement.__table__
+
+    def retire(*criteria):
+        criteria = (models.Medicine.is_available == True, models.Medicine.expiry_date <= now) + criteria
+        db.execute(insert(movements).from_select(
+            ["medicine_id", "quantity", "reason", "reference", "created_at"],
+            select(
+                models.Medicine.id, -models.Medicine.stock_quantity,
+                literal(StockMovementReason.EXPIRY, movements.c.reason.type),
+                literal("expired"), literal(now, movements.c.created_at.type)
+            ).where(models.Medicine.stock_quantity != 0, *criteria)
+        ))
+        return db.scalars(update(models.Medicine).where(*criteria).values(
+            is_available=False, stock_quantity=0, version=models.Medicine.version + 1
+        ).returning(models.Medicine.id)).all()
+
+    if medicine_ids is None:
+        return retire()
+    retired = []
+    for chunk in _chunks(medicine_ids):
+        retired.extend(retire(models.Medicine.id.in_(chunk)))
+    return retired
+
+def sweep_expired_medicines(db: Session, now: Optional[datetime] = None):
+    retired = retire_expired_medicines(db, now=now)
+    if retired:
+        record_catalog_write(db, retired)
+    db.commit()
+    if retired:
+        cache.publish_catalog_change(retired)
+    return retired
+
+def get_expiring_medicines(db: Session, within_days: int = 30, limit: int = 100):
+    # Available stock expiring within the window, soonest first
+    return db.query(models.Medicine).filter(
+        models.Medicine.is_available == True,
+        models.Medicine.expiry_date <= datetime.utcnow() + timedelta(days=within_days)
+    ).order_by(models.Medicine.expiry_date, models.Medicine.id).limit(limit).all()
+
 def delete_medicine(db: Session, medicine_id: int):
     db_medicine = get_medicine(db, medicine_id)
     if db_medicine:
         db.delete(db_medicine)
+        record_catalog_write(db, [medicine_id], deleted=True)
         db.commit()
+        cache.publish_catalog_change([medicine_id])
     return db_medicine
 
-def get_alternative_medicines(db: Session, medicine_id: int):
-    medicine = get_medicine(db, medicine_id)
-    if medicine:
-        return db.query(models.Medicine).filter(
-            and_(
-                models.Medicine.category_id == medicine.category_id,
-                models.Medicine.id != medicine_id,
-                models.Medicine.is_available == True
-            )
-        ).all()
-    return []
+def medicine_natural_key(name: str, strength: Optional[str], manufacturer: Optional[str]):
+    return (name.strip().lower(), (strength or "").strip().lower(), (manufacturer or "").strip().lower())
+
+def upsert_medicine_batch(db: Session, rows: List[dict]):
+    # Resolve natural keys to ids with one indexed query, then apply the batch
+    # as one executemany INSERT and one executemany UPDATE in a single commit.
+    # Updates carry the version read here, so a row changed in between fails
+    # the batch with StaleDataError instead of being overwritten.
+    names = {row["name"] for row in rows}
+    existing = {}
+    for medicine_id, version, name, strength, manufacturer in db.query(
+        models.Medicine.id, models.Medicine.version, models.Medicine.name, models.Medicine.strength,
+        models.Medicine.manufacturer
+    ).filter(models.Medicine.name.in_(names)):
+        existing[medicine_natural_key(name, strength, manufacturer)] = (medicine_id, version)
+
+    inserts, updates = [], []
+    for row in rows:
+        match = existing.get(medicine_natural_key(row["name"], row.get("strength"), row.get("manufacturer")))
+        if match:
+            updates.append({"id": match[0], "version": match[1], **row})
+        else:
+            inserts.append(row)
+
+    inserted_ids = []
+    if inserts:
+        inserted_ids = db.scalars(insert(models.Medicine).returning(models.Medicine.id), inserts).all()
+        log_stock_deltas(db, {
+            medicine_id: row.get("stock_quantity") or 0 for medicine_id, row in zip(inserted_ids, inserts)
+        }, StockMovementReason.RESTOCK, "catalog import")
+    if updates:
+        log_stock_levels(db, {
+            row["id"]: row["stock_quantity"] for row in updates if row.get("stock_quantity") is not None
+        }, StockMovementReason.ADJUSTMENT, "catalog import")
+        db.execute(update(models.Medicine), updates)
+    changed_ids = inserted_ids + [row["id"] for row in updates]
+    retire_expired_medicines(db, changed_ids)
+    record_catalog_write(db, changed_ids)
+    db.commit()
+    cache.publish_catalog_change(changed_ids)
+    return len(inserts), len(updates)
+
+def get_medicine_changes(db: Session, since: int = 0, limit: int = 500):
+    # One page of the change log after `since`, split into current rows for
+    # upserts and bare ids for deletions
+    entries = db.query(
+        models.CatalogChangeLog.seq, models.CatalogChangeLog.medicine_id, models.CatalogChangeLog.deleted
+    ).filter(models.CatalogChangeLog.seq > since).order_by(models.CatalogChangeLog.seq).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    upsert_ids = [entry.medicine_id for entry in entries if not entry.deleted]
+    upserts = []
+    if upsert_ids:
+        upserts = db.query(models.Medicine).options(joinedload(models.Medicine.category)).filter(
+            models.Medicine.id.in_(upsert_ids)
+        ).order_by(models.Medicine.id).all()
+    return {
+        "since": since,
+        "next_since": entries[-1].seq if entries else since,
+        "has_more": has_more,
+        "upserts": upserts,
+        "deleted": [entry.medicine_id for entry in entries if entry.deleted]
+    }
+
+def get_catalog_cursor(db: Session):
+    # (change-log high-water mark, catalog version); read before the rows it covers
+    seq = db.query(func.coalesce(func.max(models.CatalogChangeLog.seq), 0)).scalar()
+    version = db.query(models.CatalogState.version).filter(models.CatalogState.id == 1).scalar() or 0
+    return seq, version
+
+_SNAPSHOT_COLUMNS = (
+    models.Medicine.id, models.Medicine.name, models.Medicine.price, models.Medicine.stock_quantity,
+    models.Medicine.category_id, models.Medicine.prescription_required
+)
+
+_SUGGEST_COLUMNS = (
+    models.Medicine.id, models.Medicine.name, models.Medicine.generic_name, models.Medicine.strength
+)
+
+def iter_available_catalog_rows(db: Session, columns=_SNAPSHOT_COLUMNS):
+    yield from db.query(*columns).filter(
+        models.Medicine.is_available == True
+    ).order_by(models.Medicine.id).yield_per(10000)
+
+def iter_catalog_changes_since(db: Session, since: int, upto: int, columns=_SNAPSHOT_COLUMNS,
+                               available_only: bool = True):
+    # (medicine_id, current row) per changed medicine; row is None when the
+    # medicine was deleted or (with available_only) is no longer available.
+    # columns must start with Medicine.id.
+    query = db.query(models.CatalogChangeLog.medicine_id, models.Medicine.is_available, *columns).outerjoin(
+        models.Medicine, models.Medicine.id == models.CatalogChangeLog.medicine_id
+    ).filter(
+        models.CatalogChangeLog.seq > since, models.CatalogChangeLog.seq <= upto
+    ).order_by(models.CatalogChangeLog.seq)
+    for medicine_id, is_available, *row in query.yield_per(10000):
+        present = row[0] is not None and (is_available or not available_only)
+        yield medicine_id, tuple(row) if present else None
+
+def iter_suggest_rows(db: Session):
+    return iter_available_catalog_rows(db, _SUGGEST_COLUMNS)
+
+def iter_suggest_changes_since(db: Session, since: int, upto: int):
+    return iter_catalog_changes_since(db, since, upto, _SUGGEST_COLUMNS)
+
+_EQUIVALENCE_COLUMNS = (
+    models.Medicine.id, models.Medicine.generic_name, models.Medicine.strength, models.Medicine.dosage_form
+)
+
+# Every medicine has an equivalence key whatever its availability - an
+# unavailable one is exactly what alternatives are asked for. Stock and
+# availability are applied when the members are fetched.
+def iter_equivalence_rows(db: Session):
+    yield from db.query(*_EQUIVALENCE_COLUMNS).order_by(models.Medicine.id).yield_per(10000)
+
+def iter_equivalence_changes_since(db: Session, since: int, upto: int):
+    return iter_catalog_changes_since(db, since, upto, _EQUIVALENCE_COLUMNS, available_only=False)
+
+def get_medicine_popularity(db: Session):
+    # medicine_id -> units ordered
+    return dict(db.query(models.OrderItem.medicine_id, func.sum(models.OrderItem.quantity)).group_by(
+        models.OrderItem.medicine_id
+    ).all())
+
+def get_alternative_medicines(db: Session, medicine_id: int, equivalent_ids=None, skip: int = 0, limit: int = 20):
+    # Ranked in-stock first, then cheapest. Without equivalent_ids this falls
+    # back to the rest of the medicine's category.
+    if equivalent_ids:
+        query = db.query(models.Medicine).filter(models.Medicine.id.in_(equivalent_ids))
+    else:
+        category_id = db.query(models.Medicine.category_id).filter(models.Medicine.id == medicine_id).scalar()
+        if category_id is None:
+            return []
+        query = db.query(models.Medicine).filter(
+            models.Medicine.category_id == category_id,
+            models.Medicine.id != medicine_id
+        )
+    return query.options(joinedload(models.Medicine.category)).filter(
+        models.Medicine.is_available == True
+    ).order_by(
+        (models.Medicine.stock_quantity > 0).desc(), models.Medicine.price, models.Medicine.id
+    ).offset(skip).limit(limit).all()
 
 # Prescription CRUD operations
 def create_prescription(db: Session, user_id: int, prescription: schemas.PrescriptionCreate, image_url: str):
@@ -184,46 +593,236 @@ def get_prescription(db: Session, prescription_id: int):
 def verify_prescription(db: Session, prescription_id: int, verification: schemas.PrescriptionVerification, verified_by: int):
     db_prescription = get_prescription(db, prescription_id)
     if db_prescription:
+        was_verified = db_prescription.is_verified
         db_prescription.is_verified = verification.is_verified
         db_prescription.verified_by = verified_by
         db_prescription.verification_notes = verification.verification_notes
+        if verification.medicines is not None:
+            # The pharmacist's itemisation replaces any previous one
+            db.query(models.PrescriptionMedicine).filter(
+                models.PrescriptionMedicine.prescription_id == prescription_id
+            ).delete(synchronize_session=False)
+            db.add_all([
+                models.PrescriptionMedicine(prescription_id=prescription_id, **item.dict())
+                for item in verification.medicines
+            ])
+        if verification.medicines is not None or verification.is_verified != was_verified:
+            db.flush()
+            replace_reminder_schedules(db, db_prescription)
+        if verification.is_verified:
+            enqueue_job(db, "prescriptions.attach_to_cart", {"prescription_id": prescription_id})
         db.commit()
         db.refresh(db_prescription)
+        events.publish_prescription_verifications([events.PrescriptionVerification(
+            prescription_id, db_prescription.user_id, db_prescription.is_verified, datetime.utcnow()
+        )])
     return db_prescription
 
+# Medicine reminder schedules
+def replace_reminder_schedules(db: Session, prescription: models.Prescription):
+    # End the prescription's current courses and, if it is verified, start one
+    # per itemised medicine whose frequency and duration can be parsed
+    now = datetime.utcnow()
+    RS = models.ReminderSchedule
+    db.query(RS).filter(RS.prescription_id == prescription.id, RS.ends_at > now).update(
+        {RS.ends_at: now, RS.changed_at: now}, synchronize_session=False
+    )
+    if not prescription.is_verified:
+        return []
+    schedules = []
+    for item in db.query(models.PrescriptionMedicine).filter(
+        models.PrescriptionMedicine.prescription_id == prescription.id
+    ):
+        slots = dosing.parse_frequency(item.frequency)
+        days = dosing.course_days(slots, item.duration, item.quantity)
+        if slots and days:
+            schedules.append(RS(
+                prescription_id=prescription.id, medicine_id=item.medicine_id, user_id=prescription.user_id,
+                slots=slots, starts_at=now, ends_at=now + timedelta(days=days), changed_at=now
+            ))
+    db.add_all(schedules)
+    return schedules
+
+def get_user_reminder_schedules(db: Session, user_id: int):
+    return db.query(models.ReminderSchedule, models.Medicine.name).join(
+        models.Medicine, models.Medicine.id == models.ReminderSchedule.medicine_id
+    ).filter(
+        models.ReminderSchedule.user_id == user_id,
+        models.ReminderSchedule.ends_at > datetime.utcnow()
+    ).order_by(models.ReminderSchedule.id).all()
+
+def get_reminder_schedules(db: Session, active_at: Optional[datetime] = None, changed_since: Optional[datetime] = None):
+    # Compact rows for the scheduler: (id, user_id, medicine_id, slots, ends_at)
+    RS = models.ReminderSchedule
+    query = db.query(RS.id, RS.user_id, RS.medicine_id, RS.slots, RS.ends_at)
+    if active_at is not None:
+        query = query.filter(RS.ends_at > active_at)
+    if changed_since is not None:
+        query = query.filter(RS.changed_at >= changed_since)
+    return query.order_by(RS.id).yield_per(10000)
+
+def get_medicine_names(db: Session, medicine_ids):
+    names = {}
+    for chunk in _chunks(set(medicine_ids)):
+        names.update(db.query(models.Medicine.id, models.Medicine.name).filter(models.Medicine.id.in_(chunk)))
+    return names
+
+def validate_cart_prescriptions(db: Session, user_id: int):
+    # Every prescription-required cart line is checked in one query: the
+    # prescription must be the user's and verified, and if it is itemised the
+    # medicine must be on it with enough quantity left after earlier orders.
+    # Verified prescriptions without itemised medicines cover any medicine.
+    PM = models.PrescriptionMedicine
+    prescribed = db.query(
+        PM.prescription_id, PM.medicine_id, func.sum(PM.quantity).label("quantity")
+    ).join(models.Prescription, models.Prescription.id == PM.prescription_id).filter(
+        models.Prescription.user_id == user_id
+    ).group_by(PM.prescription_id, PM.medicine_id).subquery()
+    itemised = db.query(PM.prescription_id, func.count(PM.id).label("item_count")).join(
+        models.Prescription, models.Prescription.id == PM.prescription_id
+    ).filter(models.Prescription.user_id == user_id).group_by(PM.prescription_id).subquery()
+    dispensed = db.query(
+        models.OrderItem.prescription_id, models.OrderItem.medicine_id,
+        func.sum(models.OrderItem.quantity).label("quantity")
+    ).join(models.Order, models.Order.id == models.OrderItem.order_id).filter(
+        models.Order.user_id == user_id,
+        models.Order.status != OrderStatus.CANCELLED,
+        models.OrderItem.prescription_id.isnot(None)
+    ).group_by(models.OrderItem.prescription_id, models.OrderItem.medicine_id).subquery()
+
+    rows = db.query(
+        models.CartItem.id, models.CartItem.medicine_id, models.Medicine.name, models.CartItem.quantity,
+        models.CartItem.prescription_id, models.Prescription.id.label("owned_prescription_id"),
+        models.Prescription.is_verified, itemised.c.item_count,
+        prescribed.c.quantity.label("prescribed"), dispensed.c.quantity.label("dispensed")
+    ).join(
+        models.Medicine, models.Medicine.id == models.CartItem.medicine_id
+    ).outerjoin(models.Prescription, and_(
+        models.Prescription.id == models.CartItem.prescription_id, models.Prescription.user_id == user_id
+    )).outerjoin(
+        itemised, itemised.c.prescription_id == models.CartItem.prescription_id
+    ).outerjoin(prescribed, and_(
+        prescribed.c.prescription_id == models.CartItem.prescription_id,
+        prescribed.c.medicine_id == models.CartItem.medicine_id
+    )).outerjoin(dispensed, and_(
+        dispensed.c.prescription_id == models.CartItem.prescription_id,
+        dispensed.c.medicine_id == models.CartItem.medicine_id
+    )).filter(
+        models.CartItem.user_id == user_id, models.Medicine.prescription_required == True
+    ).order_by(models.CartItem.id).all()
+
+    issues = []
+    for row in rows:
+        allowed = None
+        if row.prescription_id is None:
+            reason = "prescription_missing"
+        elif row.owned_prescription_id is None:
+            reason = "prescription_not_found"
+        elif not row.is_verified:
+            reason = "prescription_not_verified"
+        elif not row.item_count:
+            continue
+        elif row.prescribed is None:
+            reason = "medicine_not_prescribed"
+        else:
+            allowed = max(row.prescribed - (row.dispensed or 0), 0)
+            if row.quantity <= allowed:
+                continue
+            reason = "quantity_exceeds_prescription"
+        issues.append({
+            "cart_item_id": row.id,
+            "medicine_id": row.medicine_id,
+            "medicine_name": row.name,
+            "prescription_id": row.prescription_id,
+            "quantity": row.quantity,
+            "allowed_quantity": allowed,
+            "reason": reason
+        })
+    return {"valid": not issues, "checked_items": len(rows), "issues": issues}
+
+class CartPrescriptionError(Exception):
+    def __init__(self, issues: List[dict]):
+        super().__init__(f"Cart has {len(issues)} prescription issue(s)")
+        self.issues = issues
+
 # Cart CRUD operations
-def get_user_cart(db: Session, user_id: int):
-    cart_items = db.query(models.CartItem).filter(models.CartItem.user_id == user_id).all()
-    total_amount = sum(item.quantity * item.medicine.price for item in cart_items)
+def compute_cart_summary(db: Session, user_id: int):
+    # Line count, units, total and prescription flag in one aggregate join
+    total_items, total_quantity, total_amount, prescription_required = db.query(
+        func.count(models.CartItem.id),
+        func.coalesce(func.sum(models.CartItem.quantity), 0),
+        func.coalesce(func.sum(models.CartItem.quantity * models.Medicine.price), 0.0),
+        func.coalesce(func.max(case((models.Medicine.prescription_required == True, 1), else_=0)), 0)
+    ).join(
+        models.Medicine, models.CartItem.medicine_id == models.Medicine.id
+    ).filter(models.CartItem.user_id == user_id).one()
     return {
-        "items": cart_items,
-        "total_items": len(cart_items),
-        "total_amount": total_amount
+        "total_items": total_items,
+        "total_quantity": total_quantity,
+        "total_amount": total_amount,
+        "prescription_required": bool(prescription_required)
     }
 
-def add_to_cart(db: Session, user_id: int, cart_item: schemas.CartItemCreate):
-    # Check if item already exists in cart
-    existing_item = db.query(models.CartItem).filter(
-        and_(
-            models.CartItem.user_id == user_id,
-            models.CartItem.medicine_id == cart_item.medicine_id
-        )
-    ).first()
-    
-    if existing_item:
-        existing_item.quantity += cart_item.quantity
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
+def bump_cart_version(db: Session, user_id: int):
+    # Called inside every cart write transaction; cached summaries in every
+    # worker are keyed on it
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.cart_version: models.User.cart_version + 1}, synchronize_session=False
+    )
+
+def get_cart_summary(db: Session, user_id: int):
+    # Keyed on the cart version and the catalog version (prices), both read
+    # before the summary, so a change made through any worker is seen at once
+    cart_version = db.query(models.User.cart_version).filter(models.User.id == user_id).scalar()
+    key = (cart_version, get_catalog_state(db)[0])
+    summary = cache.get_cart_summary(user_id, key)
+    if summary is None:
+        summary = compute_cart_summary(db, user_id)
+        cache.set_cart_summary(user_id, key, summary)
+    return summary
+
+def get_user_cart(db: Session, user_id: int):
+    cart_items = db.query(models.CartItem).options(
+        joinedload(models.CartItem.medicine).joinedload(models.Medicine.category)
+    ).filter(models.CartItem.user_id == user_id).all()
+    return {"items": cart_items, **compute_cart_summary(db, user_id)}
+
+def _insert(db: Session, model):
+    # Dialect-specific INSERT so callers can use ON CONFLICT upserts
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
     else:
-        db_cart_item = models.CartItem(
-            user_id=user_id,
-            **cart_item.dict()
-        )
-        db.add(db_cart_item)
-        db.commit()
-        db.refresh(db_cart_item)
-        return db_cart_item
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def _upsert_cart_line(db: Session, user_id: int, medicine_id: int, quantity: int,
+                      prescription_id: Optional[int] = None, increment: bool = True):
+    # Single INSERT ... ON CONFLICT on the unique (user_id, medicine_id) index,
+    # so concurrent adds of the same medicine can never create two rows
+    stmt = _insert(db, models.CartItem).values(
+        user_id=user_id,
+        medicine_id=medicine_id,
+        quantity=quantity,
+        prescription_id=prescription_id
+    )
+    new_quantity = models.CartItem.quantity + stmt.excluded.quantity if increment else stmt.excluded.quantity
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.CartItem.user_id, models.CartItem.medicine_id],
+        set_={
+            "quantity": new_quantity,
+            "prescription_id": func.coalesce(stmt.excluded.prescription_id, models.CartItem.prescription_id),
+            "updated_at": func.now()
+        }
+    )
+    return db.execute(stmt.returning(models.CartItem.id)).scalar_one()
+
+def add_to_cart(db: Session, user_id: int, cart_item: schemas.CartItemCreate):
+    cart_item_id = _upsert_cart_line(
+        db, user_id, cart_item.medicine_id, cart_item.quantity, cart_item.prescription_id
+    )
+    bump_cart_version(db, user_id)
+    db.commit()
+    return db.get(models.CartItem, cart_item_id, populate_existing=True)
 
 def update_cart_item(db: Session, cart_item_id: int, user_id: int, quantity: int):
     db_cart_item = db.query(models.CartItem).filter(
@@ -235,6 +834,7 @@ def update_cart_item(db: Session, cart_item_id: int, user_id: int, quantity: int
     
     if db_cart_item:
         db_cart_item.quantity = quantity
+        bump_cart_version(db, user_id)
         db.commit()
         db.refresh(db_cart_item)
     return db_cart_item
@@ -249,22 +849,70 @@ def remove_from_cart(db: Session, cart_item_id: int, user_id: int):
     
     if db_cart_item:
         db.delete(db_cart_item)
+        bump_cart_version(db, user_id)
         db.commit()
     return db_cart_item
 
+def apply_cart_operations(db: Session, user_id: int, operations: List[schemas.CartOperation]):
+    # Apply every operation in one transaction and recompute the cart once.
+    # Returns None, changing nothing, if any added or set medicine does not
+    # exist.
+    medicine_ids = {op.medicine_id for op in operations if op.op != "remove"}
+    found = {medicine_id for (medicine_id,) in db.query(models.Medicine.id).filter(
+        models.Medicine.id.in_(medicine_ids)
+    )} if medicine_ids else set()
+    if found != medicine_ids:
+        return None
+    for op in operations:
+        if op.op == "remove":
+            db.query(models.CartItem).filter(
+                and_(
+                    models.CartItem.user_id == user_id,
+                    models.CartItem.medicine_id == op.medicine_id
+                )
+            ).delete(synchronize_session=False)
+        else:
+            _upsert_cart_line(
+                db, user_id, op.medicine_id, op.quantity, op.prescription_id,
+                increment=op.op == "add"
+            )
+    bump_cart_version(db, user_id)
+    db.commit()
+    db.expire_all()
+    return get_user_cart(db, user_id)
+
 def clear_cart(db: Session, user_id: int):
     db.query(models.CartItem).filter(models.CartItem.user_id == user_id).delete()
+    bump_cart_version(db, user_id)
     db.commit()
 
 # Order CRUD operations
-def create_order(db: Session, user_id: int, order_data: schemas.OrderCreate):
+def get_cart_quantities(db: Session, user_id: int):
+    return dict(db.query(models.CartItem.medicine_id, models.CartItem.quantity).filter(
+        models.CartItem.user_id == user_id
+    ).all())
+
+def create_order(db: Session, user_id: int, order_data: schemas.OrderCreate, store_id: Optional[int] = None):
+    # Returns (order, store stock deltas committed with it); the deltas are
+    # what callers apply to the in-process store stock copy. (None, {}) when
+    # the cart is empty or the store can no longer cover it.
     # Get user's cart
     cart = get_user_cart(db, user_id)
     if not cart["items"]:
-        return None
+        return None, {}
+
+    # Reserve stock at the fulfilling store first; nothing is written if it
+    # cannot cover the cart
+    store_deltas = {}
+    if store_id is not None:
+        quantities = {item.medicine_id: item.quantity for item in cart["items"]}
+        if not decrement_store_stock(db, store_id, quantities):
+            db.rollback()
+            return None, {}
+        store_deltas = {medicine_id: -quantity for medicine_id, quantity in quantities.items()}
     
     # Generate order number
-    order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+    order_number = ids.next_order_number()
     
     # Calculate totals
     subtotal = cart["total_amount"]
@@ -285,11 +933,30 @@ def create_order(db: Session, user_id: int, order_data: schemas.OrderCreate):
         delivery_latitude=order_data.delivery_latitude,
         delivery_longitude=order_data.delivery_longitude,
         delivery_type=order_data.delivery_type,
+        store_id=store_id,
         estimated_delivery_time=datetime.utcnow() + timedelta(minutes=30)
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
+
+    # The transaction now holds the write lock (SQLite) and locks the cart
+    # lines and their prescriptions (FOR UPDATE elsewhere), so the cart and
+    # prescriptions checked here are the ones committed with the order. A
+    # cart changed since it was priced is a conflict the caller retries.
+    priced = {(item.id, item.quantity, item.prescription_id) for item in cart["items"]}
+    current = set(db.query(
+        models.CartItem.id, models.CartItem.quantity, models.CartItem.prescription_id
+    ).filter(models.CartItem.user_id == user_id).with_for_update())
+    if current != priced:
+        db.rollback()
+        raise StaleDataError("Cart changed during checkout")
+    prescription_ids = {prescription_id for _, _, prescription_id in current if prescription_id is not None}
+    if prescription_ids:
+        db.query(models.Prescription.id).filter(models.Prescription.id.in_(prescription_ids)).with_for_update().all()
+    validation = validate_cart_prescriptions(db, user_id)
+    if not validation["valid"]:
+        db.rollback()
+        raise CartPrescriptionError(validation["issues"])
     
     # Create order items
     for cart_item in cart["items"]:
@@ -302,36 +969,192 @@ def create_order(db: Session, user_id: int, order_data: schemas.OrderCreate):
             prescription_id=cart_item.prescription_id
         )
         db.add(order_item)
-        
-        # Update medicine stock
-        medicine = cart_item.medicine
-        medicine.stock_quantity -= cart_item.quantity
-        if medicine.stock_quantity <= 0:
-            medicine.is_available = False
     
-    db.commit()
+    # Update medicine stock: ledger rows plus a relative decrement of the
+    # projection, so concurrent writers never overwrite each other. The
+    # decrement is pinned to the versions the cart was priced at; if a
+    # medicine changed in between, nothing is committed and the caller
+    # retries (see retry_on_conflict).
+    ordered = {cart_item.medicine_id: cart_item.quantity for cart_item in cart["items"]}
+    log_stock_deltas(db, {medicine_id: -quantity for medicine_id, quantity in ordered.items()},
+                     StockMovementReason.ORDER, order_number)
+    medicines = models.Medicine.__table__
+    new_stock = medicines.c.stock_quantity - bindparam("quantity")
+    decremented = db.execute(medicines.update().where(
+        medicines.c.id == bindparam("medicine_id"), medicines.c.version == bindparam("read_version")
+    ).values(
+        stock_quantity=new_stock,
+        is_available=case((new_stock <= 0, False), else_=medicines.c.is_available),
+        version=medicines.c.version + 1
+    ), [
+        {"medicine_id": cart_item.medicine_id, "quantity": cart_item.quantity,
+         "read_version": cart_item.medicine.version}
+        for cart_item in cart["items"]
+    ]).rowcount
+    if decremented != len(ordered):
+        db.rollback()
+        raise StaleDataError(f"Medicine stock changed during checkout ({decremented} of {len(ordered)} lines matched)")
     
-    # Clear cart
-    clear_cart(db, user_id)
+    ordered_ids = list(ordered)
+    record_catalog_write(db, ordered_ids)
     
-    return db_order
+    # Clear cart in the same transaction; everything else happens after the
+    # response, from the job queue
+    db.query(models.CartItem).filter(models.CartItem.user_id == user_id).delete(synchronize_session=False)
+    bump_cart_version(db, user_id)
+    enqueue_job(db, "orders.assign_partner", {"order_id": db_order.id}, dedupe_key=f"assign:{db_order.id}")
+    db.commit()
+    db.refresh(db_order)
+    cache.publish_catalog_change(ordered_ids)
+    
+    return db_order, store_deltas
+
+ORDER_LIST_LIMIT = 100
+
+def _order_item_count():
+    # Correlated line count, answered from ix_order_items_order_id
+    return select(func.count(models.OrderItem.id)).where(
+        models.OrderItem.order_id == models.Order.id
+    ).correlate(models.Order).scalar_subquery()
+
+def _order_details():
+    # Items, their medicines and categories in two extra queries per page
+    # instead of lazy loads per item
+    return selectinload(models.Order.items).joinedload(models.OrderItem.medicine).joinedload(models.Medicine.category)
+
+def get_user_orders(db: Session, user_id: int, skip: int = 0, limit: int = ORDER_LIST_LIMIT):
+    return db.query(models.Order).options(_order_details()).filter(
+        models.Order.user_id == user_id
+    ).order_by(models.Order.id.desc()).offset(skip).limit(limit).all()
 
-def get_user_orders(db: Session, user_id: int):
-    return db.query(models.Order).filter(models.Order.user_id == user_id).all()
+def get_user_order_summaries(db: Session, user_id: int, skip: int = 0, limit: int = ORDER_LIST_LIMIT):
+    # Newest first, without touching order_items beyond the count
+    return db.query(
+        models.Order.id, models.Order.order_number, models.Order.status, models.Order.delivery_type,
+        models.Order.total_amount, models.Order.delivery_fee, models.Order.tax_amount,
+        models.Order.created_at, models.Order.updated_at, models.Order.estimated_delivery_time,
+        models.Order.actual_delivery_time, _order_item_count().label("item_count")
+    ).filter(models.Order.user_id == user_id).order_by(models.Order.id.desc()).offset(skip).limit(limit).all()
+
+def get_user_orders_state(db: Session, user_id: int):
+    # Cheap validator inputs for a user's order list (uses ix_orders_user_id)
+    # Versions only grow, so their sum changes on every update to the list
+    return db.query(
+        func.count(models.Order.id),
+        func.max(models.Order.id),
+        func.coalesce(func.sum(models.Order.version), 0),
+        func.max(func.coalesce(models.Order.updated_at, models.Order.created_at))
+    ).filter(models.Order.user_id == user_id).one()
+
+def get_order_state(db: Session, order_id: int):
+    return db.query(
+        models.Order.user_id, models.Order.status, models.Order.version, models.Order.created_at,
+        models.Order.updated_at
+    ).filter(models.Order.id == order_id).first()
 
 def get_order(db: Session, order_id: int):
     return db.query(models.Order).filter(models.Order.id == order_id).first()
 
-def update_order_status(db: Session, order_id: int, status: OrderStatus):
+def get_order_detail(db: Session, order_id: int):
+    return db.query(models.Order).options(_order_details()).filter(models.Order.id == order_id).first()
+
+class InvalidStatusTransition(Exception):
+    def __init__(self, current: OrderStatus, target: OrderStatus):
+        super().__init__(f"Cannot move an order from {current.value} to {target.value}")
+        self.current = current
+        self.target = target
+
+def _transition_values(status: OrderStatus, now: datetime) -> dict:
+    values = {"status": status}
+    if status == OrderStatus.DELIVERED:
+        values["actual_delivery_time"] = now
+    return values
+
+def update_order_status(db: Session, order_id: int, status: OrderStatus, expected_version: Optional[int] = None):
     db_order = get_order(db, order_id)
     if db_order:
-        db_order.status = status
-        if status == OrderStatus.DELIVERED:
-            db_order.actual_delivery_time = datetime.utcnow()
+        check_version(db_order, expected_version)
+        previous = db_order.status
+        if not previous.can_transition_to(status):
+            raise InvalidStatusTransition(previous, status)
+        now = datetime.utcnow()
+        for field, value in _transition_values(status, now).items():
+            setattr(db_order, field, value)
+        if status == OrderStatus.CANCELLED:
+            _enqueue_restock(db, [order_id])
         db.commit()
         db.refresh(db_order)
+        events.publish_order_transitions([events.OrderTransition(
+            db_order.id, db_order.user_id, db_order.delivery_partner_id, previous, status, now
+        )])
     return db_order
 
+BULK_TRANSITION_MAX = 500
+
+def transition_orders(db: Session, transitions: Dict[int, OrderStatus], partner_id: Optional[int] = None):
+    # Orders are grouped by (current, target) status and each group is one
+    # UPDATE ... WHERE id IN (...) AND status = current, so an order that
+    # moved on after it was read is left alone and reported as a conflict.
+    # With a partner_id only that partner's orders are touched; the guard is
+    # part of the UPDATE too, so a reassignment after the read is honoured.
+    # Committed transitions are published as a single event batch.
+    now = datetime.utcnow()
+    current = {
+        order_id: (status, assigned_to) for order_id, status, assigned_to in db.query(
+            models.Order.id, models.Order.status, models.Order.delivery_partner_id
+        ).filter(models.Order.id.in_(transitions))
+    }
+    outcomes = {}
+    groups = defaultdict(list)
+    for order_id, target in transitions.items():
+        status, assigned_to = current.get(order_id, (None, None))
+        if status is None:
+            outcomes[order_id] = ("not_found", None)
+        elif partner_id is not None and assigned_to != partner_id:
+            outcomes[order_id] = ("forbidden", None)
+        elif not status.can_transition_to(target):
+            outcomes[order_id] = ("invalid_transition", status)
+        else:
+            groups[(status, target)].append(order_id)
+
+    applied = []
+    for (status, target), order_ids in groups.items():
+        for chunk in _chunks(order_ids):
+            statement = update(models.Order).where(models.Order.id.in_(chunk), models.Order.status == status)
+            if partner_id is not None:
+                statement = statement.where(models.Order.delivery_partner_id == partner_id)
+            for order_id, user_id, delivery_partner_id in db.execute(
+                statement.values(
+                    version=models.Order.version + 1, **_transition_values(target, now)
+                ).returning(models.Order.id, models.Order.user_id, models.Order.delivery_partner_id)
+            ):
+                outcomes[order_id] = ("applied", target)
+                applied.append(events.OrderTransition(order_id, user_id, delivery_partner_id, status, target, now))
+    lost = [order_id for order_ids in groups.values() for order_id in order_ids if order_id not in outcomes]
+    if lost:
+        moved = {
+            order_id: (status, assigned_to) for order_id, status, assigned_to in db.query(
+                models.Order.id, models.Order.status, models.Order.delivery_partner_id
+            ).filter(models.Order.id.in_(lost))
+        }
+        for order_id in lost:
+            if order_id not in moved:
+                outcomes[order_id] = ("not_found", None)
+            elif partner_id is not None and moved[order_id][1] != partner_id:
+                outcomes[order_id] = ("forbidden", None)
+            else:
+                outcomes[order_id] = ("conflict", moved[order_id][0])
+    _enqueue_restock(db, [t.order_id for t in applied if t.to_status == OrderStatus.CANCELLED])
+    db.commit()
+    events.publish_order_transitions(applied)
+    return {
+        "applied": len(applied),
+        "outcomes": [
+            {"order_id": order_id, "outcome": outcomes[order_id][0], "status": outcomes[order_id][1]}
+            for order_id in transitions
+        ]
+    }
+
 def upload_delivery_proof(db: Session, order_id: int, proof_url: str):
     db_order = get_order(db, order_id)
     if db_order:
@@ -341,6 +1164,51 @@ def upload_delivery_proof(db: Session, order_id: int, proof_url: str):
     return db_order
 
 # Delivery CRUD operations
+ASSIGNMENT_LIST_LIMIT = 100
+
+# Statuses an order can still leave, i.e. work a partner has not finished
+ACTIVE_ORDER_STATUSES = tuple(status for status, targets in models.ORDER_STATUS_TRANSITIONS.items() if targets)
+
+def get_delivery_partner(db: Session, user_id: int):
+    return db.query(models.User).filter(
+        models.User.id == user_id,
+        models.User.role == UserRole.DELIVERY_PARTNER,
+        models.User.is_active == True
+    ).first()
+
+def assign_delivery_partner(db: Session, order_id: int, partner_id: int, expected_version: Optional[int] = None):
+    db_order = get_order(db, order_id)
+    if db_order:
+        check_version(db_order, expected_version)
+        previous = db_order.delivery_partner_id
+        db_order.delivery_partner_id = partner_id
+        db.commit()
+        db.refresh(db_order)
+        if previous != partner_id:
+            events.publish_order_assignments([
+                events.OrderAssignment(order_id, partner_id, previous, datetime.utcnow())
+            ])
+    return db_order
+
+def get_delivery_assignments(db: Session, partner_id: int, limit: int = ASSIGNMENT_LIST_LIMIT):
+    # Compact work list, without loading items or medicines. Each active
+    # status is its own range of ix_orders_partner_status_eta, already in ETA
+    # order, and SQLite answers the ORDER BY on the UNION ALL by merging
+    # them; a single status IN (...) would need a temp B-tree sort.
+    arms = [
+        select(
+            models.Order.id, models.Order.order_number, models.Order.status, models.Order.delivery_type,
+            models.Order.delivery_address, models.Order.delivery_city, models.Order.delivery_pincode,
+            models.Order.delivery_latitude, models.Order.delivery_longitude, models.Order.estimated_delivery_time,
+            _order_item_count().label("item_count")
+        ).where(models.Order.delivery_partner_id == partner_id, models.Order.status == status)
+        for status in ACTIVE_ORDER_STATUSES
+    ]
+    work_list = union_all(*arms)
+    return db.execute(work_list.order_by(
+        work_list.selected_columns.estimated_delivery_time, work_list.selected_columns.id
+    ).limit(limit)).all()
+
 def get_delivery_estimate(db: Session, estimate_data: schemas.DeliveryEstimate):
     # Mock delivery estimation
     base_time = 30 if estimate_data.delivery_type == DeliveryType.STANDARD else 15
@@ -352,27 +1220,87 @@ def get_delivery_estimate(db: Session, estimate_data: schemas.DeliveryEstimate):
         "available_partners": 5  # Mock data
     }
 
-def get_nearby_pharmacies(db: Session, latitude: float, longitude: float, radius_km: float = 5.0):
-    # Mock nearby pharmacies
-    pharmacies = [
-        {
-            "id": 1,
-            "name": "City Pharmacy",
-            "address": "123 Main St, City Center",
-            "distance_km": 1.2,
-            "available_medicines": 150,
-            "estimated_delivery_time": 25
-        },
-        {
-            "id": 2,
-            "name": "Health Plus Pharmacy",
-            "address": "456 Oak Ave, Downtown",
-            "distance_km": 2.8,
-            "available_medicines": 200,
-            "estimated_delivery_time": 35
-        }
+# Store CRUD operations
+def get_stores(db: Session, active_only: bool = True):
+    query = db.query(models.Store)
+    if active_only:
+        query = query.filter(models.Store.is_active == True)
+    return query.order_by(models.Store.id).all()
+
+def get_store(db: Session, store_id: int):
+    return db.query(models.Store).filter(models.Store.id == store_id).first()
+
+def create_store(db: Session, store: schemas.StoreCreate):
+    db_store = models.Store(**store.dict())
+    db.add(db_store)
+    db.commit()
+    db.refresh(db_store)
+    return db_store
+
+def get_store_stock(db: Session, store_id: int):
+    # medicine_id -> units on hand; served from ix_store_inventory_store_stock
+    return dict(db.query(models.StoreInventory.medicine_id, models.StoreInventory.stock_quantity).filter(
+        models.StoreInventory.store_id == store_id
+    ).all())
+
+def apply_store_stock_sync(db: Session, store_id: int, pending: dict):
+    # pending has the same shape as in apply_stock_sync. One executemany
+    # upsert: absolute entries replace the row, deltas apply to the stored
+    # value inside the UPDATE, so concurrent feeds cannot lose increments.
+    known = set()
+    for chunk in _chunks(pending):
+        known.update(medicine_id for (medicine_id,) in db.query(models.Medicine.id).filter(models.Medicine.id.in_(chunk)))
+    now = datetime.utcnow()
+    rows = [
+        {"store_id": store_id, "medicine_id": medicine_id, "stock_quantity": max((base or 0) + delta, 0),
+         "updated_at": now, "absolute": base is not None, "delta": delta}
+        for medicine_id, (base, delta) in pending.items() if medicine_id in known
     ]
-    return [p for p in pharmacies if p["distance_km"] <= radius_km]
+    if rows:
+        # Core table, so the extra absolute/delta parameters reach the statement
+        stmt = _insert(db, models.StoreInventory.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.StoreInventory.store_id, models.StoreInventory.medicine_id],
+            set_={
+                "stock_quantity": case(
+                    (bindparam("absolute"), stmt.excluded.stock_quantity),
+                    else_=func.max(models.StoreInventory.stock_quantity + bindparam("delta"), 0)
+                ),
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        db.execute(stmt, rows)
+    stock = {}
+    for chunk in _chunks(known):
+        stock.update(db.query(models.StoreInventory.medicine_id, models.StoreInventory.stock_quantity).filter(
+            models.StoreInventory.store_id == store_id, models.StoreInventory.medicine_id.in_(chunk)
+        ).all())
+    db.commit()
+    return {"applied": len(rows), "not_found": sorted(pending.keys() - known), "stock": stock}
+
+def decrement_store_stock(db: Session, store_id: int, quantities: dict):
+    # Conditional decrements inside the caller's transaction; False if any
+    # line no longer has enough stock at the store
+    now = datetime.utcnow()
+    for medicine_id, quantity in quantities.items():
+        updated = db.execute(update(models.StoreInventory).where(
+            models.StoreInventory.store_id == store_id,
+            models.StoreInventory.medicine_id == medicine_id,
+            models.StoreInventory.stock_quantity >= quantity
+        ).values(
+            stock_quantity=models.StoreInventory.stock_quantity - quantity, updated_at=now
+        ).execution_options(synchronize_session=False)).rowcount
+        if updated != 1:
+            return False
+    return True
+
+def get_medicines_at_stores(db: Session, store_ids: List[int], skip: int = 0, limit: int = 100):
+    in_stock = db.query(models.StoreInventory.medicine_id).filter(
+        models.StoreInventory.store_id.in_(store_ids), models.StoreInventory.stock_quantity > 0
+    )
+    return db.query(models.Medicine).options(joinedload(models.Medicine.category)).filter(
+        models.Medicine.id.in_(in_stock.scalar_subquery()), models.Medicine.is_available == True
+    ).order_by(models.Medicine.id).offset(skip).limit(limit).all()
 
 def create_emergency_delivery(db: Session, user_id: int, emergency_data: schemas.EmergencyDelivery):
     # Create emergency order with priority
@@ -384,4 +1312,362 @@ def create_emergency_delivery(db: Session, user_id: int, emergency_data: schemas
     )
     
     # For emergency, we'd create a special order with priority
-    return create_order(db, user_id, order_data) 
\ No newline at end of file
+    order, _ = create_order(db, user_id, order_data)
+    return order
+
+# Job queue operations
+JOB_LEASE_SECONDS = 300
+JOB_RETRY_BASE_SECONDS = 5
+JOB_RETRY_MAX_SECONDS = 600
+
+def enqueue_job(db: Session, kind: str, payload: dict, dedupe_key: Optional[str] = None,
+                delay_seconds: float = 0, max_attempts: int = 5):
+    # Added to the caller's transaction, so the job exists exactly when the
+    # change that asked for it commits. A dedupe key already in the table
+    # (queued, running or not yet pruned) makes this a no-op.
+    now = datetime.utcnow()
+    stmt = _insert(db, models.Job).values(
+        kind=kind, payload=json.dumps(payload), dedupe_key=dedupe_key, status=JobStatus.QUEUED,
+        attempts=0, max_attempts=max_attempts, run_at=now + timedelta(seconds=delay_seconds), created_at=now
+    )
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["dedupe_key"])
+    db.execute(stmt)
+    db.info["jobs_enqueued"] = True
+
+def claim_job(db: Session, now: Optional[datetime] = None):
+    # Oldest eligible job, or a running one whose lease expired (its worker
+    # died), claimed in one UPDATE so two workers can never take the same job
+    now = now or datetime.utcnow()
+    Job = models.Job
+    eligible = select(Job.id).where(
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]), Job.run_at <= now
+    ).order_by(Job.run_at, Job.id).limit(1).scalar_subquery()
+    job = db.execute(update(Job).where(Job.id == eligible).values(
+        status=JobStatus.RUNNING, attempts=Job.attempts + 1, run_at=now + timedelta(seconds=JOB_LEASE_SECONDS)
+    ).returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)).first()
+    db.commit()
+    return job
+
+def finish_job(db: Session, job_id: int, attempt: int):
+    # attempt fences out a worker whose lease expired and was re-claimed
+    db.execute(update(models.Job).where(models.Job.id == job_id, models.Job.attempts == attempt).values(
+        status=JobStatus.DONE, finished_at=datetime.utcnow(), last_error=None
+    ))
+    db.commit()
+
+def fail_job(db: Session, job_id: int, attempt: int, max_attempts: int, error: str):
+    # Exponential backoff until max_attempts, then the job is kept as FAILED
+    now = datetime.utcnow()
+    values = {"last_error": error[:2000]}
+    if attempt >= max_attempts:
+        values.update(status=JobStatus.FAILED, finished_at=now)
+    else:
+        delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), JOB_RETRY_MAX_SECONDS)
+        values.update(status=JobStatus.QUEUED, run_at=now + timedelta(seconds=delay))
+    db.execute(update(models.Job).where(models.Job.id == job_id, models.Job.attempts == attempt).values(**values))
+    db.commit()
+    return values["status"]
+
+def prune_jobs(db: Session, older_than: datetime):
+    # Finished jobs past retention; their dedupe keys become reusable
+    deleted = db.query(models.Job).filter(
+        models.Job.status == JobStatus.DONE, models.Job.finished_at < older_than
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def get_job_counts(db: Session):
+    now = datetime.utcnow()
+    counts = {status: 0 for status in JobStatus}
+    for status, count in db.query(models.Job.status, func.count(models.Job.id)).group_by(models.Job.status):
+        counts[status] = count
+    oldest = db.query(func.min(models.Job.run_at)).filter(
+        models.Job.status == JobStatus.QUEUED, models.Job.run_at <= now
+    ).scalar()
+    return counts, (now - oldest).total_seconds() if oldest else 0.0
+
+# Job follow-ups
+def _enqueue_restock(db: Session, order_ids):
+    for order_id in order_ids:
+        enqueue_job(db, "orders.restock_cancelled", {"order_id": order_id}, dedupe_key=f"restock:{order_id}")
+
+def auto_assign_delivery_partner(db: Session, order_id: int):
+    # Least-loaded active partner by open assignments. Returns the order, or
+    # None when it no longer needs a partner; raises LookupError when no
+    # partner is available so the job retries later.
+    db_order = get_order(db, order_id)
+    if not db_order or db_order.delivery_partner_id is not None or db_order.status not in ACTIVE_ORDER_STATUSES:
+        return None
+    load = db.query(
+        models.Order.delivery_partner_id, func.count(models.Order.id).label("open_orders")
+    ).filter(models.Order.status.in_(ACTIVE_ORDER_STATUSES)).group_by(models.Order.delivery_partner_id).subquery()
+    partner_id = db.query(models.User.id).outerjoin(load, load.c.delivery_partner_id == models.User.id).filter(
+        models.User.role == UserRole.DELIVERY_PARTNER, models.User.is_active == True
+    ).order_by(func.coalesce(load.c.open_orders, 0), models.User.id).limit(1).scalar()
+    if partner_id is None:
+        raise LookupError("No active delivery partner")
+    return assign_delivery_partner(db, order_id, partner_id, expected_version=db_order.version)
+
+def restock_cancelled_order(db: Session, order_id: int):
+    # Return a cancelled order's units to the catalog and its store, as
+    # (store_id, {medicine_id: units restocked}). The job can run again after
+    # this commits (worker died before finish_job), so the order is first
+    # claimed by setting restocked_at in the same transaction; a run that
+    # finds it already set does nothing.
+    db_order = get_order(db, order_id)
+    if not db_order or db_order.status != OrderStatus.CANCELLED:
+        return None, {}
+    claimed = db.execute(update(models.Order).where(
+        models.Order.id == order_id, models.Order.status == OrderStatus.CANCELLED,
+        models.Order.restocked_at.is_(None)
+    ).values(restocked_at=datetime.utcnow(), version=models.Order.version + 1)).rowcount
+    if not claimed:
+        db.rollback()
+        return None, {}
+    quantities = defaultdict(int)
+    for medicine_id, quantity in db.query(models.OrderItem.medicine_id, models.OrderItem.quantity).filter(
+        models.OrderItem.order_id == order_id
+    ):
+        quantities[medicine_id] += quantity
+    if not quantities:
+        db.commit()
+        return None, {}
+    log_stock_deltas(db, quantities, StockMovementReason.RESTOCK, db_order.order_number)
+    medicines = models.Medicine.__table__
+    new_stock = medicines.c.stock_quantity + bindparam("quantity")
+    # As at checkout, stock only ever clears is_available; a medicine an admin
+    # withdrew stays withdrawn when units come back
+    db.execute(medicines.update().where(medicines.c.id == bindparam("medicine_id")).values(
+        stock_quantity=new_stock,
+        is_available=case((new_stock <= 0, False), else_=medicines.c.is_available),
+        version=medicines.c.version + 1
+    ), [{"medicine_id": medicine_id, "quantity": quantity} for medicine_id, quantity in quantities.items()])
+    store_id = db_order.store_id
+    if store_id is not None:
+        inventory = models.StoreInventory.__table__
+        db.execute(inventory.update().where(
+            inventory.c.store_id == store_id, inventory.c.medicine_id == bindparam("restocked_id")
+        ).values(stock_quantity=inventory.c.stock_quantity + bindparam("quantity"), updated_at=datetime.utcnow()), [
+            {"restocked_id": medicine_id, "quantity": quantity} for medicine_id, quantity in quantities.items()
+        ])
+    medicine_ids = list(quantities)
+    retire_expired_medicines(db, medicine_ids)
+    record_catalog_write(db, medicine_ids)
+    db.commit()
+    cache.publish_catalog_change(medicine_ids)
+    return store_id, dict(quantities)
+
+def attach_prescription_to_cart(db: Session, prescription_id: int):
+    # Link a newly verified prescription to the owner's prescription-required
+    # cart lines that have none, limited to its itemised medicines if any
+    prescription = get_prescription(db, prescription_id)
+    if not prescription or not prescription.is_verified:
+        return 0
+    PM = models.PrescriptionMedicine
+    itemised = db.query(PM.medicine_id).filter(PM.prescription_id == prescription_id)
+    criteria = [
+        models.CartItem.user_id == prescription.user_id,
+        models.CartItem.prescription_id.is_(None),
+        models.CartItem.medicine_id.in_(
+            db.query(models.Medicine.id).filter(models.Medicine.prescription_required == True).scalar_subquery()
+        ),
+    ]
+    if itemised.first() is not None:
+        criteria.append(models.CartItem.medicine_id.in_(itemised.scalar_subquery()))
+    attached = db.query(models.CartItem).filter(*criteria).update(
+        {models.CartItem.prescription_id: prescription_id}, synchronize_session=False
+    )
+    db.commit()
+    return attached
+
+# Analytics rollups
+ANALYTICS_BATCH_SIZE = 2000
+ANALYTICS_WATERMARK_OVERLAP = timedelta(minutes=2)
+ANALYTICS_TOP_MEDICINES = 10
+_ROLLUP_METRICS = ("orders", "cancelled", "delivered", "delivery_minutes", "revenue")
+
+def _local_hour(at: datetime) -> datetime:
+    return (at + timedelta(minutes=config.LOCAL_UTC_OFFSET_MINUTES)).replace(minute=0, second=0, microsecond=0)
+
+def _order_fact(row) -> dict:
+    cancelled = row.status == OrderStatus.CANCELLED
+    delivered = row.status == OrderStatus.DELIVERED and row.actual_delivery_time is not None
+    return {
+        "order_id": row.id,
+        "hour": _local_hour(row.created_at),
+        "city": row.delivery_city,
+        "cancelled": cancelled,
+        "delivered": delivered,
+        "delivery_minutes": (row.actual_delivery_time - row.created_at).total_seconds() / 60 if delivered else None,
+        "revenue": 0.0 if cancelled else row.total_amount,
+    }
+
+def _new_rollup_metrics():
+    return dict.fromkeys(_ROLLUP_METRICS, 0)
+
+def _add_fact(totals, key, fact: dict, sign: int):
+    metrics = totals[key]
+    metrics["orders"] += sign
+    metrics["cancelled"] += sign * fact["cancelled"]
+    metrics["delivered"] += sign * fact["delivered"]
+    metrics["delivery_minutes"] += sign * (fact["delivery_minutes"] or 0.0)
+    metrics["revenue"] += sign * fact["revenue"]
+
+def _increment_rollup(db: Session, model, keys, totals):
+    # Adds the deltas to existing rollup rows, creating missing ones
+    if not totals:
+        return
+    rows = [dict(zip(keys, key), **metrics) for key, metrics in totals.items()]
+    metrics = [column for column in rows[0] if column not in keys]
+    stmt = _insert(db, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in metrics}
+    )
+    db.execute(stmt, rows)
+
+def _apply_order_facts(db: Session, orders) -> int:
+    # Each order's previous contribution (order_facts) is subtracted and its
+    # current one added, so only changed orders touch the rollups
+    previous = {
+        fact.order_id: {column: getattr(fact, column) for column in ("order_id", "hour", "city", "cancelled", "delivered", "delivery_minutes", "revenue")}
+        for fact in db.query(models.OrderFact).filter(models.OrderFact.order_id.in_([row.id for row in orders]))
+    }
+    hourly, daily = defaultdict(_new_rollup_metrics), defaultdict(_new_rollup_metrics)
+    item_deltas = []  # (order_id, day, sign) for orders whose units count changed
+    facts = []
+    for row in orders:
+        fact, old = _order_fact(row), previous.get(row.id)
+        if fact == old:
+            continue
+        for contribution, sign in ((old, -1), (fact, 1)):
+            if contribution is None:
+                continue
+            _add_fact(hourly, (contribution["hour"], contribution["city"]), contribution, sign)
+            _add_fact(daily, (contribution["hour"].date(), contribution["city"]), contribution, sign)
+            if not contribution["cancelled"]:
+                item_deltas.append((row.id, contribution["hour"].date(), sign))
+        facts.append(fact)
+    if not facts:
+        return 0
+
+    units = defaultdict(lambda: {"units": 0, "revenue": 0.0})
+    items = defaultdict(list)
+    for chunk in _chunks({order_id for order_id, _, _ in item_deltas}):
+        for order_id, medicine_id, quantity, total_price in db.query(
+            models.OrderItem.order_id, models.OrderItem.medicine_id, models.OrderItem.quantity, models.OrderItem.total_price
+        ).filter(models.OrderItem.order_id.in_(chunk)):
+            items[order_id].append((medicine_id, quantity, total_price))
+    for order_id, day, sign in item_deltas:
+        for medicine_id, quantity, total_price in items[order_id]:
+            units[(day, medicine_id)]["units"] += sign * quantity
+            units[(day, medicine_id)]["revenue"] += sign * total_price
+
+    _increment_rollup(db, models.SalesRollupHourly, ("hour", "city"), hourly)
+    _increment_rollup(db, models.SalesRollupDaily, ("day", "city"), daily)
+    _increment_rollup(db, models.MedicineSalesDaily, ("day", "medicine_id"), units)
+    stmt = _insert(db, models.OrderFact)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["order_id"],
+        set_={column: getattr(stmt.excluded, column) for column in facts[0] if column != "order_id"}
+    ), facts)
+    return len(facts)
+
+def apply_order_rollups(db: Session, batch_size: int = ANALYTICS_BATCH_SIZE):
+    # Folds orders created or updated since the watermark into the rollups.
+    # The watermark is the latest change seen, less an overlap for writes
+    # that committed late; re-reading an unchanged order is a no-op. It only
+    # moves once every page is applied.
+    state = db.query(models.AnalyticsState).filter(models.AnalyticsState.id == 1).first()
+    if state is None:
+        state = models.AnalyticsState(id=1)
+        db.add(state)
+        db.commit()
+    watermark = state.watermark
+    changed = db.query(models.Order.id)
+    if watermark is not None:
+        since = watermark - ANALYTICS_WATERMARK_OVERLAP
+        # Same as coalesce(updated_at, created_at) >= since, in a form that
+        # SQLite answers from both indexes (MULTI-INDEX OR)
+        changed = changed.filter(or_(models.Order.updated_at >= since, models.Order.created_at >= since))
+    order_ids = sorted(order_id for order_id, in changed)
+    columns = (
+        models.Order.id, models.Order.created_at, models.Order.delivery_city, models.Order.status,
+        models.Order.total_amount, models.Order.actual_delivery_time,
+        func.coalesce(models.Order.updated_at, models.Order.created_at).label("changed_at")
+    )
+    applied = 0
+    for chunk in _chunks(order_ids, batch_size):
+        page = db.query(*columns).filter(models.Order.id.in_(chunk)).all()
+        applied += _apply_order_facts(db, page)
+        db.commit()
+        latest = max(row.changed_at for row in page)
+        watermark = latest if watermark is None else max(watermark, latest)
+    state.watermark = watermark
+    state.updated_at = datetime.utcnow()
+    db.commit()
+    return {"processed": len(order_ids), "changed": applied, "watermark": watermark}
+
+def _sales_metrics(orders, cancelled, delivered, delivery_minutes, revenue) -> dict:
+    orders, cancelled, delivered = orders or 0, cancelled or 0, delivered or 0
+    return {
+        "orders": orders,
+        "cancelled": cancelled,
+        "delivered": delivered,
+        "revenue": round(revenue or 0.0, 2),
+        "avg_delivery_minutes": round(delivery_minutes / delivered, 1) if delivered else None,
+        "cancellation_rate": round(cancelled / orders, 4) if orders else 0.0,
+    }
+
+def get_analytics_summary(db: Session, days: int = 7, city: Optional[str] = None):
+    # Reads the rollup tables only; medicine sales have no city dimension
+    now = _local_hour(datetime.utcnow())
+    start_day = now.date() - timedelta(days=days - 1)
+    D, H, M = models.SalesRollupDaily, models.SalesRollupHourly, models.MedicineSalesDaily
+
+    def sums(model):
+        return [func.sum(getattr(model, metric)) for metric in _ROLLUP_METRICS]
+
+    def in_city(query, model):
+        return query.filter(model.city == city) if city is not None else query
+
+    def window(query):
+        return in_city(query, D).filter(D.day >= start_day)
+
+    totals = window(db.query(*sums(D))).one()
+    open_orders = in_city(db.query(func.sum(D.orders - D.cancelled - D.delivered)), D).scalar()
+    daily = window(db.query(D.day, *sums(D))).group_by(D.day).order_by(D.day).all()
+    cities = window(db.query(D.city, *sums(D))).group_by(D.city).order_by(func.sum(D.orders).desc()).all()
+    hourly = in_city(db.query(H.hour, *sums(H)), H).filter(
+        H.hour > now - timedelta(hours=24)
+    ).group_by(H.hour).order_by(H.hour).all()
+    top_medicines = db.query(
+        M.medicine_id, models.Medicine.name, func.sum(M.units).label("units"), func.sum(M.revenue)
+    ).outerjoin(models.Medicine, models.Medicine.id == M.medicine_id).filter(M.day >= start_day).group_by(
+        M.medicine_id, models.Medicine.name
+    ).order_by(func.sum(M.units).desc()).limit(ANALYTICS_TOP_MEDICINES).all()
+    as_of = db.query(models.AnalyticsState.updated_at).filter(models.AnalyticsState.id == 1).scalar()
+    return {
+        "days": days,
+        "city": city,
+        "as_of": as_of,
+        "totals": _sales_metrics(*totals),
+        "open_orders": open_orders or 0,
+        "daily": [{"day": day, **_sales_metrics(*metrics)} for day, *metrics in daily],
+        "hourly": [{"hour": hour, **_sales_metrics(*metrics)} for hour, *metrics in hourly],
+        "cities": [{"city": name, **_sales_metrics(*metrics)} for name, *metrics in cities],
+        "top_medicines": [
+            {"medicine_id": medicine_id, "name": name, "units": units, "revenue": round(revenue, 2)}
+            for medicine_id, name, units, revenue in top_medicines
+        ],
+    }
+
+def reset_order_rollups(db: Session):
+    # Drops every rollup and fact; the next apply_order_rollups rebuilds them from orders
+    for model in (models.SalesRollupHourly, models.SalesRollupDaily, models.MedicineSalesDaily, models.OrderFact):
+        db.query(model).delete(synchronize_session=False)
+    db.query(models.AnalyticsState).filter(models.AnalyticsState.id == 1).update(
+        {models.AnalyticsState.watermark: None}, synchronize_session=False
+    )
+    db.commit()
@@ -0,0 +1,125 @@
+"""
+Dosing schedules from prescription text.
+
+``PrescriptionMedicine.frequency`` is free text as written on the
+prescription ("BD", "1-0-1", "3 times a day", "every 8 hours", "at bedtime").
+It is parsed into a daily pattern: a bitmask of the half-hour slots of a local
+day (bit 16 is 08:00) at which a dose is due. ``duration`` ("5 days",
+"2 weeks") gives how long; without it the course lasts as long as the
+prescribed quantity does.
+
+Times are kept as epoch minutes (UTC). Slots are local to
+``config.LOCAL_UTC_OFFSET_MINUTES``, the single timezone the service delivers in.
+"""
+
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from . import config
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MINUTES_PER_DAY = 24 * 60
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _at(*hours: float) -> int:
+    mask = 0
+    for hour in hours:
+        mask |= 1 << int(hour * 60 // SLOT_MINUTES)
+    return mask
+
+# Morning, afternoon, night (and bedtime) for the "1-0-1" notation
+_POSITIONS = (8, 14, 20, 22)
+
+_NAMED = (
+    (r"\b(od|qd|once)\b|once daily|once a day", _at(9)),
+    (r"\b(bd|bid)\b|twice", _at(9, 21)),
+    (r"\b(tds|tid|thrice)\b|three times", _at(8, 14, 20)),
+    (r"\b(qid|qds)\b|four times", _at(8, 12, 16, 20)),
+    (r"\b(hs)\b|bedtime", _at(22)),
+    (r"\bmorning\b", _at(8)),
+    (r"\bnight\b", _at(21)),
+)
+
+def parse_frequency(text: Optional[str]) -> int:
+    """Daily slot bitmask for a frequency, or 0 if it is not a daily schedule we understand."""
+    if not text:
+        return 0
+    text = text.strip().lower()
+    match = re.fullmatch(r"(\d)\s*-\s*(\d)\s*-\s*(\d)(?:\s*-\s*(\d))?", text)
+    if match:
+        return _at(*(hour for hour, dose in zip(_POSITIONS, match.groups()) if dose and int(dose)))
+    match = re.search(r"every\s+(\d+)\s*(?:hours?|hrs?|h)\b|\bq(\d+)h\b", text)
+    if match:
+        step = int(match.group(1) or match.group(2))
+        return _at(*(hour % 24 for hour in range(8, 8 + 24, step))) if 1 <= step <= 24 else 0
+    match = re.search(r"(\d+)\s*(?:times?|x)\s*(?:a|per|/)?\s*day|(\d+)\s*x\s*daily", text)
+    if match:
+        times = int(match.group(1) or match.group(2))
+        if times == 1:
+            return _at(9)
+        if 1 < times <= 12:
+            # Spread over the waking day, 08:00 to 20:00
+            return _at(*(8 + 12 * dose / (times - 1) for dose in range(times)))
+        return 0
+    for pattern, mask in _NAMED:
+        if re.search(pattern, text):
+            return mask
+    return 0
+
+def parse_duration(text: Optional[str]) -> Optional[int]:
+    """Course length in days, or None if not given in a form we understand."""
+    if not text:
+        return None
+    match = re.search(r"(\d+)\s*(d|days?|w|wks?|weeks?|m|months?)\b", text.strip().lower())
+    if not match:
+        return None
+    count, unit = int(match.group(1)), match.group(2)[0]
+    return count * {"d": 1, "w": 7, "m": 30}[unit]
+
+def doses_per_day(slots: int) -> int:
+    return bin(slots).count("1")
+
+def course_days(slots: int, duration: Optional[str], quantity: Optional[int]) -> Optional[int]:
+    days = parse_duration(duration)
+    if days is None and quantity and slots:
+        days = math.ceil(quantity / doses_per_day(slots))
+    return days
+
+def to_minute(at: datetime) -> int:
+    return int((at - _EPOCH).total_seconds() // 60)
+
+def from_minute(minute: int) -> datetime:
+    return _EPOCH + timedelta(minutes=minute)
+
+def next_due(slots: int, after: int, ends: int) -> Optional[int]:
+    """First due minute at or after ``after`` and before ``ends``, or None."""
+    if not slots:
+        return None
+    local = after + config.LOCAL_UTC_OFFSET_MINUTES
+    day, minute_of_day = divmod(local, MINUTES_PER_DAY)
+    first_slot = -(-minute_of_day // SLOT_MINUTES)
+    later = slots >> first_slot if first_slot < SLOTS_PER_DAY else 0
+    if later:
+        slot = first_slot + (later & -later).bit_length() - 1
+    else:
+        day, slot = day + 1, (slots & -slots).bit_length() - 1
+    due = day * MINUTES_PER_DAY + slot * SLOT_MINUTES - config.LOCAL_UTC_OFFSET_MINUTES
+    return due if due < ends else None
+
+def due_times(slots: int, starts: int, ends: int) -> Iterator[int]:
+    """Every due minute of a course."""
+    due = next_due(slots, starts, ends)
+    while due is not None:
+        yield due
+        due = next_due(slots, due + 1, ends)
+
+def slot_times(slots: int) -> List[str]:
+    """Local HH:MM of each daily dose."""
+    return [
+        f"{slot * SLOT_MINUTES // 60:02d}:{slot * SLOT_MINUTES % 60:02d}"
+        for slot in range(SLOTS_PER_DAY) if slots >> slot & 1
+    ]
@@ -0,0 +1,75 @@
+"""
+Order status, assignment and prescription verification events.
+
+Writers publish the transitions (or partner assignments) they committed as one
+batch after commit, so a bulk transition of many orders reaches each listener
+in a single call. Listeners run in the writer's thread and should only hand
+work off (update an in-process structure, enqueue a job); a failing listener
+is logged and does not affect the request that published.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from .models import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+class OrderTransition(NamedTuple):
+    order_id: int
+    user_id: int
+    delivery_partner_id: Optional[int]
+    from_status: OrderStatus
+    to_status: OrderStatus
+    at: datetime
+
+class OrderAssignment(NamedTuple):
+    order_id: int
+    delivery_partner_id: Optional[int]
+    previous_partner_id: Optional[int]
+    at: datetime
+
+class PrescriptionVerification(NamedTuple):
+    prescription_id: int
+    user_id: int
+    is_verified: bool
+    at: datetime
+
+_order_listeners = []
+_assignment_listeners = []
+_prescription_listeners = []
+
+def on_order_transitions(listener):
+    """Register ``listener(transitions)``, called with a tuple of ``OrderTransition``."""
+    _order_listeners.append(listener)
+    return listener
+
+def _publish(listeners, events):
+    batch: Tuple = tuple(events)
+    if not batch:
+        return
+    for listener in listeners:
+        try:
+            listener(batch)
+        except Exception:
+            logger.exception("Event listener %r failed", listener)
+
+def publish_order_transitions(transitions: Iterable[OrderTransition]):
+    _publish(_order_listeners, transitions)
+
+def on_order_assignments(listener):
+    """Register ``listener(assignments)``, called with a tuple of ``OrderAssignment``."""
+    _assignment_listeners.append(listener)
+    return listener
+
+def publish_order_assignments(assignments: Iterable[OrderAssignment]):
+    _publish(_assignment_listeners, assignments)
+
+def on_prescription_verifications(listener):
+    """Register ``listener(verifications)``, called with a tuple of ``PrescriptionVerification``."""
+    _prescription_listeners.append(listener)
+    return listener
+
+def publish_prescription_verifications(verifications: Iterable[PrescriptionVerification]):
+    _publish(_prescription_listeners, verifications)
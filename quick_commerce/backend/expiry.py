@@ -0,0 +1,55 @@
+"""
+Expiry sweeps.
+
+Expired medicines are retired (``is_available = False``) by a background
+task every ``EXPIRY_SWEEP_SECONDS`` with one set-based UPDATE, and by the
+catalog writers for the rows they touch, so catalog reads filter on
+``is_available`` alone. Each sweep also logs how much available stock expires
+within ``NEAR_EXPIRY_DAYS``; the full list is served by
+``GET /medicines/expiring``.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_SWEEP_SECONDS = 300
+NEAR_EXPIRY_DAYS = 30
+
+last_sweep: Optional[dict] = None
+
+def sweep(now: Optional[datetime] = None) -> dict:
+    global last_sweep
+    now = now or datetime.utcnow()
+    db = SessionLocal()
+    try:
+        retired = crud.sweep_expired_medicines(db, now)
+        expiring_soon = db.query(func.count(models.Medicine.id)).filter(
+            models.Medicine.is_available == True,
+            models.Medicine.expiry_date <= now + timedelta(days=NEAR_EXPIRY_DAYS)
+        ).scalar()
+    finally:
+        db.close()
+    if retired:
+        logger.info("Retired %d expired medicines", len(retired))
+    if expiring_soon:
+        logger.info("%d available medicines expire within %d days", expiring_soon, NEAR_EXPIRY_DAYS)
+    last_sweep = {"ran_at": now, "retired": len(retired), "expiring_soon": expiring_soon}
+    return last_sweep
+
+async def run_expiry_sweeper():
+    while True:
+        try:
+            await run_in_threadpool(sweep)
+        except Exception:
+            logger.exception("Expiry sweep failed")
+        await asyncio.sleep(EXPIRY_SWEEP_SECONDS)
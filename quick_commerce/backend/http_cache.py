@@ -0,0 +1,65 @@
+"""
+HTTP conditional request helpers (ETag / Last-Modified / 304).
+
+Validators are computed from cheap version information - the catalog version
+row or an indexed aggregate - so a request that ends in 304 never loads or
+serializes the ORM objects behind the full response.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+
+# Cache-Control policies per route family
+CATALOG_CACHE_CONTROL = "public, max-age=30, must-revalidate"
+CATEGORY_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+ORDER_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def if_match_failed(request: Request, etag: str) -> bool:
+    # If-Match uses strong comparison (RFC 9110 13.1.1), so weak tags never match
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return False
+    tags = [tag.strip() for tag in if_match.split(",")]
+    return not ("*" in tags or etag in tags)
+
+def conditional_response(request: Request, etag: str, last_modified: Optional[datetime],
+                         cache_control: str, build: Callable[[], Response]) -> Response:
+    """Answer 304 when the client's validators match, otherwise ``build()``."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response = build()
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,123 @@
+"""
+Time-ordered 64-bit identifiers (snowflake layout).
+
+    | 41 bits: ms since ID_EPOCH | 10 bits: worker id | 12 bits: sequence |
+
+IDs from one worker strictly increase; IDs from different workers never
+collide because each live process holds a distinct worker id. On one host the
+id is claimed without coordination by taking an exclusive lock on one of
+``MAX_WORKERS`` files in ``WORKER_ID_LOCK_DIR`` - the OS releases it when the
+process exits. Deployments spanning hosts set ``WORKER_ID`` per process
+instead.
+
+If the clock steps backwards the generator keeps counting from the last
+timestamp it issued, so IDs stay unique and ordered without blocking.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+ID_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKERS = 1 << WORKER_ID_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_ID_LOCK_DIR = "worker_ids"
+
+_EPOCH_MS = int(ID_EPOCH.timestamp() * 1000)
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+def claim_worker_id(lock_dir: str = WORKER_ID_LOCK_DIR):
+    """Return ``(worker_id, lock_file)``; keep ``lock_file`` open to hold the id."""
+    if os.environ.get("WORKER_ID"):
+        return int(os.environ["WORKER_ID"]) % MAX_WORKERS, None
+    if fcntl is None:
+        return os.getpid() % MAX_WORKERS, None
+    os.makedirs(lock_dir, exist_ok=True)
+    start = os.getpid() % MAX_WORKERS
+    for offset in range(MAX_WORKERS):
+        worker_id = (start + offset) % MAX_WORKERS
+        lock_file = open(os.path.join(lock_dir, f"{worker_id}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return worker_id, lock_file
+    raise RuntimeError(f"All {MAX_WORKERS} worker ids in {lock_dir} are taken")
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id=None):
+        self._lock = threading.Lock()
+        self._fixed_worker_id = worker_id
+        self._pid = None
+        self._worker_id = None
+        self._lock_file = None
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _ensure_worker(self):
+        # Claimed lazily and again after a fork, since a child must not share
+        # its parent's worker id
+        if self._pid == os.getpid():
+            return
+        if self._fixed_worker_id is not None:
+            self._worker_id = self._fixed_worker_id % MAX_WORKERS
+        else:
+            self._worker_id, self._lock_file = claim_worker_id()
+        self._pid = os.getpid()
+        self._last_ms = -1
+        self._sequence = 0
+
+    @property
+    def worker_id(self) -> int:
+        with self._lock:
+            self._ensure_worker()
+            return self._worker_id
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._ensure_worker()
+            now_ms = _now_ms()
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                # Sequence exhausted (or clock behind): borrow the next millisecond
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+            return (
+                (self._last_ms - _EPOCH_MS) << (WORKER_ID_BITS + SEQUENCE_BITS)
+                | self._worker_id << SEQUENCE_BITS
+                | self._sequence
+            )
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+def encode(value: int, width: int = 13) -> str:
+    # Fixed-width Crockford base32, so string order matches numeric order
+    digits = []
+    for _ in range(width):
+        value, remainder = divmod(value, 32)
+        digits.append(_CROCKFORD[remainder])
+    return "".join(reversed(digits))
+
+def timestamp_of(value: int) -> datetime:
+    ms = (value >> (WORKER_ID_BITS + SEQUENCE_BITS)) + _EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+generator = SnowflakeGenerator()
+
+def next_id() -> int:
+    return generator.next_id()
+
+def next_order_number() -> str:
+    return f"ORD-{encode(generator.next_id())}"
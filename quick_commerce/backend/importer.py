@@ -0,0 +1,170 @@
+"""
+Streaming catalog import.
+
+Parses a CSV or NDJSON request body incrementally, validates each row as it
+arrives and hands fixed-size batches to ``crud.upsert_medicine_batch``. Only
+one batch is held in memory at a time, so the cost of an import is
+proportional to the batch size rather than the file size.
+"""
+
+import codecs
+import csv
+import json
+import time
+from typing import AsyncIterator, Dict
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+async def iter_lines(chunks: AsyncIterator[bytes]):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+# Row parsers yield (row, error) pairs so one bad record does not end the stream
+async def iter_csv_rows(lines):
+    # A quoted field may contain newlines, so physical lines are joined until
+    # the record has balanced quotes before handing it to the csv module.
+    header = None
+    record = []
+    quotes = 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text = "\n".join(record)
+        record, quotes = [], 0
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as exc:
+            yield None, f"Malformed row: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield {name: value for name, value in zip(header, values) if value != ""}, None
+    if record:
+        yield None, "Malformed row: unterminated quoted field at end of file"
+
+async def iter_ndjson_rows(lines):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield None, f"Malformed row: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield None, "Malformed row: expected a JSON object"
+            continue
+        yield row, None
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+class _Report:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows_processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows_processed": self.rows_processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_processed / elapsed, 1) if elapsed else 0.0
+        }
+
+async def import_medicines(db: Session, chunks: AsyncIterator[bytes], fmt: str = "csv",
+                           batch_size: int = DEFAULT_BATCH_SIZE):
+    report = _Report()
+    category_ids: Dict[str, int] = await run_in_threadpool(crud.get_category_id_map, db)
+    known_category_ids = set(category_ids.values())
+    batch = {}
+
+    async def flush():
+        rows = list(batch.values())
+        batch.clear()
+        try:
+            inserted, updated = await run_in_threadpool(
+                crud.retry_on_conflict, db, crud.upsert_medicine_batch, [row for _, row in rows]
+            )
+        except SQLAlchemyError as exc:
+            db.rollback()
+            for row_number, _ in rows:
+                report.error(row_number, f"Batch rejected by database: {exc.__class__.__name__}")
+            return
+        report.inserted += inserted
+        report.updated += updated
+
+    parser = iter_ndjson_rows if fmt == "ndjson" else iter_csv_rows
+    row_number = 0
+    async for raw, parse_error in parser(iter_lines(chunks)):
+        row_number += 1
+        report.rows_processed += 1
+        if parse_error:
+            report.error(row_number, parse_error)
+            continue
+        try:
+            item = schemas.MedicineImportRow.model_validate(raw)
+        except ValidationError as exc:
+            report.error(row_number, _format_validation_error(exc))
+            continue
+
+        values = item.dict(exclude_unset=True, exclude={"category"})
+        if item.category_id is None:
+            category_id = category_ids.get((item.category or "").strip().lower())
+            if category_id is None:
+                report.error(row_number, f"Unknown category: {item.category!r}")
+                continue
+            values["category_id"] = category_id
+        elif item.category_id not in known_category_ids:
+            # SQLite does not enforce the foreign key, and a medicine without
+            # its category cannot be served
+            report.error(row_number, f"Unknown category_id: {item.category_id}")
+            continue
+        if "stock_quantity" in values and "is_available" not in values:
+            values["is_available"] = values["stock_quantity"] > 0
+
+        # Later rows for the same natural key win within a batch
+        batch[crud.medicine_natural_key(item.name, item.strength, item.manufacturer)] = (row_number, values)
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    return report.as_dict()
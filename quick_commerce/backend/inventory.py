@@ -0,0 +1,90 @@
+"""
+Bulk stock synchronization for pharmacy POS feeds.
+
+Stock entries are coalesced per medicine before they reach the database:
+absolute values replace whatever came before them and deltas accumulate on
+top. Feeds can either apply a snapshot immediately or defer it into a shared
+buffer that a background task flushes once per ``STOCK_SYNC_WINDOW_SECONDS``,
+so repeated pushes for the same SKU inside the window cost one UPDATE.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STOCK_SYNC_WINDOW_SECONDS = 2.0
+
+# medicine_id -> (absolute base or None, accumulated delta)
+PendingStock = Dict[int, Tuple[Optional[int], int]]
+
+def coalesce_stock_entries(entries: Iterable[schemas.StockSyncEntry], mode: str,
+                           pending: Optional[PendingStock] = None) -> PendingStock:
+    pending = {} if pending is None else pending
+    for entry in entries:
+        if mode == "absolute":
+            pending[entry.medicine_id] = (entry.quantity, 0)
+        else:
+            base, delta = pending.get(entry.medicine_id, (None, 0))
+            pending[entry.medicine_id] = (base, delta + entry.quantity)
+    return pending
+
+class StockSyncBuffer:
+    def __init__(self):
+        self._pending: PendingStock = {}
+        self._lock = threading.Lock()
+
+    def add(self, entries, mode: str) -> int:
+        with self._lock:
+            coalesce_stock_entries(entries, mode, self._pending)
+            return len(self._pending)
+
+    def drain(self) -> PendingStock:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: PendingStock):
+        """Put back a drained batch that was not applied, under anything added since."""
+        with self._lock:
+            for medicine_id, (base, delta) in pending.items():
+                newer = self._pending.get(medicine_id)
+                if newer is None:
+                    self._pending[medicine_id] = (base, delta)
+                elif newer[0] is None:
+                    # Later deltas still apply on top of the earlier entry
+                    self._pending[medicine_id] = (base, delta + newer[1])
+
+stock_sync_buffer = StockSyncBuffer()
+
+def flush_stock_sync_buffer():
+    pending = stock_sync_buffer.drain()
+    if not pending:
+        return None
+    db = SessionLocal()
+    try:
+        return crud.apply_stock_sync(db, pending)
+    except SQLAlchemyError:
+        # Nothing was committed (e.g. "database is locked"); keep the batch
+        # for the next flush rather than losing the coalesced deltas
+        db.rollback()
+        stock_sync_buffer.restore(pending)
+        raise
+    finally:
+        db.close()
+
+async def run_stock_sync_flusher():
+    while True:
+        await asyncio.sleep(STOCK_SYNC_WINDOW_SECONDS)
+        try:
+            await run_in_threadpool(flush_stock_sync_buffer)
+        except Exception:
+            logger.exception("Stock sync flush failed")
@@ -0,0 +1,200 @@
+"""
+Durable background jobs.
+
+Follow-up work (partner assignment after checkout, restocking a cancelled
+order, attaching a verified prescription to the cart) is enqueued into the
+``jobs`` table inside the transaction that makes it necessary, so it is never
+lost and never runs for a change that rolled back. ``JOB_WORKERS`` asyncio
+workers in the backend process claim due jobs, run their handler in the
+thread pool and retry failures with exponential backoff; a job left running
+by a process that died is picked up again once its lease expires.
+
+Handlers must be idempotent: a job can run more than once if its worker dies
+after the handler committed. Jobs enqueued with the same dedupe key collapse
+into one.
+
+    python -m backend.jobs stats
+    python -m backend.jobs drain
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, stores
+from .database import SessionLocal
+from .models import JobStatus
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 4
+JOB_POLL_SECONDS = 1
+JOB_RETENTION = timedelta(days=7)
+JOB_PRUNE_SECONDS = 3600
+
+_handlers: Dict[str, Callable] = {}
+
+def handler(kind: str):
+    """Register ``fn(db, payload)`` as the handler for jobs of ``kind``."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+# Wake-ups: a commit that enqueued jobs wakes idle workers at once instead of
+# leaving the jobs for the next poll
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("jobs_enqueued", False) and _loop is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
+
+# In-process counters since startup, by job kind
+_counter_lock = threading.Lock()
+counters = {"done": Counter(), "retried": Counter(), "failed": Counter()}
+
+def _count(outcome: str, kind: str):
+    with _counter_lock:
+        counters[outcome][kind] += 1
+
+def run_next(db) -> Optional[str]:
+    """Claim and run one due job; returns its kind, or None if none is due."""
+    job = crud.claim_job(db)
+    if job is None:
+        return None
+    fn = _handlers.get(job.kind)
+    try:
+        if fn is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}")
+        fn(db, json.loads(job.payload))
+    except Exception as exc:
+        db.rollback()
+        status = crud.fail_job(db, job.id, job.attempts, job.max_attempts, f"{type(exc).__name__}: {exc}")
+        if status == JobStatus.FAILED:
+            logger.exception("Job %d (%s) failed after %d attempts", job.id, job.kind, job.attempts)
+            _count("failed", job.kind)
+        else:
+            logger.warning("Job %d (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, exc)
+            _count("retried", job.kind)
+    else:
+        crud.finish_job(db, job.id, job.attempts)
+        _count("done", job.kind)
+    return job.kind
+
+def _run_next_job() -> Optional[str]:
+    db = SessionLocal()
+    try:
+        return run_next(db)
+    finally:
+        db.close()
+
+def drain() -> int:
+    """Run due jobs until none is left; returns how many ran."""
+    ran = 0
+    while _run_next_job() is not None:
+        ran += 1
+    return ran
+
+async def _worker():
+    while True:
+        try:
+            kind = await run_in_threadpool(_run_next_job)
+        except Exception:
+            logger.exception("Job worker failed to claim a job")
+            kind = None
+        if kind is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+def _prune_jobs():
+    db = SessionLocal()
+    try:
+        return crud.prune_jobs(db, datetime.utcnow() - JOB_RETENTION)
+    finally:
+        db.close()
+
+async def _pruner():
+    while True:
+        await asyncio.sleep(JOB_PRUNE_SECONDS)
+        try:
+            pruned = await run_in_threadpool(_prune_jobs)
+            if pruned:
+                logger.info("Pruned %d finished jobs", pruned)
+        except Exception:
+            logger.exception("Job pruning failed")
+
+async def run_job_workers():
+    global _loop, _wakeup
+    _loop, _wakeup = asyncio.get_running_loop(), asyncio.Event()
+    try:
+        await asyncio.gather(_pruner(), *(_worker() for _ in range(JOB_WORKERS)))
+    finally:
+        _loop = None
+
+def stats(db) -> dict:
+    counts, oldest_due_seconds = crud.get_job_counts(db)
+    with _counter_lock:
+        processed = {outcome: dict(by_kind) for outcome, by_kind in counters.items()}
+    return {
+        "queued": counts[JobStatus.QUEUED],
+        "running": counts[JobStatus.RUNNING],
+        "failed": counts[JobStatus.FAILED],
+        "done": counts[JobStatus.DONE],
+        "oldest_due_seconds": round(oldest_due_seconds, 3),
+        "processed": processed,
+    }
+
+# Handlers
+@handler("orders.assign_partner")
+def _assign_partner(db, payload):
+    crud.auto_assign_delivery_partner(db, payload["order_id"])
+
+@handler("orders.restock_cancelled")
+def _restock_cancelled(db, payload):
+    store_id, quantities = crud.restock_cancelled_order(db, payload["order_id"])
+    if store_id is not None:
+        stores.stock_map.adjust(store_id, quantities)
+
+@handler("prescriptions.attach_to_cart")
+def _attach_prescription(db, payload):
+    crud.attach_prescription_to_cart(db, payload["prescription_id"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.jobs", description="Background job tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="print queue depth and lag")
+    commands.add_parser("drain", help="run every due job now, in this process")
+    args = parser.parse_args(argv)
+
+    if args.command == "drain":
+        print(f"Ran {drain()} jobs")
+        return 0
+    db = SessionLocal()
+    try:
+        for key, value in stats(db).items():
+            if key != "processed":
+                print(f"{key}\t{value}")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
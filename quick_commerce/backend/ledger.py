@@ -0,0 +1,152 @@
+"""
+Stock ledger compaction and replay.
+
+``stock_movements`` is append-only: orders, restocks, adjustments and expiry
+write-offs each add signed rows, and ``medicines.stock_quantity`` is the
+projection maintained alongside them. Periodic compaction folds the movements
+since the previous compaction into ``stock_snapshots``, so stock at any point
+in time is the latest snapshot row per medicine plus the movements after it.
+
+    python -m backend.ledger compact
+    python -m backend.ledger replay --at 2026-10-01T00:00:00 [--medicine 42]
+    python -m backend.ledger verify
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+STOCK_COMPACTION_SECONDS = 3600
+
+def _last_snapshot_cut(db: Session, upto: Optional[int] = None) -> int:
+    if upto is None:
+        return db.execute(text("SELECT COALESCE(MAX(movement_id), 0) FROM stock_snapshots")).scalar()
+    return db.execute(text(
+        "SELECT COALESCE(MAX(movement_id), 0) FROM stock_snapshots WHERE movement_id <= :upto"
+    ), {"upto": upto}).scalar()
+
+def _medicine_filter(column: str, medicine_ids: Optional[Iterable[int]], params: dict) -> str:
+    if medicine_ids is None:
+        return ""
+    ids = sorted(set(medicine_ids))
+    if not ids:
+        return "AND 0"
+    params.update({f"m{index}": medicine_id for index, medicine_id in enumerate(ids)})
+    return f"AND {column} IN ({', '.join(f':m{index}' for index in range(len(ids)))})"
+
+def compact(db: Session) -> dict:
+    """Fold movements since the last compaction into one snapshot cut."""
+    last = _last_snapshot_cut(db)
+    cut = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM stock_movements")).scalar()
+    if cut == last:
+        return {"cut": cut, "medicines": 0}
+    written = db.execute(text("""
+        INSERT INTO stock_snapshots (medicine_id, movement_id, stock_quantity, taken_at)
+        SELECT m.medicine_id, :cut, COALESCE((
+            SELECT p.stock_quantity FROM stock_snapshots p
+            WHERE p.medicine_id = m.medicine_id ORDER BY p.movement_id DESC LIMIT 1
+        ), 0) + SUM(m.quantity), :now
+        FROM stock_movements m
+        WHERE m.id > :last AND m.id <= :cut
+        GROUP BY m.medicine_id
+    """), {"cut": cut, "last": last, "now": datetime.utcnow()}).rowcount
+    db.commit()
+    return {"cut": cut, "medicines": written}
+
+def stock_at(db: Session, at: Optional[datetime] = None, medicine_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Rebuild stock per medicine as of ``at`` (default: now) from the ledger."""
+    if at is None:
+        cut = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM stock_movements")).scalar()
+    else:
+        cut = db.execute(text(
+            "SELECT COALESCE(MAX(id), 0) FROM stock_movements WHERE created_at <= :at"
+        ), {"at": at}).scalar()
+    snapshot_cut = _last_snapshot_cut(db, cut)
+    params = {"cut": cut, "snapshot_cut": snapshot_cut}
+
+    stock = {}
+    # Latest snapshot row per medicine at or before the cut...
+    for medicine_id, quantity in db.execute(text(f"""
+        SELECT s.medicine_id, s.stock_quantity FROM stock_snapshots s
+        WHERE s.movement_id = (
+            SELECT MAX(p.movement_id) FROM stock_snapshots p
+            WHERE p.medicine_id = s.medicine_id AND p.movement_id <= :snapshot_cut
+        ) {_medicine_filter("s.medicine_id", medicine_ids, params)}
+    """), params):
+        stock[medicine_id] = quantity
+    # ...plus the movements after it
+    for medicine_id, quantity in db.execute(text(f"""
+        SELECT medicine_id, SUM(quantity) FROM stock_movements
+        WHERE id > :snapshot_cut AND id <= :cut {_medicine_filter("medicine_id", medicine_ids, params)}
+        GROUP BY medicine_id
+    """), params):
+        stock[medicine_id] = stock.get(medicine_id, 0) + quantity
+    return stock
+
+def verify(db: Session) -> Dict[int, tuple]:
+    """Medicines whose projection disagrees with the ledger: id -> (projection, ledger)."""
+    ledger = stock_at(db)
+    drift = {}
+    for medicine_id, projection in db.execute(text("SELECT id, stock_quantity FROM medicines")):
+        expected = ledger.pop(medicine_id, 0)
+        if projection != expected:
+            drift[medicine_id] = (projection, expected)
+    return drift
+
+def compact_stock_ledger():
+    db = SessionLocal()
+    try:
+        return compact(db)
+    finally:
+        db.close()
+
+async def run_stock_compactor():
+    while True:
+        await asyncio.sleep(STOCK_COMPACTION_SECONDS)
+        try:
+            result = await run_in_threadpool(compact_stock_ledger)
+            logger.info("Stock ledger compacted to movement %d (%d medicines)", result["cut"], result["medicines"])
+        except Exception:
+            logger.exception("Stock ledger compaction failed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.ledger", description="Stock ledger tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compact", help="fold new movements into a snapshot")
+    replay = commands.add_parser("replay", help="print stock per medicine at a point in time")
+    replay.add_argument("--at", type=datetime.fromisoformat, default=None, help="ISO timestamp (UTC); default now")
+    replay.add_argument("--medicine", type=int, action="append", help="limit to these medicine ids")
+    commands.add_parser("verify", help="compare medicines.stock_quantity with the ledger")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "compact":
+            result = compact(db)
+            print(f"Compacted to movement {result['cut']} ({result['medicines']} medicines)")
+        elif args.command == "replay":
+            for medicine_id, quantity in sorted(stock_at(db, args.at, args.medicine).items()):
+                print(f"{medicine_id}\t{quantity}")
+        else:
+            drift = verify(db)
+            for medicine_id, (projection, expected) in sorted(drift.items()):
+                print(f"{medicine_id}\tprojection={projection}\tledger={expected}")
+            print("OK" if not drift else f"{len(drift)} medicines drifted")
+            return 1 if drift else 0
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
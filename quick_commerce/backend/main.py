@@ -1,18 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm.exc import StaleDataError
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Union
+import asyncio
 import os
 import shutil
 from datetime import datetime
 
-from . import crud, schemas, auth, models
+from . import crud, schemas, auth, models, migrations, importer, inventory, cache, http_cache, snapshot, search, expiry, stores, ledger, assignments, jobs, notifications, reminders, dosing, analytics
 from .database import engine, get_db
 from .dependencies import get_current_active_user, require_pharmacy_admin, require_pharmacist, require_delivery_partner
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Create database tables and apply pending schema migrations
+migrations.run_migrations(engine)
 
 app = FastAPI(
     title="Quick Commerce Medicine Delivery API",
@@ -29,6 +34,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Background tasks
+@app.on_event("startup")
+async def start_background_tasks():
+    # Map the last catalog snapshot so in-process indexes start warm
+    snapshot.load_current()
+    app.state.background_tasks = [
+        asyncio.create_task(inventory.run_stock_sync_flusher()),
+        asyncio.create_task(snapshot.run_snapshot_refresher()),
+        asyncio.create_task(search.run_index_refresher()),
+        asyncio.create_task(expiry.run_expiry_sweeper()),
+        asyncio.create_task(ledger.run_stock_compactor()),
+        asyncio.create_task(jobs.run_job_workers()),
+        asyncio.create_task(notifications.run_notification_dispatcher()),
+        asyncio.create_task(reminders.run_reminder_scheduler()),
+        asyncio.create_task(analytics.run_rollup_aggregator()),
+    ]
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in app.state.background_tasks:
+        task.cancel()
+    inventory.flush_stock_sync_buffer()
+    notifications.dispatcher.flush(force=True)
+
+# Catalog response cache
+_medicine_list_json = TypeAdapter(List[schemas.MedicineOut])
+_medicine_json = TypeAdapter(schemas.MedicineOut)
+_category_list_json = TypeAdapter(List[schemas.CategoryOut])
+_category_json = TypeAdapter(schemas.CategoryOut)
+_facets_json = TypeAdapter(schemas.MedicineFacets)
+_order_list_json = TypeAdapter(List[schemas.OrderOut])
+_order_summary_list_json = TypeAdapter(List[schemas.OrderSummary])
+_order_json = TypeAdapter(schemas.OrderOut)
+_assignment_list_json = TypeAdapter(List[schemas.DeliveryAssignment])
+
+def cached_json_response(key, tags, build):
+    """Serve pre-serialized JSON from the catalog cache, building it on a miss."""
+    body = cache.catalog_cache.get(key)
+    if body is None:
+        generation = cache.catalog_cache.generation
+        body = build()
+        if body is None:
+            return None
+        cache.catalog_cache.set(key, body, tags, generation)
+    return Response(content=body, media_type="application/json")
+
+def dump_json(adapter: TypeAdapter, obj) -> bytes:
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+# Optimistic concurrency: Medicine and Order carry a row version, exposed as
+# their ETag. PUT/PATCH honour If-Match (412 when it no longer matches); a
+# write that loses a race after the check answers 409.
+@app.exception_handler(StaleDataError)
+async def version_conflict_handler(request: Request, exc: StaleDataError):
+    return JSONResponse(status_code=409, content={"detail": "Resource was modified concurrently; reload and retry"})
+
+@app.exception_handler(crud.InvalidStatusTransition)
+async def invalid_transition_handler(request: Request, exc: crud.InvalidStatusTransition):
+    return JSONResponse(status_code=409, content={"detail": str(exc), "status": exc.current.value})
+
+# Checkout validates the cart's prescriptions inside the order transaction
+@app.exception_handler(crud.CartPrescriptionError)
+async def cart_prescription_handler(request: Request, exc: crud.CartPrescriptionError):
+    return JSONResponse(
+        status_code=400, content={"detail": {"message": "Cart has prescription issues", "issues": exc.issues}}
+    )
+
+def medicine_etag(medicine_id: int, version: int) -> str:
+    return http_cache.make_etag("medicine", medicine_id, version)
+
+def order_etag(order_id: int, version: int) -> str:
+    return http_cache.make_etag("order", order_id, version)
+
+def expected_version(request: Request, etag: str, version: int) -> Optional[int]:
+    """Version an If-Match request pins the write to; None for unconditional writes."""
+    if "if-match" not in request.headers:
+        return None
+    if http_cache.if_match_failed(request, etag):
+        raise HTTPException(status_code=412, detail="Precondition failed: resource has changed")
+    return version
+
 # File upload directory
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -80,16 +166,26 @@ def verify_phone(verification: schemas.PhoneVerification, db: Session = Depends(
 
 # Medicine endpoints
 @app.get("/medicines", response_model=List[schemas.MedicineOut])
-def get_medicines(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_medicines(db, skip=skip, limit=limit)
+def get_medicines(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    version, updated_at = crud.get_catalog_state(db)
+    return http_cache.conditional_response(
+        request, http_cache.make_etag("medicines", version, skip, limit), updated_at,
+        http_cache.CATALOG_CACHE_CONTROL,
+        lambda: cached_json_response(
+            ("medicines", skip, limit), ["medicines"],
+            lambda: dump_json(_medicine_list_json, crud.get_medicines(db, skip=skip, limit=limit))
+        )
+    )
 
-@app.get("/medicines/search", response_model=List[schemas.MedicineOut])
+@app.get("/medicines/search", response_model=Union[List[schemas.MedicineOut], schemas.MedicineSearchResult])
 def search_medicines(
+    request: Request,
     q: Optional[str] = None,
     category_id: Optional[int] = None,
     prescription_required: Optional[bool] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
+    facets: bool = False,
     db: Session = Depends(get_db)
 ):
     search_params = schemas.MedicineSearch(
@@ -99,18 +195,98 @@ def search_medicines(
         min_price=min_price,
         max_price=max_price
     )
-    return crud.search_medicines(db, search_params)
+
+    # With facets=true the body is {"items": [...], "facets": {...}}
+    def build_body():
+        items = dump_json(_medicine_list_json, crud.search_medicines(db, search_params))
+        if not facets:
+            return items
+        facet_counts = dump_json(_facets_json, search.get_facets(db, search_params))
+        return b'{"items":' + items + b',"facets":' + facet_counts + b'}'
+
+    key = ("search", q, category_id, prescription_required, min_price, max_price, facets)
+    version, updated_at = crud.get_catalog_state(db)
+    return http_cache.conditional_response(
+        request, http_cache.make_etag(*key, version), updated_at,
+        http_cache.CATALOG_CACHE_CONTROL,
+        lambda: cached_json_response(key, ["medicines"], build_body)
+    )
+
+@app.get("/medicines/suggest", response_model=List[schemas.MedicineSuggestion])
+def suggest_medicines(prefix: str, limit: int = 10):
+    if not 1 <= limit <= search.SUGGEST_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {search.SUGGEST_MAX_LIMIT}")
+    return Response(content=search.suggest_index.suggest_json(prefix[:100], limit), media_type="application/json")
+
+@app.get("/medicines/expiring", response_model=schemas.ExpiryReport)
+def get_expiring_medicines(
+    days: int = expiry.NEAR_EXPIRY_DAYS,
+    limit: int = 100,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    if days < 0 or not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="days must be >= 0 and limit between 1 and 1000")
+    return {"last_sweep": expiry.last_sweep, "items": crud.get_expiring_medicines(db, days, limit)}
+
+@app.post("/medicines/expiry/sweep", response_model=schemas.ExpirySweep)
+def sweep_expired_medicines(current_user: models.User = Depends(require_pharmacy_admin)):
+    return expiry.sweep()
+
+@app.get("/medicines/nearby", response_model=List[schemas.MedicineOut])
+def get_medicines_nearby(
+    latitude: float,
+    longitude: float,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    # Catalog restricted to medicines in stock at stores that deliver here
+    store_ids = [store.id for _, store in stores.stores_in_range(db, latitude, longitude)]
+    if not store_ids:
+        return []
+    return crud.get_medicines_at_stores(db, store_ids, skip=skip, limit=limit)
+
+@app.get("/medicines/changes", response_model=schemas.MedicineChanges)
+def get_medicine_changes(since: int = 0, limit: int = 500, db: Session = Depends(get_db)):
+    if since < 0 or not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="since must be >= 0 and limit between 1 and 5000")
+    return crud.get_medicine_changes(db, since=since, limit=limit)
 
 @app.get("/medicines/{medicine_id}", response_model=schemas.MedicineOut)
-def get_medicine(medicine_id: int, db: Session = Depends(get_db)):
-    medicine = crud.get_medicine(db, medicine_id)
-    if not medicine:
+def get_medicine(request: Request, medicine_id: int, db: Session = Depends(get_db)):
+    tags = [f"medicine:{medicine_id}"]
+
+    def build_body():
+        medicine = crud.get_medicine(db, medicine_id)
+        if not medicine:
+            return None
+        tags.append(f"category:{medicine.category_id}")
+        return dump_json(_medicine_json, medicine)
+
+    def build():
+        response = cached_json_response(("medicine", medicine_id), tags, build_body)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Medicine not found")
+        return response
+
+    state = crud.get_medicine_state(db, medicine_id)
+    if not state:
         raise HTTPException(status_code=404, detail="Medicine not found")
-    return medicine
+    return http_cache.conditional_response(
+        request, medicine_etag(medicine_id, state.version), state.updated_at or state.created_at,
+        http_cache.CATALOG_CACHE_CONTROL, build
+    )
+
+@app.get("/medicines/{medicine_id}/availability", response_model=List[schemas.StoreAvailability])
+def get_medicine_availability(medicine_id: int, latitude: float, longitude: float, db: Session = Depends(get_db)):
+    return stores.medicine_availability(db, medicine_id, latitude, longitude)
 
 @app.get("/medicines/{medicine_id}/alternatives", response_model=List[schemas.MedicineOut])
-def get_alternative_medicines(medicine_id: int, db: Session = Depends(get_db)):
-    return crud.get_alternative_medicines(db, medicine_id)
+def get_alternative_medicines(medicine_id: int, skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+    if skip < 0 or not 1 <= limit <= search.ALTERNATIVES_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"skip must be >= 0 and limit between 1 and {search.ALTERNATIVES_MAX_LIMIT}")
+    return search.get_alternatives(db, medicine_id, skip=skip, limit=limit)
 
 @app.post("/medicines", response_model=schemas.MedicineOut)
 def create_medicine(
@@ -120,30 +296,81 @@ def create_medicine(
 ):
     return crud.create_medicine(db, medicine)
 
+@app.post("/medicines/import", response_model=schemas.MedicineImportReport)
+async def import_medicines(
+    request: Request,
+    format: Optional[str] = None,
+    batch_size: int = importer.DEFAULT_BATCH_SIZE,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    # Body is streamed; format defaults from the Content-Type header
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'ndjson'")
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="Batch size must be positive")
+    return await importer.import_medicines(db, request.stream(), format, batch_size)
+
 @app.put("/medicines/{medicine_id}", response_model=schemas.MedicineOut)
 def update_medicine(
+    request: Request,
+    response: Response,
     medicine_id: int,
     medicine: schemas.MedicineUpdate,
     current_user: models.User = Depends(require_pharmacy_admin),
     db: Session = Depends(get_db)
 ):
-    updated_medicine = crud.update_medicine(db, medicine_id, medicine)
+    state = crud.get_medicine_state(db, medicine_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    version = expected_version(request, medicine_etag(medicine_id, state.version), state.version)
+    if version is None:
+        updated_medicine = crud.retry_on_conflict(db, crud.update_medicine, medicine_id, medicine)
+    else:
+        updated_medicine = crud.update_medicine(db, medicine_id, medicine, expected_version=version)
     if not updated_medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
+    response.headers["ETag"] = medicine_etag(medicine_id, updated_medicine.version)
     return updated_medicine
 
 @app.patch("/medicines/{medicine_id}/stock", response_model=schemas.MedicineOut)
 def update_medicine_stock(
+    request: Request,
+    response: Response,
     medicine_id: int,
     stock_update: schemas.StockUpdate,
     current_user: models.User = Depends(require_pharmacy_admin),
     db: Session = Depends(get_db)
 ):
-    updated_medicine = crud.update_medicine_stock(db, medicine_id, stock_update)
+    state = crud.get_medicine_state(db, medicine_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    version = expected_version(request, medicine_etag(medicine_id, state.version), state.version)
+    if version is None:
+        updated_medicine = crud.retry_on_conflict(db, crud.update_medicine_stock, medicine_id, stock_update)
+    else:
+        updated_medicine = crud.update_medicine_stock(db, medicine_id, stock_update, expected_version=version)
     if not updated_medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
+    response.headers["ETag"] = medicine_etag(medicine_id, updated_medicine.version)
     return updated_medicine
 
+@app.post("/medicines/stock/sync", response_model=schemas.StockSyncResult)
+def sync_medicine_stock(
+    sync: schemas.StockSyncRequest,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    if sync.defer:
+        pending = inventory.stock_sync_buffer.add(sync.entries, sync.mode)
+        return {"received": len(sync.entries), "coalesced": pending, "applied": 0, "deferred": True}
+    pending = inventory.coalesce_stock_entries(sync.entries, sync.mode)
+    result = crud.apply_stock_sync(db, pending)
+    return {"received": len(sync.entries), "coalesced": len(pending), **result}
+
 @app.delete("/medicines/{medicine_id}")
 def delete_medicine(
     medicine_id: int,
@@ -155,17 +382,57 @@ def delete_medicine(
         raise HTTPException(status_code=404, detail="Medicine not found")
     return {"message": "Medicine deleted successfully"}
 
+# Catalog snapshot
+@app.get("/catalog/snapshot")
+async def get_catalog_snapshot(request: Request):
+    if snapshot.current is None:
+        await run_in_threadpool(snapshot.refresh_snapshot)
+    # Validators come from the file being sent, which another worker may have
+    # replaced; the open file keeps serving that version even if it is
+    # replaced again mid-response
+    source, seq = await run_in_threadpool(snapshot.open_published)
+    etag = http_cache.make_etag("snapshot", snapshot.FORMAT_VERSION, seq)
+    response = http_cache.conditional_response(
+        request, etag, None, http_cache.CATALOG_CACHE_CONTROL,
+        lambda: StreamingResponse(
+            snapshot.iter_file(source), media_type="application/octet-stream",
+            headers={"X-Catalog-Seq": str(seq), "Content-Length": str(os.fstat(source.fileno()).st_size)}
+        )
+    )
+    if response.status_code == 304:
+        source.close()
+    return response
+
 # Category endpoints
 @app.get("/categories", response_model=List[schemas.CategoryOut])
-def get_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_categories(db, skip=skip, limit=limit)
+def get_categories(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    version, updated_at = crud.get_catalog_state(db)
+    return http_cache.conditional_response(
+        request, http_cache.make_etag("categories", version, skip, limit), updated_at,
+        http_cache.CATEGORY_CACHE_CONTROL,
+        lambda: cached_json_response(
+            ("categories", skip, limit), ["categories"],
+            lambda: dump_json(_category_list_json, crud.get_categories(db, skip=skip, limit=limit))
+        )
+    )
 
 @app.get("/categories/{category_id}", response_model=schemas.CategoryOut)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    category = crud.get_category(db, category_id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    return category
+def get_category(request: Request, category_id: int, db: Session = Depends(get_db)):
+    def build_body():
+        category = crud.get_category(db, category_id)
+        return dump_json(_category_json, category) if category else None
+
+    def build():
+        response = cached_json_response(("category", category_id), [f"category:{category_id}"], build_body)
+        if response is None:
+            raise HTTPException(status_code=404, detail="Category not found")
+        return response
+
+    version, updated_at = crud.get_catalog_state(db)
+    return http_cache.conditional_response(
+        request, http_cache.make_etag("category", version, category_id), updated_at,
+        http_cache.CATEGORY_CACHE_CONTROL, build
+    )
 
 @app.post("/categories", response_model=schemas.CategoryOut)
 def create_category(
@@ -246,11 +513,30 @@ def verify_prescription(
     current_user: models.User = Depends(require_pharmacist),
     db: Session = Depends(get_db)
 ):
+    if verification.medicines and any(item.quantity <= 0 for item in verification.medicines):
+        raise HTTPException(status_code=400, detail="Prescribed quantities must be positive")
     prescription = crud.verify_prescription(db, prescription_id, verification, current_user.id)
     if not prescription:
         raise HTTPException(status_code=404, detail="Prescription not found")
     return prescription
 
+# Medicine reminder endpoints
+@app.get("/reminders", response_model=List[schemas.ReminderScheduleOut])
+def get_reminders(
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    now = dosing.to_minute(datetime.utcnow())
+    result = []
+    for schedule, medicine_name in crud.get_user_reminder_schedules(db, current_user.id):
+        due = dosing.next_due(schedule.slots, now, dosing.to_minute(schedule.ends_at))
+        result.append(schemas.ReminderScheduleOut(
+            id=schedule.id, prescription_id=schedule.prescription_id, medicine_id=schedule.medicine_id,
+            medicine_name=medicine_name, times=dosing.slot_times(schedule.slots),
+            next_due_at=dosing.from_minute(due) if due is not None else None, ends_at=schedule.ends_at
+        ))
+    return result
+
 # Cart endpoints
 @app.get("/cart", response_model=schemas.CartOut)
 def get_cart(
@@ -259,6 +545,31 @@ def get_cart(
 ):
     return crud.get_user_cart(db, current_user.id)
 
+@app.get("/cart/summary", response_model=schemas.CartSummary)
+def get_cart_summary(
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return crud.get_cart_summary(db, current_user.id)
+
+@app.post("/cart/validate-prescriptions", response_model=schemas.PrescriptionValidation)
+def validate_cart_prescriptions(
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    return crud.validate_cart_prescriptions(db, current_user.id)
+
+@app.patch("/cart", response_model=schemas.CartOut)
+def update_cart(
+    batch: schemas.CartBatchUpdate,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    cart = crud.apply_cart_operations(db, current_user.id, batch.operations)
+    if cart is None:
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    return cart
+
 @app.post("/cart/items", response_model=schemas.CartItemOut)
 def add_to_cart(
     cart_item: schemas.CartItemCreate,
@@ -305,39 +616,122 @@ def create_order(
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    order = crud.create_order(db, current_user.id, order_data)
+    store_id = None
+    if order_data.delivery_latitude is not None and order_data.delivery_longitude is not None:
+        quantities = crud.get_cart_quantities(db, current_user.id)
+        in_range, store_id = stores.choose_fulfilling_store(
+            db, order_data.delivery_latitude, order_data.delivery_longitude, quantities
+        )
+        if in_range and store_id is None:
+            raise HTTPException(status_code=400, detail="No store delivering to this address has every cart item in stock")
+    order, store_deltas = crud.retry_on_conflict(db, crud.create_order, current_user.id, order_data, store_id=store_id)
     if not order:
-        raise HTTPException(status_code=400, detail="Cannot create order with empty cart")
+        raise HTTPException(status_code=400, detail="Cannot create order: cart is empty or store stock changed")
+    if store_deltas:
+        stores.stock_map.adjust(store_id, store_deltas)
     return order
 
-@app.get("/orders", response_model=List[schemas.OrderOut])
+@app.get("/orders", response_model=Union[List[schemas.OrderOut], List[schemas.OrderSummary]])
 def get_user_orders(
+    request: Request,
+    view: schemas.OrderView = "full",
+    skip: int = 0,
+    limit: int = crud.ORDER_LIST_LIMIT,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    return crud.get_user_orders(db, current_user.id)
+    """Newest orders first. ``view=summary`` returns totals, dates and item
+    counts only; items are then loaded per order from ``/orders/{id}``."""
+    limit = max(1, min(limit, crud.ORDER_LIST_LIMIT))
+
+    def build():
+        if view == "summary":
+            body = dump_json(_order_summary_list_json, crud.get_user_order_summaries(db, current_user.id, skip, limit))
+        else:
+            body = dump_json(_order_list_json, crud.get_user_orders(db, current_user.id, skip, limit))
+        return Response(content=body, media_type="application/json")
+
+    count, last_id, versions, last_modified = crud.get_user_orders_state(db, current_user.id)
+    return http_cache.conditional_response(
+        request, http_cache.make_etag("orders", current_user.id, view, skip, limit, count, last_id, versions),
+        last_modified, http_cache.ORDER_CACHE_CONTROL, build
+    )
 
 @app.get("/orders/{order_id}", response_model=schemas.OrderOut)
 def get_order(
+    request: Request,
     order_id: int,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    order = crud.get_order(db, order_id)
-    if not order or order.user_id != current_user.id:
+    state = crud.get_order_state(db, order_id)
+    if not state or state.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    last_modified = state.updated_at or state.created_at
+    return http_cache.conditional_response(
+        request, order_etag(order_id, state.version), last_modified,
+        http_cache.ORDER_CACHE_CONTROL,
+        lambda: Response(
+            content=dump_json(_order_json, crud.get_order_detail(db, order_id)),
+            media_type="application/json"
+        )
+    )
+
+@app.post("/orders/status/bulk", response_model=schemas.BulkOrderTransitionResult)
+def transition_orders(
+    bulk: schemas.BulkOrderTransition,
+    current_user: models.User = Depends(require_delivery_partner),
+    db: Session = Depends(get_db)
+):
+    if len(bulk.transitions) > crud.BULK_TRANSITION_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {crud.BULK_TRANSITION_MAX} transitions per request")
+    transitions = {transition.order_id: transition.status for transition in bulk.transitions}
+    if len(transitions) != len(bulk.transitions):
+        raise HTTPException(status_code=400, detail="Each order may appear only once per request")
+    return crud.transition_orders(db, transitions, partner_id=current_user.id)
 
 @app.patch("/orders/{order_id}/status", response_model=schemas.OrderOut)
 def update_order_status(
+    request: Request,
+    response: Response,
     order_id: int,
     status_update: schemas.OrderStatusUpdate,
     current_user: models.User = Depends(require_delivery_partner),
     db: Session = Depends(get_db)
 ):
-    order = crud.update_order_status(db, order_id, status_update.status)
+    state = crud.get_order_state(db, order_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Order not found")
+    version = expected_version(request, order_etag(order_id, state.version), state.version)
+    if version is None:
+        order = crud.retry_on_conflict(db, crud.update_order_status, order_id, status_update.status)
+    else:
+        order = crud.update_order_status(db, order_id, status_update.status, expected_version=version)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    response.headers["ETag"] = order_etag(order_id, order.version)
+    return order
+
+@app.put("/orders/{order_id}/assignment", response_model=schemas.OrderOut)
+def assign_order(
+    request: Request,
+    response: Response,
+    order_id: int,
+    assignment: schemas.OrderAssignmentUpdate,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    state = crud.get_order_state(db, order_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Order not found")
+    expected_version(request, order_etag(order_id, state.version), state.version)
+    if state.status not in crud.ACTIVE_ORDER_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Order is already {state.status.value}")
+    if not crud.get_delivery_partner(db, assignment.delivery_partner_id):
+        raise HTTPException(status_code=400, detail="Not an active delivery partner")
+    # Pinned to the version the status was checked at
+    order = crud.assign_delivery_partner(db, order_id, assignment.delivery_partner_id, expected_version=state.version)
+    response.headers["ETag"] = order_etag(order_id, order.version)
     return order
 
 @app.post("/orders/{order_id}/delivery-proof")
@@ -358,6 +752,41 @@ def upload_delivery_proof(
     return {"message": "Delivery proof uploaded successfully"}
 
 # Delivery endpoints
+@app.get("/delivery/assignments", response_model=List[schemas.DeliveryAssignment])
+async def get_delivery_assignments(
+    request: Request,
+    wait: float = 0,
+    current_user: models.User = Depends(require_delivery_partner),
+    db: Session = Depends(get_db)
+):
+    """Active orders assigned to the calling partner, soonest ETA first.
+
+    With ``wait`` and an If-None-Match of the last ETag, the request is held
+    until the work list changes (200) or ``wait`` seconds pass (304).
+    """
+    def load():
+        body = dump_json(_assignment_list_json, crud.get_delivery_assignments(db, current_user.id))
+        db.close()  # don't hold a connection while waiting
+        return body
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), assignments.ASSIGNMENT_WAIT_MAX_SECONDS)
+    while True:
+        waiter = assignments.waiters.subscribe(current_user.id)
+        try:
+            body = await run_in_threadpool(load)
+            etag = http_cache.make_etag("assignments", current_user.id, body.decode())
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not http_cache.is_not_modified(request, etag, None):
+                break
+            await assignments.wait(waiter, min(remaining, assignments.ASSIGNMENT_RECHECK_SECONDS))
+        finally:
+            assignments.waiters.unsubscribe(current_user.id, waiter)
+    return http_cache.conditional_response(
+        request, etag, None, http_cache.ORDER_CACHE_CONTROL,
+        lambda: Response(content=body, media_type="application/json")
+    )
+
 @app.get("/delivery/estimate", response_model=schemas.DeliveryEstimateOut)
 def get_delivery_estimate(
     delivery_address: str,
@@ -381,7 +810,7 @@ def get_nearby_pharmacies(
     radius_km: float = 5.0,
     db: Session = Depends(get_db)
 ):
-    return crud.get_nearby_pharmacies(db, latitude, longitude, radius_km)
+    return stores.nearby_pharmacies(db, latitude, longitude, radius_km)
 
 @app.post("/delivery/emergency", response_model=schemas.OrderOut)
 def create_emergency_delivery(
@@ -389,11 +818,77 @@ def create_emergency_delivery(
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    order = crud.create_emergency_delivery(db, current_user.id, emergency_data)
+    order = crud.retry_on_conflict(db, crud.create_emergency_delivery, current_user.id, emergency_data)
     if not order:
         raise HTTPException(status_code=400, detail="Cannot create emergency delivery")
     return order
 
+# Analytics
+@app.get("/analytics/summary", response_model=schemas.AnalyticsSummary)
+def get_analytics_summary(
+    days: int = 7,
+    city: Optional[str] = None,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    if not 1 <= days <= analytics.ANALYTICS_SUMMARY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {analytics.ANALYTICS_SUMMARY_MAX_DAYS}")
+    return crud.get_analytics_summary(db, days, city)
+
+# Cache statistics
+@app.get("/cache/stats")
+def get_cache_stats(current_user: models.User = Depends(require_pharmacy_admin)):
+    return {"catalog": cache.catalog_cache.stats()}
+
+# Job queue statistics
+@app.get("/jobs/stats")
+def get_job_stats(
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    return jobs.stats(db)
+
+# Notification statistics
+@app.get("/notifications/stats")
+def get_notification_stats(current_user: models.User = Depends(require_pharmacy_admin)):
+    return notifications.dispatcher.stats()
+
+# Reminder scheduler statistics
+@app.get("/reminders/stats")
+def get_reminder_stats(current_user: models.User = Depends(require_pharmacy_admin)):
+    return reminders.stats()
+
+# Store endpoints
+@app.post("/stores", response_model=schemas.StoreOut)
+def create_store(
+    store: schemas.StoreCreate,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    db_store = crud.create_store(db, store)
+    stores.stock_map.invalidate_stores()
+    return db_store
+
+@app.get("/stores", response_model=List[schemas.StoreOut])
+def get_stores(db: Session = Depends(get_db)):
+    return crud.get_stores(db)
+
+@app.post("/stores/{store_id}/inventory/sync", response_model=schemas.StockSyncResult)
+def sync_store_stock(
+    store_id: int,
+    sync: schemas.StockSyncRequest,
+    current_user: models.User = Depends(require_pharmacy_admin),
+    db: Session = Depends(get_db)
+):
+    if sync.defer:
+        raise HTTPException(status_code=400, detail="Deferred sync is only supported for catalog stock")
+    if not crud.get_store(db, store_id):
+        raise HTTPException(status_code=404, detail="Store not found")
+    pending = inventory.coalesce_stock_entries(sync.entries, sync.mode)
+    result = crud.apply_store_stock_sync(db, store_id, pending)
+    stores.stock_map.update(store_id, result.pop("stock"))
+    return {"received": len(sync.entries), "coalesced": len(pending), **result}
+
 # Health check
 @app.get("/health")
 def health_check():
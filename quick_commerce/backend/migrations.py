@@ -0,0 +1,188 @@
+"""
+Versioned schema migrations.
+
+``Base.metadata.create_all`` only creates tables that are missing, so any
+change to an existing table (new indexes, columns or constraints) is applied
+here instead. Migrations run once, in version order, and are recorded in the
+``schema_migrations`` table. Every migration is idempotent so that a fresh
+database - where ``create_all`` already produced the current schema - can run
+them all safely.
+
+Run ``python -m backend.migrations`` to apply pending migrations by hand, or
+``python -m backend.migrations --status`` to list them.
+"""
+
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+
+from .database import Base, engine
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    """Register a migration function under a version number."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+# Helpers
+def create_index(conn, name: str, table: str, columns, unique: bool = False):
+    unique_sql = "UNIQUE " if unique else ""
+    conn.execute(text(
+        f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    ))
+
+def drop_index(conn, name: str):
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def column_names(conn, table: str):
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+def add_column(conn, table: str, name: str, ddl: str):
+    if name not in column_names(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+# Migrations
+@migration(1, "Indexes for hot query shapes and unique cart lines")
+def _001_hot_query_indexes(conn):
+    # Merge duplicate cart lines left behind by the old read-then-insert path
+    # before the unique index can be created.
+    conn.execute(text("""
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(c.quantity) FROM cart_items c
+            WHERE c.user_id = cart_items.user_id AND c.medicine_id = cart_items.medicine_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart_items
+            GROUP BY user_id, medicine_id HAVING COUNT(*) > 1
+        )
+    """))
+    conn.execute(text("""
+        DELETE FROM cart_items WHERE id NOT IN (
+            SELECT MIN(id) FROM cart_items GROUP BY user_id, medicine_id
+        )
+    """))
+    create_index(conn, "uq_cart_items_user_medicine", "cart_items", ["user_id", "medicine_id"], unique=True)
+    create_index(conn, "ix_orders_user_id", "orders", ["user_id"])
+    create_index(conn, "ix_orders_partner_status", "orders", ["delivery_partner_id", "status"])
+    create_index(conn, "ix_prescriptions_user_id", "prescriptions", ["user_id"])
+    create_index(conn, "ix_medicines_available_category_price", "medicines", ["is_available", "category_id", "price"])
+    create_index(conn, "ix_users_phone", "users", ["phone"])
+    create_index(conn, "ix_order_items_order_id", "order_items", ["order_id"])
+
+@migration(2, "Natural key index for catalog imports")
+def _002_medicine_natural_key(conn):
+    create_index(conn, "ix_medicines_natural_key", "medicines", ["name", "strength", "manufacturer"])
+
+@migration(3, "Catalog version row for HTTP validators")
+def _003_catalog_state(conn):
+    conn.execute(text(
+        "INSERT OR IGNORE INTO catalog_state (id, version, updated_at) VALUES (1, 0, :now)"
+    ), {"now": datetime.utcnow()})
+
+@migration(4, "Backfill catalog change log for delta sync")
+def _004_catalog_changes(conn):
+    conn.execute(text(
+        "INSERT INTO catalog_changes (medicine_id, deleted, changed_at) "
+        "SELECT id, 0, :now FROM medicines "
+        "WHERE id NOT IN (SELECT medicine_id FROM catalog_changes) ORDER BY id"
+    ), {"now": datetime.utcnow()})
+
+@migration(5, "Index for expiry sweeps")
+def _005_medicine_expiry(conn):
+    create_index(conn, "ix_medicines_available_expiry", "medicines", ["is_available", "expiry_date"])
+
+@migration(6, "Fulfilling store on orders")
+def _006_order_store(conn):
+    # stores and store_inventory are new tables, created by create_all
+    add_column(conn, "orders", "store_id", "INTEGER REFERENCES stores (id)")
+
+@migration(7, "Opening balances for the stock ledger")
+def _007_stock_ledger(conn):
+    # One movement per medicine so ledger sums match the existing stock
+    conn.execute(text(
+        "INSERT INTO stock_movements (medicine_id, quantity, reason, reference, created_at) "
+        "SELECT id, stock_quantity, 'ADJUSTMENT', 'opening balance', :now FROM medicines "
+        "WHERE stock_quantity != 0 AND id NOT IN (SELECT medicine_id FROM stock_movements) ORDER BY id"
+    ), {"now": datetime.utcnow()})
+
+@migration(8, "Row versions for optimistic concurrency")
+def _008_row_versions(conn):
+    add_column(conn, "medicines", "version", "INTEGER NOT NULL DEFAULT 1")
+    add_column(conn, "orders", "version", "INTEGER NOT NULL DEFAULT 1")
+
+@migration(9, "Partner work-list index ordered by ETA")
+def _009_partner_assignments(conn):
+    create_index(conn, "ix_orders_partner_status_eta", "orders",
+                 ["delivery_partner_id", "status", "estimated_delivery_time"])
+    # Prefix of the new index
+    drop_index(conn, "ix_orders_partner_status")
+
+@migration(10, "Order change indexes for analytics rollups")
+def _010_order_change_indexes(conn):
+    create_index(conn, "ix_orders_created_at", "orders", ["created_at"])
+    create_index(conn, "ix_orders_updated_at", "orders", ["updated_at"])
+
+@migration(11, "Restock marker on cancelled orders")
+def _011_order_restocked_at(conn):
+    add_column(conn, "orders", "restocked_at", "DATETIME")
+    # Orders the restock job already returned to stock
+    conn.execute(text(
+        "UPDATE orders SET restocked_at = :now WHERE status = 'CANCELLED' AND restocked_at IS NULL "
+        "AND order_number IN (SELECT reference FROM stock_movements WHERE reason = 'RESTOCK')"
+    ), {"now": datetime.utcnow()})
+
+@migration(12, "Cart versions for cached cart summaries")
+def _012_user_cart_version(conn):
+    add_column(conn, "users", "cart_version", "INTEGER NOT NULL DEFAULT 0")
+
+# Runner
+def ensure_migrations_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """))
+
+def applied_versions(conn):
+    ensure_migrations_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def run_migrations(bind=engine):
+    """Create missing tables, then apply pending migrations in order.
+
+    Returns the list of versions applied by this call.
+    """
+    applied = []
+    with bind.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        done = applied_versions(conn)
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()}
+            )
+            applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    from . import models  # noqa: F401 - register tables on Base.metadata
+
+    if "--status" in sys.argv:
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            state = "applied" if version in done else "pending"
+            print(f"{version:04d}  {state:8}  {description}")
+    else:
+        versions = run_migrations()
+        print(f"Applied migrations: {versions}" if versions else "Database is up to date")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -18,18 +18,44 @@ class OrderStatus(str, enum.Enum):
     DELIVERED = "delivered"
     CANCELLED = "cancelled"
 
+    def can_transition_to(self, target: "OrderStatus") -> bool:
+        return target in ORDER_STATUS_TRANSITIONS[self]
+
+# Allowed status changes. Orders can be cancelled until they are dispatched;
+# DELIVERED and CANCELLED are terminal.
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatus.PENDING: frozenset({OrderStatus.CONFIRMED, OrderStatus.CANCELLED}),
+    OrderStatus.CONFIRMED: frozenset({OrderStatus.PREPARING, OrderStatus.CANCELLED}),
+    OrderStatus.PREPARING: frozenset({OrderStatus.OUT_FOR_DELIVERY, OrderStatus.CANCELLED}),
+    OrderStatus.OUT_FOR_DELIVERY: frozenset({OrderStatus.DELIVERED}),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
 class DeliveryType(str, enum.Enum):
     STANDARD = "standard"
     EMERGENCY = "emergency"
     EXPRESS = "express"
 
+class StockMovementReason(str, enum.Enum):
+    ORDER = "order"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+    EXPIRY = "expiry"
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
-    phone = Column(String, nullable=False)
+    phone = Column(String, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
     
@@ -49,6 +75,7 @@ class User(Base):
     # Verification
     phone_verified = Column(Boolean, default=False, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    cart_version = Column(Integer, nullable=False, server_default="0")  # bumped by every cart write
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -99,12 +126,24 @@ class Medicine(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")  # optimistic concurrency counter
     
     # Relationships
     category = relationship("Category", back_populates="medicines")
     cart_items = relationship("CartItem", back_populates="medicine")
     order_items = relationship("OrderItem", back_populates="medicine")
 
+    __table_args__ = (
+        # Catalog listing/search: available rows filtered by category and price
+        Index("ix_medicines_available_category_price", "is_available", "category_id", "price"),
+        # Natural key used by bulk catalog imports
+        Index("ix_medicines_natural_key", "name", "strength", "manufacturer"),
+        # Expiry sweeper and near-expiry reports
+        Index("ix_medicines_available_expiry", "is_available", "expiry_date"),
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
 class Prescription(Base):
     __tablename__ = "prescriptions"
     
@@ -130,6 +169,10 @@ class Prescription(Base):
     verifier = relationship("User", foreign_keys=[verified_by], overlaps="verified_prescriptions")
     medicines = relationship("PrescriptionMedicine", back_populates="prescription")
 
+    __table_args__ = (
+        Index("ix_prescriptions_user_id", "user_id"),
+    )
+
 class PrescriptionMedicine(Base):
     __tablename__ = "prescription_medicines"
     
@@ -165,6 +208,11 @@ class CartItem(Base):
     medicine = relationship("Medicine", back_populates="cart_items")
     prescription = relationship("Prescription")
 
+    __table_args__ = (
+        # One row per medicine per cart; also serves lookups by user_id alone
+        Index("uq_cart_items_user_medicine", "user_id", "medicine_id", unique=True),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
     
@@ -192,16 +240,30 @@ class Order(Base):
     
     # Delivery partner
     delivery_partner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=True)  # fulfilling store, if any
     delivery_proof_url = Column(String, nullable=True)
+    restocked_at = Column(DateTime, nullable=True)  # set once a cancelled order's units are returned
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")  # optimistic concurrency counter
     
     # Relationships
     user = relationship("User", foreign_keys=[user_id], back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
     delivery_partner = relationship("User", foreign_keys=[delivery_partner_id], overlaps="delivery_orders")
 
+    __table_args__ = (
+        Index("ix_orders_user_id", "user_id"),
+        # Delivery partner work list, soonest ETA first
+        Index("ix_orders_partner_status_eta", "delivery_partner_id", "status", "estimated_delivery_time"),
+        # Analytics rollups read orders changed since their watermark
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_updated_at", "updated_at"),
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     
@@ -219,6 +281,41 @@ class OrderItem(Base):
     medicine = relationship("Medicine", back_populates="order_items")
     prescription = relationship("Prescription")
 
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+    )
+
+class Store(Base):
+    __tablename__ = "stores"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    address = Column(Text, nullable=False)
+    city = Column(String, nullable=False)
+    pincode = Column(String, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    delivery_radius_km = Column(Float, default=5.0, nullable=False)
+    is_active = Column(Boolean, default=True, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class StoreInventory(Base):
+    __tablename__ = "store_inventory"
+    
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    medicine_id = Column(Integer, ForeignKey("medicines.id"), primary_key=True)
+    stock_quantity = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Covering indexes: in-stock medicines at a set of stores, and the
+        # stores stocking one medicine, are answered from the index alone
+        Index("ix_store_inventory_store_stock", "store_id", "stock_quantity", "medicine_id"),
+        Index("ix_store_inventory_medicine_stock", "medicine_id", "stock_quantity", "store_id"),
+    )
+
 class DeliveryPartner(Base):
     __tablename__ = "delivery_partners"
     
@@ -240,4 +337,151 @@ class DeliveryPartner(Base):
     
     # Relationships
     user = relationship("User")
-    current_order = relationship("Order") 
\ No newline at end of file
+    current_order = relationship("Order") 
+
+class CatalogState(Base):
+    __tablename__ = "catalog_state"
+    
+    # Single row (id=1) holding the catalog version, bumped by every catalog write
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class CatalogChangeLog(Base):
+    __tablename__ = "catalog_changes"
+    
+    # Latest change per medicine; seq is never reused (AUTOINCREMENT) so it
+    # works as a delta-sync cursor
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    medicine_id = Column(Integer, index=True, nullable=False)
+    deleted = Column(Boolean, default=False, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    
+    # Append-only stock ledger; medicines.stock_quantity is its projection
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    medicine_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)  # signed change
+    reason = Column(Enum(StockMovementReason), nullable=False)
+    reference = Column(String, nullable=True)  # order number, feed name, ...
+    created_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_stock_movements_medicine_id", "medicine_id", "id"),
+        Index("ix_stock_movements_created_at", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+    
+    # Stock per medicine as of ledger position movement_id. A compaction only
+    # writes rows for medicines that moved since the previous one, so the
+    # latest row per medicine at or before a cut is its stock at that cut.
+    medicine_id = Column(Integer, primary_key=True)
+    movement_id = Column(Integer, primary_key=True)
+    stock_quantity = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_stock_snapshots_movement_id", "movement_id"),
+    )
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    # Durable background work (backend/jobs.py). run_at is when a queued job
+    # becomes eligible, or when a running job's lease expires.
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    dedupe_key = Column(String, unique=True, nullable=True)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+class ReminderSchedule(Base):
+    __tablename__ = "reminder_schedules"
+    
+    # One row per prescribed medicine course, not per dose: the scheduler
+    # (backend/reminders.py) expands slots into due times in memory.
+    # Replaced courses are ended rather than deleted, and changed_at lets the
+    # scheduler pick up changes made by other processes.
+    id = Column(Integer, primary_key=True)
+    prescription_id = Column(Integer, ForeignKey("prescriptions.id"), nullable=False)
+    medicine_id = Column(Integer, ForeignKey("medicines.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    slots = Column(Integer, nullable=False)  # daily half-hour slot bitmask (backend/dosing.py)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_reminder_schedules_prescription", "prescription_id"),
+        Index("ix_reminder_schedules_user", "user_id", "ends_at"),
+        Index("ix_reminder_schedules_changed_at", "changed_at"),
+    )
+
+class OrderFact(Base):
+    __tablename__ = "order_facts"
+    
+    # What each order last contributed to the rollups, so a changed order
+    # is applied as a delta and reprocessing an unchanged one is a no-op
+    order_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False)  # local hour the order was placed
+    city = Column(String, nullable=False)
+    cancelled = Column(Boolean, nullable=False)
+    delivered = Column(Boolean, nullable=False)
+    delivery_minutes = Column(Float, nullable=True)
+    revenue = Column(Float, nullable=False)  # 0 for cancelled orders
+
+class SalesRollupHourly(Base):
+    __tablename__ = "sales_rollup_hourly"
+    
+    hour = Column(DateTime, primary_key=True)
+    city = Column(String, primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
+    cancelled = Column(Integer, default=0, nullable=False)
+    delivered = Column(Integer, default=0, nullable=False)
+    delivery_minutes = Column(Float, default=0.0, nullable=False)  # summed over delivered orders
+    revenue = Column(Float, default=0.0, nullable=False)
+
+class SalesRollupDaily(Base):
+    __tablename__ = "sales_rollup_daily"
+    
+    day = Column(Date, primary_key=True)
+    city = Column(String, primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
+    cancelled = Column(Integer, default=0, nullable=False)
+    delivered = Column(Integer, default=0, nullable=False)
+    delivery_minutes = Column(Float, default=0.0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
+
+class MedicineSalesDaily(Base):
+    __tablename__ = "medicine_sales_daily"
+    
+    day = Column(Date, primary_key=True)
+    medicine_id = Column(Integer, primary_key=True)
+    units = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
+
+class AnalyticsState(Base):
+    __tablename__ = "analytics_state"
+    
+    # Single row: orders changed at or after watermark (less an overlap)
+    # are still to be folded into the rollups
+    id = Column(Integer, primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
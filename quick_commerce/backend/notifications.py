@@ -0,0 +1,340 @@
+"""
+Push notification fan-out.
+
+Order status changes, partner assignments and prescription verifications
+published through ``events`` become per-user notifications. They are not sent
+one by one: a user's notifications are held for ``NOTIFICATION_WINDOW_SECONDS``
+from the first one, later events about the same order or prescription replace
+earlier ones, and the result goes out as a single message. Due messages are
+sent in batches of up to ``NOTIFICATION_BATCH_SIZE`` through a transport, so a
+burst of status updates costs a handful of outbound calls and the writers only
+pay for appending to an in-memory dict.
+
+Each user gets at most ``NOTIFICATION_RATE_PER_MINUTE`` messages (bursts of
+``NOTIFICATION_BURST``); a user over the limit keeps accumulating into the
+pending message until a token is available, so nothing is dropped.
+
+Transports: ``HttpTransport`` posts each batch as JSON to
+``NOTIFICATION_WEBHOOK_URL`` (a push provider or gateway); without it,
+``FileTransport`` appends messages to ``NOTIFICATION_OUTBOX`` as NDJSON. For
+local testing of the HTTP path, a receiver that writes to the same file:
+
+    python -m backend.notifications serve [--port 8025]
+
+Coalescing and rate limits are per backend process.
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import requests
+from starlette.concurrency import run_in_threadpool
+
+from . import events
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_WINDOW_SECONDS = 2.0
+NOTIFICATION_FLUSH_SECONDS = 0.25
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_RATE_PER_MINUTE = 6
+NOTIFICATION_BURST = 3
+NOTIFICATION_OUTBOX = "notifications.ndjson"
+NOTIFICATION_HTTP_TIMEOUT = 5
+NOTIFICATION_LATENCY_SAMPLES = 1000
+NOTIFICATION_BUCKET_PRUNE_SECONDS = 60
+
+class Notification(NamedTuple):
+    user_id: int
+    kind: str  # order_status, order_assigned, prescription or medicine_reminder
+    subject_id: int
+    status: Optional[str]
+    at: datetime
+
+class Message(NamedTuple):
+    user_id: int
+    title: str
+    body: str
+    notifications: Tuple[Notification, ...]
+
+_STATUS_TEXT = {
+    "pending": "has been placed",
+    "confirmed": "is confirmed",
+    "preparing": "is being prepared",
+    "out_for_delivery": "is out for delivery",
+    "delivered": "has been delivered",
+    "cancelled": "was cancelled",
+}
+
+def _describe(notification: Notification) -> str:
+    if notification.kind == "order_status":
+        return f"Order {notification.subject_id} {_STATUS_TEXT.get(notification.status, notification.status)}"
+    if notification.kind == "order_assigned":
+        return f"Order {notification.subject_id} was assigned to you"
+    if notification.kind == "medicine_reminder":
+        return f"Time to take {notification.status or 'your medicine'}"
+    return f"Prescription {notification.subject_id} was {notification.status}"
+
+def render(user_id: int, notifications: Iterable[Notification]) -> Message:
+    notifications = tuple(notifications)
+    lines = [_describe(notification) for notification in notifications]
+    title = lines[0] if len(lines) == 1 else f"{len(lines)} updates"
+    return Message(user_id, title, "\n".join(lines), notifications)
+
+def message_payload(message: Message) -> dict:
+    return {
+        "user_id": message.user_id,
+        "title": message.title,
+        "body": message.body,
+        "events": [
+            {"kind": n.kind, "id": n.subject_id, "status": n.status, "at": n.at.isoformat()}
+            for n in message.notifications
+        ],
+    }
+
+# Transports
+class FileTransport:
+    """Appends messages as NDJSON; the local stand-in for a push provider."""
+
+    def __init__(self, path: str = NOTIFICATION_OUTBOX):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, messages: List[Message]):
+        lines = "".join(json.dumps(message_payload(message)) + "\n" for message in messages)
+        with self._lock, open(self.path, "a") as outbox:
+            outbox.write(lines)
+
+class HttpTransport:
+    """POSTs ``{"messages": [...]}`` per batch over a kept-alive connection."""
+
+    def __init__(self, url: str, timeout: float = NOTIFICATION_HTTP_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def send(self, messages: List[Message]):
+        response = self._session.post(
+            self.url, json={"messages": [message_payload(message) for message in messages]}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+def transport_from_env():
+    url = os.environ.get("NOTIFICATION_WEBHOOK_URL")
+    return HttpTransport(url) if url else FileTransport()
+
+# Coalescing dispatcher
+class _Pending:
+    __slots__ = ("first_at", "due", "notifications")
+
+    def __init__(self, first_at: float, due: float):
+        self.first_at = first_at
+        self.due = due
+        self.notifications: Dict[tuple, Notification] = {}
+
+class NotificationDispatcher:
+    def __init__(self, transport, window: float = NOTIFICATION_WINDOW_SECONDS,
+                 batch_size: int = NOTIFICATION_BATCH_SIZE, rate_per_minute: float = NOTIFICATION_RATE_PER_MINUTE,
+                 burst: int = NOTIFICATION_BURST, latency_samples: int = NOTIFICATION_LATENCY_SAMPLES,
+                 clock=time.monotonic):
+        self.transport = transport
+        self.window = window
+        self.batch_size = batch_size
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, _Pending] = {}
+        self._due: List[Tuple[float, int]] = []
+        # user id -> [tokens, last refill]
+        self._buckets: Dict[int, list] = {}
+        self._pruned_at = clock()
+        self._latencies = deque(maxlen=latency_samples)
+        self.counters = {
+            "submitted": 0, "coalesced": 0, "messages_sent": 0, "batches_sent": 0,
+            "rate_limited": 0, "send_failures": 0, "messages_failed": 0,
+        }
+
+    def submit(self, notifications: Iterable[Notification]):
+        now = self.clock()
+        with self._lock:
+            for notification in notifications:
+                pending = self._pending.get(notification.user_id)
+                if pending is None:
+                    pending = self._pending[notification.user_id] = _Pending(now, now + self.window)
+                    heapq.heappush(self._due, (pending.due, notification.user_id))
+                key = (notification.kind, notification.subject_id)
+                if key in pending.notifications:
+                    # Only the latest state of an order or prescription is sent
+                    del pending.notifications[key]
+                    self.counters["coalesced"] += 1
+                pending.notifications[key] = notification
+                self.counters["submitted"] += 1
+
+    def _take_token(self, user_id: int, now: float) -> float:
+        # Token bucket; returns 0 if a message may go now, else seconds to wait
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _prune_buckets(self, now: float):
+        # A bucket that has refilled is the same as no bucket
+        full = [
+            user_id for user_id, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]
+        for user_id in full:
+            del self._buckets[user_id]
+
+    def _collect(self, now: float, force: bool) -> List[Message]:
+        messages = []
+        with self._lock:
+            if force:
+                due_users = list(self._pending)
+                self._due.clear()
+            else:
+                due_users = []
+                while self._due and self._due[0][0] <= now:
+                    due, user_id = heapq.heappop(self._due)
+                    pending = self._pending.get(user_id)
+                    if pending is None or pending.due != due:
+                        continue
+                    wait = self._take_token(user_id, now)
+                    if wait:
+                        pending.due = now + wait
+                        heapq.heappush(self._due, (pending.due, user_id))
+                        self.counters["rate_limited"] += 1
+                        continue
+                    due_users.append(user_id)
+            for user_id in due_users:
+                pending = self._pending.pop(user_id)
+                self._latencies.append(now - pending.first_at)
+                messages.append(render(user_id, pending.notifications.values()))
+            if now - self._pruned_at >= NOTIFICATION_BUCKET_PRUNE_SECONDS:
+                self._prune_buckets(now)
+                self._pruned_at = now
+        return messages
+
+    def flush(self, force: bool = False) -> int:
+        """Send every message that is due (all pending ones if ``force``); returns how many were sent."""
+        with self._send_lock:
+            messages = self._collect(self.clock(), force)
+            sent = 0
+            for start in range(0, len(messages), self.batch_size):
+                batch = messages[start:start + self.batch_size]
+                try:
+                    self.transport.send(batch)
+                except Exception:
+                    logger.exception("Sending %d notifications failed", len(batch))
+                    with self._lock:
+                        self.counters["send_failures"] += 1
+                        self.counters["messages_failed"] += len(batch)
+                    continue
+                sent += len(batch)
+                with self._lock:
+                    self.counters["messages_sent"] += len(batch)
+                    self.counters["batches_sent"] += 1
+            return sent
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            result = dict(self.counters)
+            result["pending_users"] = len(self._pending)
+            result["pending_notifications"] = sum(len(p.notifications) for p in self._pending.values())
+        result["latency_ms"] = {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "p99": round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        }
+        return result
+
+dispatcher = NotificationDispatcher(transport_from_env())
+
+async def run_notification_dispatcher():
+    while True:
+        await asyncio.sleep(NOTIFICATION_FLUSH_SECONDS)
+        try:
+            await run_in_threadpool(dispatcher.flush)
+        except Exception:
+            logger.exception("Notification flush failed")
+
+# Event subscriptions
+@events.on_order_transitions
+def _notify_transitions(transitions):
+    dispatcher.submit(
+        Notification(t.user_id, "order_status", t.order_id, t.to_status.value, t.at) for t in transitions
+    )
+
+@events.on_order_assignments
+def _notify_assignments(assignments):
+    dispatcher.submit(
+        Notification(a.delivery_partner_id, "order_assigned", a.order_id, None, a.at)
+        for a in assignments if a.delivery_partner_id is not None
+    )
+
+@events.on_prescription_verifications
+def _notify_prescriptions(verifications):
+    dispatcher.submit(
+        Notification(v.user_id, "prescription", v.prescription_id, "verified" if v.is_verified else "rejected", v.at)
+        for v in verifications
+    )
+
+# Local HTTP stand-in
+def make_receiver(port: int, outbox: str = NOTIFICATION_OUTBOX) -> ThreadingHTTPServer:
+    """An HTTP endpoint for ``HttpTransport`` that appends what it receives to ``outbox``."""
+    lock = threading.Lock()
+
+    class Receiver(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            lines = "".join(json.dumps(message) + "\n" for message in body["messages"])
+            with lock, open(outbox, "a") as out:
+                out.write(lines)
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Receiver)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.notifications", description="Notification tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run a local HTTP receiver for NOTIFICATION_WEBHOOK_URL")
+    serve.add_argument("--port", type=int, default=8025)
+    serve.add_argument("--outbox", default=NOTIFICATION_OUTBOX)
+    args = parser.parse_args(argv)
+
+    server = make_receiver(args.port, args.outbox)
+    print(f"Receiving on http://127.0.0.1:{args.port}/ into {args.outbox}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
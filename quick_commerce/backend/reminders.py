@@ -0,0 +1,290 @@
+"""
+Medicine reminders.
+
+Verifying an itemised prescription stores one ``reminder_schedules`` row per
+medicine course (daily slots and an end time, see ``dosing``), never one row
+per dose. The scheduler keeps every active course in memory as parallel int64
+arrays (``ReminderRecords``), with only each course's next due minute on a
+hierarchical timing wheel (``TimingWheel``): 60 one-minute buckets, 24
+one-hour buckets and 64 one-day buckets, plus an overflow list for longer
+courses. Each minute it fires one bucket, reschedules the fired courses for
+their next dose and sends the reminders to a sink in batches of
+``REMINDER_BATCH_SIZE``. Nothing polls the table for due rows.
+
+The wheel is rebuilt from the table at startup; doses missed by up to
+``REMINDER_GRACE_MINUTES`` while the scheduler was down are still sent. New
+and ended courses are picked up every ``REMINDER_SYNC_SECONDS`` by their
+``changed_at``. Only one backend process runs the scheduler, the one holding
+the lock on ``REMINDER_LOCK_FILE``; the others take over if it exits.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, notifications
+from .database import SessionLocal
+from .dosing import MINUTES_PER_DAY, from_minute, next_due, to_minute
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REMINDER_GRACE_MINUTES = 15
+REMINDER_SYNC_SECONDS = 30
+REMINDER_BATCH_SIZE = 1000
+REMINDER_LOCK_FILE = "reminder_scheduler.lock"
+
+class Reminder(NamedTuple):
+    schedule_id: int
+    user_id: int
+    medicine_id: int
+    due_at: datetime
+
+class ReminderRecords:
+    """Active courses as parallel int64 columns, addressed by record number."""
+
+    def __init__(self):
+        self.schedule_ids = array("q")
+        self.user_ids = array("q")
+        self.medicine_ids = array("q")
+        self.slots = array("q")
+        self.ends = array("q")
+        self.next_due = array("q")  # -1 for a free record
+        self._free = array("q")
+        self._by_schedule: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._by_schedule)
+
+    def put(self, schedule_id: int, user_id: int, medicine_id: int, slots: int, ends: int, due: int) -> int:
+        record = self._by_schedule.get(schedule_id)
+        if record is None:
+            if self._free:
+                record = self._free.pop()
+            else:
+                record = len(self.schedule_ids)
+                for column in (self.schedule_ids, self.user_ids, self.medicine_ids, self.slots, self.ends, self.next_due):
+                    column.append(0)
+            self._by_schedule[schedule_id] = record
+        self.schedule_ids[record] = schedule_id
+        self.user_ids[record] = user_id
+        self.medicine_ids[record] = medicine_id
+        self.slots[record] = slots
+        self.ends[record] = ends
+        self.next_due[record] = due
+        return record
+
+    def remove(self, schedule_id: int):
+        record = self._by_schedule.pop(schedule_id, None)
+        if record is not None:
+            self.next_due[record] = -1
+            self._free.append(record)
+
+    def free(self, record: int):
+        self.remove(self.schedule_ids[record])
+
+    def nbytes(self) -> int:
+        columns = (self.schedule_ids, self.user_ids, self.medicine_ids, self.slots, self.ends, self.next_due, self._free)
+        return sum(sys.getsizeof(column) for column in columns) + sys.getsizeof(self._by_schedule)
+
+class TimingWheel:
+    """Hierarchical timing wheel of record numbers over epoch minutes."""
+
+    LEVELS = ((1, 60), (60, 24), (MINUTES_PER_DAY, 64))  # (minutes per bucket, buckets)
+
+    def __init__(self, now: int, next_due: array):
+        self.now = now
+        self._next_due = next_due
+        self._levels = [[array("q") for _ in range(size)] for _, size in self.LEVELS]
+        self._overflow = array("q")
+
+    def add(self, record: int, due: int):
+        # A bucket at a coarser level is cascaded at the start of its hour or
+        # day, which always comes after now and before due
+        due = max(due, self.now + 1)
+        delta = due - self.now
+        for (unit, size), buckets in zip(self.LEVELS, self._levels):
+            if delta < unit * size:
+                buckets[due // unit % size].append(record)
+                return
+        self._overflow.append(record)
+
+    def _cascade(self, entries: array):
+        for record in entries:
+            due = self._next_due[record]
+            if due >= 0:
+                self.add(record, due)
+
+    def advance(self, to: int) -> List[int]:
+        """Move to minute ``to``; returns the records that came due on the way."""
+        fired = []
+        next_due = self._next_due
+        while self.now < to:
+            self.now += 1
+            minute = self.now
+            if minute % MINUTES_PER_DAY == 0:
+                unit, size = self.LEVELS[2]
+                entries, self._levels[2][minute // unit % size] = self._levels[2][minute // unit % size], array("q")
+                overflow, self._overflow = self._overflow, array("q")
+                self._cascade(entries)
+                self._cascade(overflow)
+            if minute % 60 == 0:
+                unit, size = self.LEVELS[1]
+                entries, self._levels[1][minute // unit % size] = self._levels[1][minute // unit % size], array("q")
+                self._cascade(entries)
+            bucket, self._levels[0][minute % 60] = self._levels[0][minute % 60], array("q")
+            # Entries left behind by rescheduled or removed courses, and
+            # duplicates from re-syncs, no longer match the record's next due
+            fired.extend(record for record in dict.fromkeys(bucket) if next_due[record] == minute)
+        return fired
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(bucket) for buckets in self._levels for bucket in buckets) + sys.getsizeof(self._overflow)
+
+class ReminderScheduler:
+    def __init__(self, grace_minutes: int = REMINDER_GRACE_MINUTES):
+        self.grace_minutes = grace_minutes
+        self.records = ReminderRecords()
+        self.wheel = TimingWheel(0, self.records.next_due)
+        self.fired = 0
+
+    def load(self, rows: Iterable[tuple], now: datetime):
+        """Rebuild from ``(id, user_id, medicine_id, slots, ends_at)`` rows of active courses."""
+        self.records = ReminderRecords()
+        self.wheel = TimingWheel(to_minute(now) - self.grace_minutes, self.records.next_due)
+        self.sync(rows)
+
+    def sync(self, rows: Iterable[tuple]):
+        # New, changed and ended courses; putting an unchanged one is harmless
+        for schedule_id, user_id, medicine_id, slots, ends_at in rows:
+            ends = to_minute(ends_at)
+            due = next_due(slots, self.wheel.now + 1, ends)
+            if due is None:
+                self.records.remove(schedule_id)
+                continue
+            self.wheel.add(self.records.put(schedule_id, user_id, medicine_id, slots, ends, due), due)
+
+    def tick(self, now: datetime) -> List[Reminder]:
+        """Advance to ``now``; returns the reminders that came due and reschedules their courses."""
+        records = self.records
+        reminders = []
+        for record in self.wheel.advance(to_minute(now)):
+            due = records.next_due[record]
+            reminders.append(Reminder(
+                records.schedule_ids[record], records.user_ids[record], records.medicine_ids[record], from_minute(due)
+            ))
+            following = next_due(records.slots[record], max(due, self.wheel.now) + 1, records.ends[record])
+            if following is None:
+                records.free(record)
+            else:
+                records.next_due[record] = following
+                self.wheel.add(record, following)
+        self.fired += len(reminders)
+        return reminders
+
+    def stats(self) -> dict:
+        return {
+            "active_courses": len(self.records),
+            "fired": self.fired,
+            "bytes": self.records.nbytes() + self.wheel.nbytes(),
+        }
+
+# Sinks
+class NotificationSink:
+    """Sends reminders as push notifications through ``notifications.dispatcher``."""
+
+    def send(self, reminders: List[Reminder]):
+        db = SessionLocal()
+        try:
+            names = crud.get_medicine_names(db, {reminder.medicine_id for reminder in reminders})
+        finally:
+            db.close()
+        notifications.dispatcher.submit(
+            notifications.Notification(r.user_id, "medicine_reminder", r.schedule_id, names.get(r.medicine_id), r.due_at)
+            for r in reminders
+        )
+
+# Background scheduler
+scheduler = ReminderScheduler()
+sink = NotificationSink()
+_state = {"owner": False, "synced_at": None}
+_tick_lock = threading.Lock()
+
+def claim_scheduler_lock(path: str = REMINDER_LOCK_FILE):
+    """The open lock file if this process may run the scheduler, else None."""
+    if fcntl is None:
+        return open(os.devnull)
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def _load():
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        scheduler.load(crud.get_reminder_schedules(db, active_at=now), now)
+    finally:
+        db.close()
+    _state["synced_at"] = now
+    logger.info("Reminder scheduler loaded %d courses", len(scheduler.records))
+
+def _sync(now: datetime):
+    # Overlap the previous window so a course committed just before the last
+    # sync started is not missed
+    since = _state["synced_at"] - timedelta(seconds=REMINDER_SYNC_SECONDS)
+    db = SessionLocal()
+    try:
+        scheduler.sync(crud.get_reminder_schedules(db, changed_since=since))
+    finally:
+        db.close()
+    _state["synced_at"] = now
+
+def run_tick() -> int:
+    with _tick_lock:
+        now = datetime.utcnow()
+        if (now - _state["synced_at"]).total_seconds() >= REMINDER_SYNC_SECONDS:
+            _sync(now)
+        reminders = scheduler.tick(now)
+    for start in range(0, len(reminders), REMINDER_BATCH_SIZE):
+        try:
+            sink.send(reminders[start:start + REMINDER_BATCH_SIZE])
+        except Exception:
+            logger.exception("Sending %d reminders failed", len(reminders[start:start + REMINDER_BATCH_SIZE]))
+    return len(reminders)
+
+async def run_reminder_scheduler():
+    lock_file = claim_scheduler_lock()
+    while lock_file is None:
+        await asyncio.sleep(REMINDER_SYNC_SECONDS)
+        lock_file = claim_scheduler_lock()
+    try:
+        _state["owner"] = True
+        await run_in_threadpool(_load)
+        while True:
+            now = datetime.utcnow()
+            await asyncio.sleep(60 - now.second - now.microsecond / 1e6)
+            try:
+                await run_in_threadpool(run_tick)
+            except Exception:
+                logger.exception("Reminder tick failed")
+    finally:
+        _state["owner"] = False
+        lock_file.close()
+
+def stats() -> dict:
+    return {"owner": _state["owner"], **scheduler.stats()}
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, constr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, constr
+from typing import Optional, List, Literal, Dict
+from datetime import date, datetime
 from .models import UserRole, OrderStatus, DeliveryType
 
 # User Schemas
@@ -83,6 +83,7 @@ class MedicineBase(BaseModel):
     dosage_form: Optional[str] = None
     strength: Optional[str] = None
     manufacturer: Optional[str] = None
+    expiry_date: Optional[datetime] = None
     delivery_time_minutes: int = 30
 
 class MedicineCreate(MedicineBase):
@@ -99,13 +100,13 @@ class MedicineUpdate(BaseModel):
     dosage_form: Optional[str] = None
     strength: Optional[str] = None
     manufacturer: Optional[str] = None
+    expiry_date: Optional[datetime] = None
     delivery_time_minutes: Optional[int] = None
     is_available: Optional[bool] = None
 
 class MedicineOut(MedicineBase):
     id: int
     is_available: bool
-    expiry_date: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     category: CategoryOut
@@ -113,6 +114,90 @@ class MedicineOut(MedicineBase):
     class Config:
         from_attributes = True
 
+class ExpiringMedicine(BaseModel):
+    id: int
+    name: str
+    strength: Optional[str] = None
+    manufacturer: Optional[str] = None
+    stock_quantity: int
+    expiry_date: datetime
+
+    class Config:
+        from_attributes = True
+
+class ExpirySweep(BaseModel):
+    ran_at: datetime
+    retired: int
+    expiring_soon: int
+
+class ExpiryReport(BaseModel):
+    last_sweep: Optional[ExpirySweep] = None
+    items: List[ExpiringMedicine]
+
+class MedicineSuggestion(BaseModel):
+    id: int
+    name: str
+    strength: Optional[str] = None
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    count: int
+
+class PriceBucketFacet(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+class MedicineFacets(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    prescription_required: Dict[str, int]
+    availability: Dict[str, int]
+    price_buckets: List[PriceBucketFacet]
+
+class MedicineSearchResult(BaseModel):
+    items: List[MedicineOut]
+    facets: MedicineFacets
+
+class MedicineChanges(BaseModel):
+    since: int
+    next_since: int
+    has_more: bool
+    upserts: List[MedicineOut]
+    deleted: List[int]
+
+class MedicineImportRow(BaseModel):
+    # Rows are matched on name + strength + manufacturer; category may be
+    # given by id or by name
+    name: str
+    generic_name: Optional[str] = None
+    description: Optional[str] = None
+    category_id: Optional[int] = None
+    category: Optional[str] = None
+    price: float
+    stock_quantity: Optional[int] = None
+    prescription_required: Optional[bool] = None
+    dosage_form: Optional[str] = None
+    strength: Optional[str] = None
+    manufacturer: Optional[str] = None
+    expiry_date: Optional[datetime] = None
+    delivery_time_minutes: Optional[int] = None
+    is_available: Optional[bool] = None
+
+class MedicineImportError(BaseModel):
+    row: int
+    error: str
+
+class MedicineImportReport(BaseModel):
+    rows_processed: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[MedicineImportError]
+    errors_truncated: bool
+    elapsed_seconds: float
+    rows_per_second: float
+
 class MedicineSearch(BaseModel):
     q: Optional[str] = None
     category_id: Optional[int] = None
@@ -133,12 +218,82 @@ class OrderItemOut(BaseModel):
     class Config:
         from_attributes = True
 
+OrderView = Literal["summary", "full"]
+
+class OrderSummary(BaseModel):
+    id: int
+    order_number: str
+    status: OrderStatus
+    delivery_type: DeliveryType
+    total_amount: float
+    delivery_fee: float
+    tax_amount: float
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    estimated_delivery_time: Optional[datetime] = None
+    actual_delivery_time: Optional[datetime] = None
+    item_count: int
+
+    class Config:
+        from_attributes = True
+
 class OrderStatusUpdate(BaseModel):
     status: OrderStatus    
 
+class OrderTransition(BaseModel):
+    order_id: int
+    status: OrderStatus
+
+class BulkOrderTransition(BaseModel):
+    transitions: List[OrderTransition]
+
+class OrderTransitionOutcome(BaseModel):
+    order_id: int
+    outcome: str  # applied, not_found, forbidden, invalid_transition, conflict
+    status: Optional[OrderStatus] = None  # status after the batch
+
+class BulkOrderTransitionResult(BaseModel):
+    applied: int
+    outcomes: List[OrderTransitionOutcome]
+
+class OrderAssignmentUpdate(BaseModel):
+    delivery_partner_id: int
+
+class DeliveryAssignment(BaseModel):
+    id: int
+    order_number: str
+    status: OrderStatus
+    delivery_type: DeliveryType
+    delivery_address: str
+    delivery_city: str
+    delivery_pincode: str
+    delivery_latitude: Optional[float] = None
+    delivery_longitude: Optional[float] = None
+    estimated_delivery_time: Optional[datetime] = None
+    item_count: int
+
+    class Config:
+        from_attributes = True
+
 class StockUpdate(BaseModel):
     stock_quantity: int
 
+class StockSyncEntry(BaseModel):
+    medicine_id: int
+    quantity: int  # new stock in absolute mode, change in delta mode
+
+class StockSyncRequest(BaseModel):
+    mode: Literal["absolute", "delta"] = "absolute"
+    entries: List[StockSyncEntry]
+    defer: bool = False  # coalesce into the shared buffer instead of applying now
+
+class StockSyncResult(BaseModel):
+    received: int
+    coalesced: int
+    applied: int
+    not_found: List[int] = []
+    deferred: bool = False
+
 # Prescription Schemas
 class PrescriptionBase(BaseModel):
     doctor_name: Optional[str] = None
@@ -148,6 +303,28 @@ class PrescriptionBase(BaseModel):
 class PrescriptionCreate(PrescriptionBase):
     pass
 
+class PrescribedMedicine(BaseModel):
+    medicine_id: int
+    quantity: int
+    dosage: Optional[str] = None
+    frequency: Optional[str] = None
+    duration: Optional[str] = None
+
+class PrescribedMedicineOut(PrescribedMedicine):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class ReminderScheduleOut(BaseModel):
+    id: int
+    prescription_id: int
+    medicine_id: int
+    medicine_name: str
+    times: List[str]  # local HH:MM
+    next_due_at: Optional[datetime] = None
+    ends_at: datetime
+
 class PrescriptionOut(PrescriptionBase):
     id: int
     user_id: int
@@ -155,6 +332,7 @@ class PrescriptionOut(PrescriptionBase):
     is_verified: bool
     verified_by: Optional[int] = None
     verification_notes: Optional[str] = None
+    medicines: List[PrescribedMedicineOut] = []
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -164,6 +342,24 @@ class PrescriptionOut(PrescriptionBase):
 class PrescriptionVerification(BaseModel):
     is_verified: bool
     verification_notes: Optional[str] = None
+    medicines: Optional[List[PrescribedMedicine]] = None  # itemised medicines; replaces any previous list
+
+class PrescriptionIssue(BaseModel):
+    cart_item_id: int
+    medicine_id: int
+    medicine_name: str
+    prescription_id: Optional[int] = None
+    quantity: int
+    allowed_quantity: Optional[int] = None
+    reason: Literal[
+        "prescription_missing", "prescription_not_found", "prescription_not_verified",
+        "medicine_not_prescribed", "quantity_exceeds_prescription"
+    ]
+
+class PrescriptionValidation(BaseModel):
+    valid: bool
+    checked_items: int
+    issues: List[PrescriptionIssue]
 
 # Cart Schemas
 class CartItemBase(BaseModel):
@@ -187,10 +383,23 @@ class CartItemOut(CartItemBase):
     class Config:
         from_attributes = True
 
-class CartOut(BaseModel):
-    items: List[CartItemOut]
+class CartSummary(BaseModel):
     total_items: int
+    total_quantity: int
     total_amount: float
+    prescription_required: bool
+
+class CartOut(CartSummary):
+    items: List[CartItemOut]
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    medicine_id: int
+    quantity: int = Field(1, gt=0)
+    prescription_id: Optional[int] = None
+
+class CartBatchUpdate(BaseModel):
+    operations: List[CartOperation]
 
 # Order Schemas
 class OrderCreate(BaseModel):
@@ -216,6 +425,7 @@ class OrderOut(BaseModel):
     estimated_delivery_time: Optional[datetime] = None
     actual_delivery_time: Optional[datetime] = None
     delivery_partner_id: Optional[int] = None
+    store_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     items: List['OrderItemOut']
@@ -247,6 +457,33 @@ class EmergencyDelivery(BaseModel):
     delivery_pincode: str
     urgency_level: str  # high, medium, low
 
+# Store Schemas
+class StoreBase(BaseModel):
+    name: str
+    address: str
+    city: str
+    pincode: str
+    latitude: float
+    longitude: float
+    delivery_radius_km: float = 5.0
+
+class StoreCreate(StoreBase):
+    pass
+
+class StoreOut(StoreBase):
+    id: int
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class StoreAvailability(BaseModel):
+    store_id: int
+    name: str
+    distance_km: float
+    stock_quantity: int
+
 class NearbyPharmacy(BaseModel):
     id: int
     name: str
@@ -261,4 +498,39 @@ class Token(BaseModel):
     token_type: str
 
 class TokenData(BaseModel):
-    username: Optional[str] = None 
\ No newline at end of file
+    username: Optional[str] = None 
+
+# Analytics Schemas
+class SalesMetrics(BaseModel):
+    orders: int
+    cancelled: int
+    delivered: int
+    revenue: float
+    avg_delivery_minutes: Optional[float] = None
+    cancellation_rate: float
+
+class DailySales(SalesMetrics):
+    day: date
+
+class HourlySales(SalesMetrics):
+    hour: datetime  # local hour
+
+class CitySales(SalesMetrics):
+    city: str
+
+class MedicineSales(BaseModel):
+    medicine_id: int
+    name: Optional[str] = None
+    units: int
+    revenue: float
+
+class AnalyticsSummary(BaseModel):
+    days: int
+    city: Optional[str] = None
+    as_of: Optional[datetime] = None  # last rollup run
+    totals: SalesMetrics
+    open_orders: int
+    daily: List[DailySales]
+    hourly: List[HourlySales]  # last 24 hours
+    cities: List[CitySales]
+    top_medicines: List[MedicineSales]
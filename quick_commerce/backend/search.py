@@ -0,0 +1,460 @@
+"""
+Catalog search helpers.
+
+Facet counts (category, prescription flag, stock availability and price
+buckets) are rolled up from "cells" - counts grouped by all four dimensions at
+once. Cells come from one grouped SQL pass over the filtered set, or, when the
+query has no text or price-range filter and the catalog snapshot is current,
+from a cube of counts computed once per snapshot.
+
+Typeahead suggestions are served from ``suggest_index``, an in-memory sorted
+array of normalized name / generic-name terms. Prefix lookups are two bisects;
+results are ranked by units ordered, and the ranked lists for prefixes that
+match many terms are memoized. A background task builds the index and follows
+the catalog change log, so writes from any worker are applied incrementally;
+each update publishes a new table and requests read the last one published.
+
+``/medicines/{id}/alternatives`` is answered from ``equivalence_index``, which
+groups every medicine, available or not, by normalized generic name +
+strength + dosage form, plus one batched fetch of the available group
+members.
+"""
+
+import array
+import asyncio
+import heapq
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas, snapshot
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_snapshot_cube = (None, None)  # (snapshot the cube was built from, cells)
+
+def _cube_for(snap: snapshot.CatalogSnapshot) -> Counter:
+    global _snapshot_cube
+    built_from, cells = _snapshot_cube
+    if built_from is not snap:
+        cells = Counter()
+        for position in range(len(snap)):
+            cells[(
+                snap.category_ids[position],
+                bool(snap.flags[position] & snapshot.FLAG_PRESCRIPTION_REQUIRED),
+                crud.stock_bucket(snap.stock[position]),
+                crud.price_bucket(snap.prices[position])
+            )] += 1
+        _snapshot_cube = (snap, cells)
+    return cells
+
+def get_facet_cells(db: Session, search_params: schemas.MedicineSearch):
+    snap = snapshot.current
+    if (snap is not None and not search_params.q and not search_params.min_price
+            and not search_params.max_price and snap.catalog_version == crud.get_catalog_state(db)[0]):
+        return [
+            (category_id, prescription_required, stock, price, count)
+            for (category_id, prescription_required, stock, price), count in _cube_for(snap).items()
+            if (not search_params.category_id or category_id == search_params.category_id)
+            and (search_params.prescription_required is None
+                 or prescription_required == search_params.prescription_required)
+        ]
+    return crud.get_medicine_facet_cells(db, search_params)
+
+def summarize_facets(cells) -> dict:
+    total = 0
+    categories, prescription, availability, prices = Counter(), Counter(), Counter(), Counter()
+    for category_id, prescription_required, stock, price, count in cells:
+        total += count
+        categories[category_id] += count
+        prescription[bool(prescription_required)] += count
+        availability[stock] += count
+        prices[price] += count
+
+    edges = crud.PRICE_BUCKET_EDGES
+    return {
+        "total": total,
+        "categories": [
+            {"category_id": category_id, "count": count} for category_id, count in sorted(categories.items())
+        ],
+        "prescription_required": {"true": prescription[True], "false": prescription[False]},
+        "availability": {bucket: availability[bucket] for bucket in ("in_stock", "low_stock", "out_of_stock")},
+        "price_buckets": [
+            {"min": edges[index], "max": edges[index + 1] if index + 1 < len(edges) else None, "count": prices[index]}
+            for index in range(len(edges))
+        ]
+    }
+
+def get_facets(db: Session, search_params: schemas.MedicineSearch) -> dict:
+    return summarize_facets(get_facet_cells(db, search_params))
+
+# Typeahead suggestions
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_SCAN_LIMIT = 200  # prefixes matching more terms than this are memoized
+SUGGEST_POPULARITY_REFRESH_SECONDS = 300
+SUGGEST_CATCH_UP_SECONDS = 1
+
+_TERM_END = "\U0010ffff"
+
+def normalize_term(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+def _index_terms(name: str, generic_name) -> set:
+    # Whole name, whole generic name, and every later word of the name so
+    # "adv" finds "Crocin Advance"
+    name = normalize_term(name)
+    terms = {name}
+    words = name.split(" ")
+    for index in range(1, len(words)):
+        terms.add(" ".join(words[index:]))
+    if generic_name:
+        terms.add(normalize_term(generic_name))
+    terms.discard("")
+    return terms
+
+def _payload(medicine_id: int, name: str, strength):
+    body = json.dumps({"id": medicine_id, "name": name, "strength": strength}, separators=(",", ":"))
+    return name, body.encode()
+
+class ChangeLogIndex(ABC):
+    """In-memory catalog index kept current by replaying the catalog change log.
+
+    Subclasses implement ``_build`` (full load) and ``_apply_changes`` (the
+    change-log entries in ``(since, upto]``); both run under ``_lock``.
+    """
+
+    def __init__(self):
+        self.seq = None  # change-log position the index is current to; None until built
+        self.catalog_version = None
+        self._lock = threading.Lock()
+
+    def ensure_current(self, db: Session):
+        # The catalog version is cached in process, so this is usually free
+        version = crud.get_catalog_state(db)[0]
+        if version == self.catalog_version:
+            return
+        with self._lock:
+            if version == self.catalog_version:
+                return
+            seq, version = crud.get_catalog_cursor(db)
+            if self.seq is None or seq < self.seq:
+                self._build(db)
+            elif seq > self.seq:
+                self._apply_changes(db, self.seq, seq)
+            self.seq = seq
+            self.catalog_version = version
+
+    @abstractmethod
+    def _build(self, db: Session):
+        ...
+
+    @abstractmethod
+    def _apply_changes(self, db: Session, since: int, upto: int):
+        ...
+
+def _locate(terms: list, ids: array.array, term: str, medicine_id: int) -> int:
+    # Position of (term, medicine_id) in the (term, id) order of the table
+    start = bisect_left(terms, term)
+    end = bisect_right(terms, term, start)
+    return bisect_left(ids, medicine_id, start, end)
+
+class SuggestTable:
+    """One generation of the suggest index.
+
+    Never modified once published except for ``memo``, which only caches
+    rankings, so readers use it without a lock. Catalog changes produce a
+    new table with ``apply``.
+    """
+
+    def __init__(self, terms: list, ids: array.array, terms_by_id: dict, payloads: dict, popularity: dict,
+                 memo: dict = None):
+        self.terms = terms  # sorted by (term, id); ids[i] is the medicine for terms[i]
+        self.ids = ids
+        self.terms_by_id = terms_by_id
+        self.payloads = payloads  # medicine_id -> (name, serialized MedicineSuggestion)
+        self.popularity = popularity
+        self.memo = {} if memo is None else memo  # heavy prefix -> top SUGGEST_MAX_LIMIT medicine ids
+
+    @classmethod
+    def build(cls, rows, popularity: dict) -> "SuggestTable":
+        # rows are (medicine_id, name, generic_name, strength)
+        pairs = []
+        terms_by_id = {}
+        payloads = {}
+        for medicine_id, name, generic_name, strength in rows:
+            terms = _index_terms(name, generic_name)
+            terms_by_id[medicine_id] = terms
+            payloads[medicine_id] = _payload(medicine_id, name, strength)
+            pairs.extend((term, medicine_id) for term in terms)
+        pairs.sort()
+        return cls([term for term, _ in pairs], array.array("i", (medicine_id for _, medicine_id in pairs)),
+                   terms_by_id, payloads, popularity)
+
+    def apply(self, changes: dict) -> "SuggestTable":
+        # changes maps medicine_id -> current row, or None when it left the
+        # index. The new arrays are copied from slices of the old ones between
+        # the changed positions, so a catch-up costs one pass of memcpy rather
+        # than a list insert per term. Stock and price changes leave the
+        # suggestion untouched and are skipped.
+        terms_by_id = dict(self.terms_by_id)
+        payloads = dict(self.payloads)
+        edits = []  # (old position, 0 insert / 1 delete, term, medicine_id)
+        replaced = set()
+        added = []  # (term, medicine_id)
+        for medicine_id, row in changes.items():
+            if row is not None:
+                _, name, generic_name, strength = row
+                terms, payload = _index_terms(name, generic_name), _payload(medicine_id, name, strength)
+                if terms_by_id.get(medicine_id) == terms and payloads.get(medicine_id) == payload:
+                    continue
+            old_terms = terms_by_id.pop(medicine_id, None)
+            payloads.pop(medicine_id, None)
+            if old_terms is not None:
+                replaced.add(medicine_id)
+                for term in old_terms:
+                    edits.append((_locate(self.terms, self.ids, term, medicine_id), 1, term, medicine_id))
+            if row is not None:
+                terms_by_id[medicine_id] = terms
+                payloads[medicine_id] = payload
+                for term in terms:
+                    edits.append((_locate(self.terms, self.ids, term, medicine_id), 0, term, medicine_id))
+                    added.append((term, medicine_id))
+        if not edits:
+            return self
+        edits.sort()
+
+        terms, ids = [], array.array("i")
+        copied = 0
+        for position, delete, term, medicine_id in edits:
+            terms.extend(self.terms[copied:position])
+            ids.extend(self.ids[copied:position])
+            copied = position
+            if delete:
+                copied += 1
+            else:
+                terms.append(term)
+                ids.append(medicine_id)
+        terms.extend(self.terms[copied:])
+        ids.extend(self.ids[copied:])
+
+        table = SuggestTable(terms, ids, terms_by_id, payloads, self.popularity)
+        table.memo = self._carry_memo(table, replaced, added)
+        return table
+
+    def _carry_memo(self, table: "SuggestTable", replaced: set, added: list) -> dict:
+        # A memoized top list stays valid unless one of its medicines was
+        # replaced; new medicines only have to be ranked against it
+        memo = dict(self.memo)
+        arrivals = defaultdict(set)
+        for term, medicine_id in added:
+            for length in range(1, len(term) + 1):
+                if term[:length] in memo:
+                    arrivals[term[:length]].add(medicine_id)
+        carried = {}
+        for prefix, ranked in memo.items():
+            if replaced.isdisjoint(ranked):
+                new_ids = arrivals.get(prefix)
+                carried[prefix] = heapq.nsmallest(
+                    SUGGEST_MAX_LIMIT, new_ids.union(ranked), key=table._rank_key
+                ) if new_ids else ranked
+        return carried
+
+    def with_popularity(self, popularity: dict) -> "SuggestTable":
+        return SuggestTable(self.terms, self.ids, self.terms_by_id, self.payloads, popularity)
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        start, end = self._range(prefix)
+        return self._top(prefix, start, end)[:limit]
+
+    def warm(self):
+        # Rank every first letter so no reader pays for a heavy prefix
+        for prefix in self._children("", 0, len(self.terms)):
+            start, end = self._range(prefix)
+            self._top(prefix, start, end)
+
+    def _range(self, prefix: str, start: int = 0, end: int = None):
+        end = len(self.terms) if end is None else end
+        start = bisect_left(self.terms, prefix, start, end)
+        return start, bisect_left(self.terms, prefix + _TERM_END, start, end)
+
+    def _children(self, prefix: str, start: int, end: int) -> list:
+        # Distinct one-character extensions of prefix within [start, end)
+        depth = len(prefix)
+        children = []
+        position = start
+        while position < end:
+            term = self.terms[position]
+            if len(term) == depth:
+                position += 1
+                continue
+            child = term[:depth + 1]
+            children.append(child)
+            position = self._range(child, position, end)[1]
+        return children
+
+    def _rank_key(self, medicine_id: int):
+        return -self.popularity.get(medicine_id, 0), self.payloads[medicine_id][0], medicine_id
+
+    def _top(self, prefix: str, start: int, end: int) -> list:
+        # Small ranges are ranked directly. Large ones are ranked from the top
+        # lists of their one-character extensions - a medicine in the top of
+        # the prefix is in the top of whichever extension it matched - and
+        # memoized, so a hot short prefix costs a dict lookup.
+        if end - start <= SUGGEST_SCAN_LIMIT:
+            return heapq.nsmallest(SUGGEST_MAX_LIMIT, set(self.ids[start:end]), key=self._rank_key)
+        ranked = self.memo.get(prefix)
+        if ranked is None:
+            candidates = set()
+            position = start
+            while position < end and len(self.terms[position]) == len(prefix):
+                candidates.add(self.ids[position])
+                position += 1
+            for child in self._children(prefix, position, end):
+                child_start, child_end = self._range(child, position, end)
+                candidates.update(self._top(child, child_start, child_end))
+                position = child_end
+            ranked = self.memo[prefix] = heapq.nsmallest(SUGGEST_MAX_LIMIT, candidates, key=self._rank_key)
+        return ranked
+
+class SuggestIndex(ChangeLogIndex):
+    """Publishes ``SuggestTable`` generations.
+
+    Building and catching up run in the index refresher task; requests read
+    whichever table was published last and never wait for either. Until the
+    first build is published there are no suggestions.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.table = SuggestTable.build((), {})
+
+    def __len__(self):
+        return len(self.table.payloads)
+
+    def suggest_json(self, prefix: str, limit: int = 10) -> bytes:
+        # Entries are stored pre-serialized; a response is one join
+        table = self.table
+        return b"[" + b",".join(table.payloads[medicine_id][1] for medicine_id in table.suggest(prefix, limit)) + b"]"
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        return self.table.suggest(prefix, limit)
+
+    def refresh_popularity(self, db: Session):
+        popularity = crud.get_medicine_popularity(db)
+        with self._lock:
+            table = self.table.with_popularity(popularity)
+            table.warm()
+            self.table = table
+
+    def _build(self, db: Session):
+        table = SuggestTable.build(crud.iter_suggest_rows(db), crud.get_medicine_popularity(db))
+        table.warm()
+        self.table = table
+
+    def _apply_changes(self, db: Session, since: int, upto: int):
+        # Later entries for a medicine carry its current row, so the last wins
+        changes = dict(crud.iter_suggest_changes_since(db, since, upto))
+        if changes:
+            table = self.table.apply(changes)
+            table.warm()
+            self.table = table
+
+suggest_index = SuggestIndex()
+
+# Generic equivalents
+ALTERNATIVES_MAX_LIMIT = 50
+
+def normalize_strength(value) -> str:
+    # "500 MG" and "500mg" are the same strength
+    return "".join((value or "").casefold().split())
+
+def equivalence_key(generic_name, strength, dosage_form):
+    generic_name = normalize_term(generic_name or "")
+    if not generic_name:
+        return None
+    return generic_name, normalize_strength(strength), normalize_term(dosage_form or "")
+
+class EquivalenceIndex(ChangeLogIndex):
+    """Medicines grouped by generic name + strength + dosage form."""
+
+    def __init__(self):
+        super().__init__()
+        self._groups = {}  # equivalence key -> set of medicine ids
+        self._keys_by_id = {}
+
+    def equivalents(self, db: Session, medicine_id: int) -> set:
+        self.ensure_current(db)
+        with self._lock:
+            key = self._keys_by_id.get(medicine_id)
+            if key is None:
+                return set()
+            return self._groups[key] - {medicine_id}
+
+    def _build(self, db: Session):
+        self._groups = {}
+        self._keys_by_id = {}
+        for row in crud.iter_equivalence_rows(db):
+            self._add(*row)
+
+    def _apply_changes(self, db: Session, since: int, upto: int):
+        for medicine_id, row in crud.iter_equivalence_changes_since(db, since, upto):
+            self._remove(medicine_id)
+            if row is not None:
+                self._add(*row)
+
+    def _add(self, medicine_id: int, generic_name, strength, dosage_form):
+        key = equivalence_key(generic_name, strength, dosage_form)
+        if key is not None:
+            self._keys_by_id[medicine_id] = key
+            self._groups.setdefault(key, set()).add(medicine_id)
+
+    def _remove(self, medicine_id: int):
+        key = self._keys_by_id.pop(medicine_id, None)
+        if key is not None:
+            group = self._groups[key]
+            group.discard(medicine_id)
+            if not group:
+                del self._groups[key]
+
+equivalence_index = EquivalenceIndex()
+
+def get_alternatives(db: Session, medicine_id: int, skip: int = 0, limit: int = 20):
+    # Same generic, strength and form first; same category when there are none
+    equivalent_ids = equivalence_index.equivalents(db, medicine_id)
+    return crud.get_alternative_medicines(db, medicine_id, equivalent_ids or None, skip=skip, limit=limit)
+
+def _refresh_indexes(popularity: bool):
+    db = SessionLocal()
+    try:
+        equivalence_index.ensure_current(db)
+        suggest_index.ensure_current(db)
+        if popularity:
+            suggest_index.refresh_popularity(db)
+    finally:
+        db.close()
+
+async def run_index_refresher():
+    # Builds the indexes and applies catalog changes off the request path,
+    # and keeps popularity ranks fresh
+    popularity_refreshed = None
+    while True:
+        now = time.monotonic()
+        popularity = popularity_refreshed is None or now - popularity_refreshed >= SUGGEST_POPULARITY_REFRESH_SECONDS
+        try:
+            await run_in_threadpool(_refresh_indexes, popularity)
+            if popularity:
+                popularity_refreshed = now
+        except Exception:
+            logger.exception("Catalog index refresh failed")
+        await asyncio.sleep(SUGGEST_CATCH_UP_SECONDS)
@@ -0,0 +1,266 @@
+"""
+Compact binary catalog snapshot.
+
+A columnar, compressed and versioned image of the available catalog, used to
+bootstrap clients and edge caches without paging through ``/medicines`` and to
+warm in-process indexes when a worker starts.
+
+File layout (all integers little-endian)::
+
+    header   magic "QCSNAP\\0\\1", format u16, seq u64, catalog version u64,
+             rows u32, columns u16
+    columns  per column: name (16 bytes, NUL padded), array typecode (1 byte),
+             offset u64, compressed length u64, raw length u64
+    data     one zlib stream per column
+
+Columns are ``id`` (int32, ascending), ``price`` (float64), ``stock``
+(int32), ``category_id`` (int32), ``flags`` (uint8, bit 0 = prescription
+required) and ``name.off``/``name.data`` (uint32 offsets into UTF-8 bytes).
+``seq`` is the ``catalog_changes`` cursor the snapshot is current to, so a
+client can continue with ``GET /medicines/changes?since=<seq>``.
+
+The snapshot is regenerated in the background: only the change-log entries
+after the current ``seq`` are read from the database and merged into the
+existing columns.
+"""
+
+import array
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from bisect import bisect_left
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from . import crud
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = "catalog_snapshot.bin"
+SNAPSHOT_REFRESH_SECONDS = 30
+
+MAGIC = b"QCSNAP\x00\x01"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHQQIH")
+COLUMN = struct.Struct("<16scQQQ")
+
+FLAG_PRESCRIPTION_REQUIRED = 1
+
+def _to_bytes(values: array.array) -> bytes:
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_bytes(typecode: str, data) -> array.array:
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+class CatalogSnapshot:
+    def __init__(self, seq: int = 0, catalog_version: int = 0):
+        self.seq = seq
+        self.catalog_version = catalog_version
+        self.ids = array.array("i")
+        self.prices = array.array("d")
+        self.stock = array.array("i")
+        self.category_ids = array.array("i")
+        self.flags = array.array("B")
+        self.name_offsets = array.array("I", [0])
+        self.name_data = bytearray()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, medicine_id: int, name: str, price: float, stock: int, category_id: int, flags: int):
+        self.ids.append(medicine_id)
+        self.prices.append(price)
+        self.stock.append(stock)
+        self.category_ids.append(category_id)
+        self.flags.append(flags)
+        self.name_data += name.encode()
+        self.name_offsets.append(len(self.name_data))
+
+    def name(self, position: int) -> str:
+        return bytes(self.name_data[self.name_offsets[position]:self.name_offsets[position + 1]]).decode()
+
+    def row(self, position: int):
+        return (
+            self.ids[position], self.name(position), self.prices[position],
+            self.stock[position], self.category_ids[position], self.flags[position]
+        )
+
+    def position(self, medicine_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, medicine_id)
+        if position < len(self.ids) and self.ids[position] == medicine_id:
+            return position
+        return None
+
+    def merged(self, changes: dict, seq: int, catalog_version: int) -> "CatalogSnapshot":
+        # changes: medicine_id -> row tuple, or None to drop the medicine.
+        # Both sides are sorted by id, so this is a single linear merge.
+        result = CatalogSnapshot(seq, catalog_version)
+        changed_ids = sorted(changes)
+        j = 0
+        for i in range(len(self.ids)):
+            medicine_id = self.ids[i]
+            while j < len(changed_ids) and changed_ids[j] < medicine_id:
+                if changes[changed_ids[j]] is not None:
+                    result.append(*changes[changed_ids[j]])
+                j += 1
+            if j < len(changed_ids) and changed_ids[j] == medicine_id:
+                if changes[medicine_id] is not None:
+                    result.append(*changes[medicine_id])
+                j += 1
+            else:
+                result.append(*self.row(i))
+        for medicine_id in changed_ids[j:]:
+            if changes[medicine_id] is not None:
+                result.append(*changes[medicine_id])
+        return result
+
+    def _columns(self):
+        return [
+            ("id", self.ids),
+            ("price", self.prices),
+            ("stock", self.stock),
+            ("category_id", self.category_ids),
+            ("flags", self.flags),
+            ("name.off", self.name_offsets),
+            ("name.data", array.array("B", self.name_data)),
+        ]
+
+    def write(self, path: str = SNAPSHOT_PATH):
+        columns = self._columns()
+        blobs = [(name, values.typecode, _to_bytes(values)) for name, values in columns]
+        compressed = [zlib.compress(raw, 6) for _, _, raw in blobs]
+        offset = HEADER.size + COLUMN.size * len(blobs)
+        directory = []
+        for (name, typecode, raw), data in zip(blobs, compressed):
+            directory.append(COLUMN.pack(name.encode(), typecode.encode(), offset, len(data), len(raw)))
+            offset += len(data)
+
+        # Every worker refreshes the snapshot, so each writes its own
+        # temporary file and the rename publishes one complete file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(HEADER.pack(MAGIC, FORMAT_VERSION, self.seq, self.catalog_version, len(self), len(blobs)))
+                out.writelines(directory)
+                out.writelines(compressed)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str = SNAPSHOT_PATH) -> "CatalogSnapshot":
+        with open(path, "rb") as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, fmt, seq, catalog_version, rows, column_count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or fmt != FORMAT_VERSION:
+                raise ValueError(f"Unsupported catalog snapshot format in {path}")
+            columns = {}
+            for index in range(column_count):
+                name, typecode, offset, length, raw_length = COLUMN.unpack_from(data, HEADER.size + index * COLUMN.size)
+                raw = zlib.decompress(data[offset:offset + length])
+                if len(raw) != raw_length:
+                    raise ValueError(f"Corrupt column {name!r} in {path}")
+                columns[name.rstrip(b"\0").decode()] = _from_bytes(typecode.decode(), raw)
+
+        snapshot = cls(seq, catalog_version)
+        snapshot.ids = columns["id"]
+        snapshot.prices = columns["price"]
+        snapshot.stock = columns["stock"]
+        snapshot.category_ids = columns["category_id"]
+        snapshot.flags = columns["flags"]
+        snapshot.name_offsets = columns["name.off"]
+        snapshot.name_data = bytearray(columns["name.data"].tobytes())
+        if len(snapshot) != rows:
+            raise ValueError(f"Row count mismatch in {path}")
+        return snapshot
+
+current: Optional[CatalogSnapshot] = None
+
+def open_published(path: str = SNAPSHOT_PATH):
+    """The published snapshot file, open at its start, and the seq in its header.
+
+    Another worker may have replaced the file since this process last wrote
+    it, so anything describing the response must come from the file itself.
+    """
+    source = open(path, "rb")
+    try:
+        magic, fmt, seq = HEADER.unpack(source.read(HEADER.size))[:3]
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot format in {path}")
+        source.seek(0)
+    except BaseException:
+        source.close()
+        raise
+    return source, seq
+
+def iter_file(source, chunk_size: int = 64 * 1024):
+    with source:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def _row(medicine_id, name, price, stock, category_id, prescription_required):
+    return (medicine_id, name, price, stock, category_id,
+            FLAG_PRESCRIPTION_REQUIRED if prescription_required else 0)
+
+def build_snapshot(db) -> CatalogSnapshot:
+    seq, catalog_version = crud.get_catalog_cursor(db)
+    snapshot = CatalogSnapshot(seq, catalog_version)
+    for row in crud.iter_available_catalog_rows(db):
+        snapshot.append(*_row(*row))
+    return snapshot
+
+def refresh_snapshot(path: str = SNAPSHOT_PATH) -> Optional[CatalogSnapshot]:
+    """Bring the snapshot up to date; returns the new snapshot if it changed."""
+    global current
+    db = SessionLocal()
+    try:
+        seq, catalog_version = crud.get_catalog_cursor(db)
+        if current is not None and current.seq == seq:
+            # Category-only writes bump the version without touching medicines
+            current.catalog_version = catalog_version
+            return None
+        if current is None or seq < current.seq:
+            snapshot = build_snapshot(db)
+        else:
+            changes = {}
+            for medicine_id, row in crud.iter_catalog_changes_since(db, current.seq, seq):
+                changes[medicine_id] = _row(*row) if row is not None else None
+            snapshot = current.merged(changes, seq, catalog_version)
+    finally:
+        db.close()
+    snapshot.write(path)
+    current = snapshot
+    return snapshot
+
+def load_current(path: str = SNAPSHOT_PATH) -> Optional[CatalogSnapshot]:
+    global current
+    try:
+        current = CatalogSnapshot.load(path)
+    except (OSError, ValueError, KeyError, zlib.error, struct.error):
+        current = None
+    return current
+
+async def run_snapshot_refresher():
+    while True:
+        try:
+            await run_in_threadpool(refresh_snapshot)
+        except Exception:
+            logger.exception("Catalog snapshot refresh failed")
+        await asyncio.sleep(SNAPSHOT_REFRESH_SECONDS)
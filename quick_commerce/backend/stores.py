@@ -0,0 +1,144 @@
+"""
+Store-level inventory and location-based availability.
+
+Each store delivers within its own ``delivery_radius_km``. Stock per store
+lives in ``store_inventory``; hot-path reads (availability of a medicine near
+a customer, choosing the fulfilling store at checkout, nearby store counts)
+are served from ``stock_map``, an in-process copy per store that the
+ingestion path and checkout update as they write. Entries written by other
+worker processes are picked up when a store's copy is older than
+``STORE_STOCK_TTL_SECONDS``.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+STORE_STOCK_TTL_SECONDS = 30
+STORE_PREP_MINUTES = 10
+MINUTES_PER_KM = 4
+
+EARTH_RADIUS_KM = 6371.0
+
+class StoreLocation(NamedTuple):
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    delivery_radius_km: float
+
+def distance_km(latitude: float, longitude: float, other_latitude: float, other_longitude: float) -> float:
+    # Haversine great-circle distance
+    lat1, lat2 = math.radians(latitude), math.radians(other_latitude)
+    d_lat = lat2 - lat1
+    d_lon = math.radians(other_longitude - longitude)
+    a = math.sin(d_lat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class StoreStockMap:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores: Optional[Tuple[float, List[StoreLocation]]] = None
+        self._stock: Dict[int, Tuple[float, Dict[int, int]]] = {}
+
+    def stores(self, db: Session) -> List[StoreLocation]:
+        with self._lock:
+            entry = self._stores
+        if entry is None or entry[0] < time.monotonic():
+            stores = [
+                StoreLocation(store.id, store.name, store.address, store.latitude, store.longitude,
+                              store.delivery_radius_km)
+                for store in crud.get_stores(db)
+            ]
+            entry = (time.monotonic() + STORE_STOCK_TTL_SECONDS, stores)
+            with self._lock:
+                self._stores = entry
+        return entry[1]
+
+    def stock(self, db: Session, store_id: int) -> Dict[int, int]:
+        with self._lock:
+            entry = self._stock.get(store_id)
+        if entry is None or entry[0] < time.monotonic():
+            entry = (time.monotonic() + STORE_STOCK_TTL_SECONDS, crud.get_store_stock(db, store_id))
+            with self._lock:
+                self._stock[store_id] = entry
+        return entry[1]
+
+    def update(self, store_id: int, stock: Dict[int, int]):
+        # Values written by this process; copies not loaded yet stay unloaded
+        with self._lock:
+            entry = self._stock.get(store_id)
+            if entry is not None:
+                entry[1].update(stock)
+
+    def adjust(self, store_id: int, deltas: Dict[int, int]):
+        with self._lock:
+            entry = self._stock.get(store_id)
+            if entry is not None:
+                for medicine_id, delta in deltas.items():
+                    entry[1][medicine_id] = entry[1].get(medicine_id, 0) + delta
+
+    def invalidate_stores(self):
+        with self._lock:
+            self._stores = None
+
+stock_map = StoreStockMap()
+
+def stores_in_range(db: Session, latitude: float, longitude: float) -> List[Tuple[float, StoreLocation]]:
+    # (distance, store) for stores that deliver to the point, nearest first
+    in_range = []
+    for store in stock_map.stores(db):
+        distance = distance_km(latitude, longitude, store.latitude, store.longitude)
+        if distance <= store.delivery_radius_km:
+            in_range.append((distance, store))
+    in_range.sort(key=lambda pair: pair[0])
+    return in_range
+
+def nearby_pharmacies(db: Session, latitude: float, longitude: float, radius_km: float = 5.0) -> list:
+    pharmacies = []
+    for store in stock_map.stores(db):
+        distance = distance_km(latitude, longitude, store.latitude, store.longitude)
+        if distance <= radius_km:
+            stock = stock_map.stock(db, store.id)
+            pharmacies.append({
+                "id": store.id,
+                "name": store.name,
+                "address": store.address,
+                "distance_km": round(distance, 2),
+                "available_medicines": sum(1 for quantity in stock.values() if quantity > 0),
+                "estimated_delivery_time": STORE_PREP_MINUTES + math.ceil(distance * MINUTES_PER_KM)
+            })
+    pharmacies.sort(key=lambda pharmacy: pharmacy["distance_km"])
+    return pharmacies
+
+def medicine_availability(db: Session, medicine_id: int, latitude: float, longitude: float) -> list:
+    availability = []
+    for distance, store in stores_in_range(db, latitude, longitude):
+        quantity = stock_map.stock(db, store.id).get(medicine_id, 0)
+        if quantity > 0:
+            availability.append({
+                "store_id": store.id,
+                "name": store.name,
+                "distance_km": round(distance, 2),
+                "stock_quantity": quantity
+            })
+    return availability
+
+def choose_fulfilling_store(db: Session, latitude: float, longitude: float, quantities: Dict[int, int]):
+    """Nearest in-range store stocking the whole cart.
+
+    Returns ``(stores_in_range, store_id)``; ``store_id`` is None when no
+    in-range store can cover every line.
+    """
+    in_range = stores_in_range(db, latitude, longitude)
+    for _, store in in_range:
+        stock = stock_map.stock(db, store.id)
+        if all(stock.get(medicine_id, 0) >= quantity for medicine_id, quantity in quantities.items()):
+            return in_range, store.id
+    return in_range, None
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Quick Commerce Medicine Delivery - Notification Fan-out Benchmark
+Feeds order status events into backend.notifications at a fixed rate and
+compares two ways of sending them:
+
+  naive     one transport call per event, made by the writer (the status
+            update waits for it)
+  batched   NotificationDispatcher: writers only submit; a flusher thread
+            coalesces per user over the window, applies the per-user rate
+            limit and sends due messages in batches
+
+Events are order status changes for --users customers with up to three open
+orders each. Transports: "file" (NDJSON outbox) or "http" (HttpTransport to
+the local receiver from ``python -m backend.notifications serve``, started
+in-process here).
+
+Reported: the event rate the writers sustained, writer cost per event,
+outbound calls, messages, coalescing, rate-limit deferrals, and the time from
+a user's first event to its message being handed to the transport.
+
+    python benchmark_notifications.py [--events-per-minute 100000] [--seconds 20]
+                                      [--users 10000] [--transport file|http]
+"""
+
+import argparse
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from backend import notifications  # noqa: E402
+from backend.notifications import Notification  # noqa: E402
+
+STATUSES = ["confirmed", "preparing", "out_for_delivery", "delivered", "cancelled"]
+
+def make_transport(kind: str, outbox: str):
+    if kind == "file":
+        return notifications.FileTransport(outbox), None
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = notifications.make_receiver(port, outbox)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return notifications.HttpTransport(f"http://127.0.0.1:{port}/"), server
+
+def make_events(count: int, users: int, seed: int = 7):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    events = []
+    for _ in range(count):
+        user_id = rng.randrange(users)
+        events.append(Notification(user_id, "order_status", user_id * 3 + rng.randrange(3), rng.choice(STATUSES), now))
+    return events
+
+class CountingTransport:
+    def __init__(self, transport):
+        self.transport = transport
+        self.calls = 0
+
+    def send(self, messages):
+        self.calls += 1
+        self.transport.send(messages)
+
+def feed(events, events_per_second: float, submit) -> float:
+    """Submit events at the target rate in 10 ms ticks; returns seconds spent inside submit."""
+    tick = 0.01
+    per_tick = events_per_second * tick
+    start = time.perf_counter()
+    busy = 0.0
+    sent = 0
+    owed = 0.0
+    while sent < len(events):
+        owed += per_tick
+        count = min(int(owed), len(events) - sent)
+        owed -= count
+        if count:
+            t0 = time.perf_counter()
+            submit(events[sent:sent + count])
+            busy += time.perf_counter() - t0
+            sent += count
+        delay = start + (sent / events_per_second) - time.perf_counter()
+        if delay > 0:
+            time.sleep(min(delay, tick))
+    return busy
+
+def run_naive(events, transport, events_per_second: float) -> dict:
+    counting = CountingTransport(transport)
+
+    def submit(batch):
+        for event in batch:
+            counting.send([notifications.render(event.user_id, (event,))])
+
+    start = time.perf_counter()
+    busy = feed(events, events_per_second, submit)
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "busy": busy, "calls": counting.calls, "messages": len(events)}
+
+def run_batched(events, transport, events_per_second: float) -> dict:
+    counting = CountingTransport(transport)
+    dispatcher = notifications.NotificationDispatcher(counting, latency_samples=len(events))
+    done = threading.Event()
+
+    def flusher():
+        while not done.wait(notifications.NOTIFICATION_FLUSH_SECONDS):
+            dispatcher.flush()
+
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    start = time.perf_counter()
+    busy = feed(events, events_per_second, dispatcher.submit)
+    elapsed = time.perf_counter() - start
+    # Let the last window close, then stop; users still held by the rate limit
+    # are reported as pending rather than force-flushed
+    time.sleep(notifications.NOTIFICATION_WINDOW_SECONDS + notifications.NOTIFICATION_FLUSH_SECONDS)
+    done.set()
+    thread.join()
+    dispatcher.flush()
+    stats = dispatcher.stats()
+    latencies = sorted(dispatcher._latencies)
+    return {
+        "elapsed": elapsed, "busy": busy, "calls": counting.calls, "messages": stats["messages_sent"],
+        "coalesced": stats["coalesced"], "rate_limited": stats["rate_limited"],
+        "pending": stats["pending_notifications"],
+        "p50": latencies[len(latencies) // 2], "p99": latencies[int(len(latencies) * 0.99)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events-per-minute", type=int, default=100000)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--transport", choices=["file", "http"], default="file")
+    args = parser.parse_args()
+
+    rate = args.events_per_minute / 60
+    events = make_events(int(rate * args.seconds), args.users)
+    print(f"{len(events)} events over {args.seconds:g}s ({args.events_per_minute:,}/min target), "
+          f"{args.users} users, {args.transport} transport\n")
+    print("| Mode | Events/min sustained | Writer cost/event | Outbound calls | Messages | Coalesced | Rate-limited | p50 / p99 hold |")
+    print("|------|----------------------|-------------------|----------------|----------|-----------|--------------|----------------|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, run in (("naive", run_naive), ("batched", run_batched)):
+            transport, server = make_transport(args.transport, os.path.join(tmp, f"{mode}.ndjson"))
+            result = run(events, transport, rate)
+            if server is not None:
+                server.shutdown()
+            sustained = len(events) / result["elapsed"] * 60
+            cost = result["busy"] / len(events) * 1e6
+            if mode == "naive":
+                print(f"| naive | {sustained:,.0f} | {cost:,.1f} µs | {result['calls']:,} | {result['messages']:,} | - | - | - |")
+            else:
+                print(f"| batched | {sustained:,.0f} | {cost:,.1f} µs | {result['calls']:,} | {result['messages']:,} "
+                      f"| {result['coalesced']:,} | {result['rate_limited']:,} ({result['pending']:,} still held) "
+                      f"| {result['p50'] * 1000:,.0f} / {result['p99'] * 1000:,.0f} ms |")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Quick Commerce Medicine Delivery - Order Number Benchmark
+Compares order number schemes on a scratch SQLite database:
+
+  uuid8       ORD-{uuid4().hex[:8]} (the old create_order scheme): random,
+              32 bits, so collisions are expected at high volume
+  snowflake   ORD-{13 Crockford base32 chars} from backend.ids: time-ordered,
+              64 bits, unique per worker by construction
+
+Orders are inserted in transactions of --batch rows, the way a busy checkout
+commits them. Reported: insert throughput, rows lost to unique-index
+collisions (INSERT OR IGNORE), and the size of the order_number index.
+
+    python benchmark_order_numbers.py [--orders 200000] [--batch 500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(__file__))
+
+from backend import ids, models  # noqa: E402,F401
+from backend.database import Base  # noqa: E402
+
+def uuid8() -> str:
+    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+
+def snowflake() -> str:
+    return ids.next_order_number()
+
+INSERT_ORDER = text(
+    "INSERT OR IGNORE INTO orders (user_id, order_number, total_amount, delivery_fee, tax_amount, "
+    "delivery_address, delivery_city, delivery_pincode, status, delivery_type, created_at, version) "
+    "VALUES (1, :number, 100.0, 50.0, 18.0, 'addr', 'city', '560001', 'PENDING', 'STANDARD', :now, 1)"
+)
+
+def index_bytes(conn) -> int:
+    # The unique constraint on order_number is SQLite's autoindex on orders
+    return conn.execute(text(
+        "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'orders' AND sql IS NULL)"
+    )).scalar()
+
+def run(make_number, orders: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        inserted = 0
+        start = time.perf_counter()
+        for offset in range(0, orders, batch):
+            now = datetime.utcnow()
+            rows = [{"number": make_number(), "now": now} for _ in range(min(batch, orders - offset))]
+            with engine.begin() as conn:
+                inserted += conn.execute(INSERT_ORDER, rows).rowcount
+        elapsed = time.perf_counter() - start
+        with engine.connect() as conn:
+            size = index_bytes(conn)
+        engine.dispose()
+    return {"rate": orders / elapsed, "collisions": orders - inserted, "index_bytes": size}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{args.orders} orders in transactions of {args.batch}\n")
+    print("| Scheme | Orders/s | Collisions | order_number index |")
+    print("|--------|----------|------------|--------------------|")
+    for name, make_number in (("uuid8", uuid8), ("snowflake", snowflake)):
+        result = run(make_number, args.orders, args.batch)
+        print(f"| {name} | {result['rate']:,.0f} | {result['collisions']} | {result['index_bytes'] / 1024:,.0f} KiB |")
+
+if __name__ == "__main__":
+    main()
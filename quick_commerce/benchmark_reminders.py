@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Quick Commerce Medicine Delivery - Reminder Scheduler Benchmark
+Holds --courses active medicine courses in memory three ways and reports the
+traced memory per course:
+
+  objects   one plain object per course (attributes in a __dict__) on a heapq
+            of (next due, id, course)
+  slotted   the same with __slots__
+  wheel     backend.reminders: parallel int64 arrays plus a hierarchical
+            timing wheel of record numbers (what the backend runs)
+
+It then runs the wheel scheduler minute by minute through one simulated day
+and reports the reminders fired, the total tick time and the slowest tick
+(the 09:00 slot fires for every once- or twice-daily course at once).
+
+    python benchmark_reminders.py [--courses 1000000]
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(__file__))
+
+from backend import dosing  # noqa: E402
+from backend.reminders import ReminderScheduler  # noqa: E402
+
+FREQUENCIES = ["OD", "BD", "TDS", "1-0-1", "QID", "at bedtime", "every 8 hours"]
+
+class Course:
+    def __init__(self, schedule_id, user_id, medicine_id, slots, ends, next_due):
+        self.schedule_id = schedule_id
+        self.user_id = user_id
+        self.medicine_id = medicine_id
+        self.slots = slots
+        self.ends = ends
+        self.next_due = next_due
+
+class SlottedCourse:
+    __slots__ = ("schedule_id", "user_id", "medicine_id", "slots", "ends", "next_due")
+
+    def __init__(self, schedule_id, user_id, medicine_id, slots, ends, next_due):
+        self.schedule_id = schedule_id
+        self.user_id = user_id
+        self.medicine_id = medicine_id
+        self.slots = slots
+        self.ends = ends
+        self.next_due = next_due
+
+def make_rows(count: int, now: datetime, seed: int = 11):
+    # Generated during each build, so only what a layout keeps is traced
+    rng = random.Random(seed)
+    masks = [dosing.parse_frequency(frequency) for frequency in FREQUENCIES]
+    for schedule_id in range(1, count + 1):
+        yield (schedule_id, rng.randrange(1, count // 2 + 2), rng.randrange(1, 5000), rng.choice(masks),
+               now + timedelta(days=rng.randrange(1, 31), minutes=rng.randrange(1440)))
+
+def build_heap(rows, now: datetime, cls):
+    start = dosing.to_minute(now)
+    heap = []
+    for schedule_id, user_id, medicine_id, slots, ends_at in rows:
+        ends = dosing.to_minute(ends_at)
+        due = dosing.next_due(slots, start, ends)
+        heap.append((due, schedule_id, cls(schedule_id, user_id, medicine_id, slots, ends, due)))
+    heapq.heapify(heap)
+    return heap
+
+def build_wheel(rows, now: datetime):
+    scheduler = ReminderScheduler(grace_minutes=0)
+    scheduler.load(rows, now)
+    return scheduler
+
+def traced(build, *args):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = build(*args)
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=1000000)
+    args = parser.parse_args()
+
+    now = datetime(2026, 1, 1, 0, 0)
+    print(f"{args.courses:,} active courses\n")
+    print("| Layout | Bytes/course | Build |")
+    print("|--------|--------------|-------|")
+    for name, build in (
+        ("objects", lambda: build_heap(make_rows(args.courses, now), now, Course)),
+        ("slotted", lambda: build_heap(make_rows(args.courses, now), now, SlottedCourse)),
+        ("wheel", lambda: build_wheel(make_rows(args.courses, now), now)),
+    ):
+        result, used, elapsed = traced(build)
+        print(f"| {name} | {used / args.courses:,.0f} | {elapsed:,.1f} s |")
+        if name == "wheel":
+            scheduler = result
+        del result
+
+    fired = 0
+    slowest = 0.0
+    start = time.perf_counter()
+    for minute in range(1, 24 * 60 + 1):
+        tick_start = time.perf_counter()
+        fired += len(scheduler.tick(now + timedelta(minutes=minute)))
+        slowest = max(slowest, time.perf_counter() - tick_start)
+    elapsed = time.perf_counter() - start
+    print(f"\nOne simulated day: {fired:,} reminders fired in {elapsed:,.1f} s of ticks "
+          f"({fired / elapsed:,.0f}/s), slowest tick {slowest * 1000:,.0f} ms, "
+          f"{len(scheduler.records):,} courses still active")
+
+if __name__ == "__main__":
+    main()
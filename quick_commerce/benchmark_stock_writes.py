@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Quick Commerce Medicine Delivery - Stock Write Benchmark
+Compares stock write throughput on a scratch SQLite database:
+
+  overwrite   read the row, write the new absolute stock (the old
+              create_order / update_medicine_stock pattern)
+  ledger      append a stock_movements row and apply a relative UPDATE to
+              the medicines.stock_quantity projection (current code path)
+  append      append the stock_movements row only (projection rebuilt later)
+
+Each write is its own transaction, as it is in a request.
+
+    python benchmark_stock_writes.py [--writes 5000] [--medicines 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(__file__))
+
+from backend import models  # noqa: E402
+from backend.database import Base  # noqa: E402
+
+def setup(engine, medicines: int):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Bench')"))
+        conn.execute(text(
+            "INSERT INTO medicines (id, name, category_id, price, stock_quantity, prescription_required, "
+            "delivery_time_minutes, is_available) VALUES (:id, :name, 1, 10.0, 1000, 0, 30, 1)"
+        ), [{"id": medicine_id, "name": f"Medicine {medicine_id}"} for medicine_id in range(1, medicines + 1)])
+
+def overwrite(conn, medicine_id: int, delta: int):
+    stock = conn.execute(text("SELECT stock_quantity FROM medicines WHERE id = :id"), {"id": medicine_id}).scalar()
+    conn.execute(text("UPDATE medicines SET stock_quantity = :stock WHERE id = :id"),
+                 {"id": medicine_id, "stock": stock + delta})
+
+def append(conn, medicine_id: int, delta: int):
+    conn.execute(text(
+        "INSERT INTO stock_movements (medicine_id, quantity, reason, reference, created_at) "
+        "VALUES (:id, :delta, 'ORDER', NULL, :now)"
+    ), {"id": medicine_id, "delta": delta, "now": datetime.utcnow()})
+
+def ledger(conn, medicine_id: int, delta: int):
+    append(conn, medicine_id, delta)
+    conn.execute(text("UPDATE medicines SET stock_quantity = stock_quantity + :delta WHERE id = :id"),
+                 {"id": medicine_id, "delta": delta})
+
+def run(write, writes: int, medicines: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        setup(engine, medicines)
+        rng = random.Random(42)
+        plan = [(rng.randint(1, medicines), rng.choice((-2, -1, 1, 5))) for _ in range(writes)]
+        start = time.perf_counter()
+        for medicine_id, delta in plan:
+            with engine.begin() as conn:
+                write(conn, medicine_id, delta)
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+    return writes / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--medicines", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.writes} single-write transactions over {args.medicines} medicines\n")
+    print("| Strategy | Writes/s |")
+    print("|----------|----------|")
+    for name, write in (("overwrite", overwrite), ("ledger", ledger), ("append", append)):
+        print(f"| {name} | {run(write, args.writes, args.medicines):,.0f} |")
+
+if __name__ == "__main__":
+    main()
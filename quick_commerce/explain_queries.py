@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Quick Commerce Medicine Delivery - Query Plan Report
+Prints SQLite EXPLAIN QUERY PLAN output for the hot query shapes in
+backend/crud.py, before and after the schema migrations are applied.
+
+    python explain_queries.py > QUERY_PLANS.md
+"""
+
+import os
+import sys
+import tempfile
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(__file__))
+
+from backend import models, migrations  # noqa: E402
+
+# (label, crud function, SQL) - parameters are bound to dummy values
+HOT_QUERIES = [
+    ("Cart line lookup", "add_to_cart",
+     "SELECT * FROM cart_items WHERE user_id = 1 AND medicine_id = 1"),
+    ("User cart", "get_user_cart",
+     "SELECT * FROM cart_items WHERE user_id = 1"),
+    ("User orders", "get_user_orders",
+     "SELECT * FROM orders WHERE user_id = 1"),
+    ("Partner work list", "get_delivery_assignments",
+     " UNION ALL ".join(
+         "SELECT id, delivery_address, estimated_delivery_time FROM orders WHERE delivery_partner_id = 1 "
+         f"AND status = '{status}'" for status in ("PENDING", "CONFIRMED", "PREPARING", "OUT_FOR_DELIVERY")
+     ) + " ORDER BY estimated_delivery_time, id LIMIT 100"),
+    ("User prescriptions", "get_user_prescriptions",
+     "SELECT * FROM prescriptions WHERE user_id = 1"),
+    ("Catalog by category and price", "search_medicines",
+     "SELECT * FROM medicines WHERE is_available = 1 AND category_id = 1 AND price BETWEEN 10 AND 100"),
+    ("Available catalog page", "get_medicines",
+     "SELECT * FROM medicines WHERE is_available = 1 LIMIT 100 OFFSET 0"),
+    ("User by phone", "get_user_by_phone",
+     "SELECT * FROM users WHERE phone = '9999999999'"),
+    ("Order items", "get_order",
+     "SELECT * FROM order_items WHERE order_id = 1"),
+    ("Orders changed since the rollup watermark", "apply_order_rollups",
+     "SELECT id FROM orders WHERE updated_at >= '2026-01-01' OR created_at >= '2026-01-01'"),
+]
+
+def explain(conn, sql):
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return [row[-1] for row in rows]
+
+def collect(conn):
+    return {label: explain(conn, sql) for label, _, sql in HOT_QUERIES}
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+
+        # Baseline schema: tables as create_all made them before migration 1
+        with engine.begin() as conn:
+            models.Base.metadata.create_all(bind=conn)
+            for index in ["uq_cart_items_user_medicine", "ix_orders_user_id", "ix_orders_partner_status_eta",
+                          "ix_prescriptions_user_id", "ix_medicines_available_category_price",
+                          "ix_users_phone", "ix_order_items_order_id", "ix_medicines_available_expiry",
+                          "ix_orders_created_at", "ix_orders_updated_at"]:
+                migrations.drop_index(conn, index)
+            before = collect(conn)
+
+        migrations.run_migrations(engine)
+        with engine.begin() as conn:
+            after = collect(conn)
+
+    print("# Query Plan Report\n")
+    print("Generated by `python explain_queries.py` (SQLite `EXPLAIN QUERY PLAN`).\n")
+    for label, function, sql in HOT_QUERIES:
+        print(f"## {label} (`crud.{function}`)\n")
+        print(f"```sql\n{sql}\n```\n")
+        print("| Before | After |")
+        print("| --- | --- |")
+        print(f"| {'<br>'.join(before[label])} | {'<br>'.join(after[label])} |\n")
+
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,8 @@ if 'user' not in st.session_state:
     st.session_state.user = None
 if 'cart' not in st.session_state:
     st.session_state.cart = []
+if 'etag_cache' not in st.session_state:
+    st.session_state.etag_cache = {}
 
 # API helper functions
 def api_request(method, endpoint, data=None, token=None):
@@ -66,9 +68,17 @@ def api_request(method, endpoint, data=None, token=None):
     
     url = f"{API_BASE_URL}{endpoint}"
     
+    # Revalidate GETs with the last ETag so unchanged data comes back as 304
+    cache_key = (url, token)
+    cached = st.session_state.etag_cache.get(cache_key) if method == "GET" else None
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    
     try:
         if method == "GET":
             response = requests.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                return cached[1]
         elif method == "POST":
             response = requests.post(url, json=data, headers=headers)
         elif method == "PUT":
@@ -77,7 +87,10 @@ def api_request(method, endpoint, data=None, token=None):
             response = requests.delete(url, headers=headers)
         
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            if method == "GET" and response.headers.get("ETag"):
+                st.session_state.etag_cache[cache_key] = (response.headers["ETag"], data)
+            return data
         else:
             st.error(f"API Error: {response.status_code} - {response.text}")
             return None
@@ -123,6 +136,10 @@ def main_navigation():
         st.sidebar.write(f"Welcome, {st.session_state.user['username']}!")
         st.sidebar.write(f"Role: {st.session_state.user['role']}")
         
+        cart_summary = api_request("GET", "/cart/summary", token=st.session_state.token)
+        if cart_summary:
+            st.sidebar.write(f"🛒 {cart_summary['total_quantity']} items - ₹{cart_summary['total_amount']:.2f}")
+        
         page = st.sidebar.selectbox(
             "Navigation",
             ["🏠 Dashboard", "💊 Medicines", "🛒 Cart", "📋 Orders", "📄 Prescriptions", "👤 Profile", "🚚 Delivery"]
@@ -142,29 +159,45 @@ def dashboard_page():
     """Main dashboard"""
     st.markdown('<h1 class="main-header">🏥 Quick Commerce Medicine Delivery</h1>', unsafe_allow_html=True)
     
+    if st.session_state.user["role"] != "pharmacy_admin":
+        st.info("Browse medicines, upload prescriptions and track your orders from the menu.")
+        return
+    
+    summary = api_request("GET", "/analytics/summary?days=7", token=st.session_state.token)
+    if not summary:
+        return
+    totals = summary["totals"]
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("Total Orders", "15")
-        st.metric("Pending Deliveries", "3")
+        st.metric("Orders (7 days)", totals["orders"])
+        st.metric("Open Orders", summary["open_orders"])
     
     with col2:
-        st.metric("Available Medicines", "250+")
-        st.metric("Delivery Partners", "12")
+        st.metric("Revenue (7 days)", f"₹{totals['revenue']:,.2f}")
+        top = summary["top_medicines"]
+        st.metric("Top Medicine", f"{top[0]['name']} ({top[0]['units']})" if top else "-")
     
     with col3:
-        st.metric("Average Delivery Time", "25 min")
-        st.metric("Customer Rating", "4.8 ⭐")
+        avg_minutes = totals["avg_delivery_minutes"]
+        st.metric("Average Delivery Time", f"{avg_minutes:.0f} min" if avg_minutes is not None else "-")
+        st.metric("Cancellation Rate", f"{totals['cancellation_rate']:.1%}")
+    
+    if summary["as_of"]:
+        st.caption(f"Updated {summary['as_of']} UTC")
     
     # Recent orders chart
     st.subheader("Recent Orders")
-    orders_data = {
-        'Date': ['2024-01-15', '2024-01-14', '2024-01-13', '2024-01-12', '2024-01-11'],
-        'Orders': [8, 12, 6, 15, 10]
-    }
-    df = pd.DataFrame(orders_data)
-    fig = px.line(df, x='Date', y='Orders', title='Daily Orders')
-    st.plotly_chart(fig, use_container_width=True)
+    if summary["daily"]:
+        df = pd.DataFrame(summary["daily"])
+        fig = px.line(df, x="day", y="orders", title="Daily Orders")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if summary["cities"]:
+        st.subheader("By City")
+        cities = pd.DataFrame(summary["cities"])[["city", "orders", "revenue", "avg_delivery_minutes", "cancellation_rate"]]
+        st.dataframe(cities, use_container_width=True)
 
 # Medicines page
 def medicines_page():
@@ -242,8 +275,6 @@ def cart_page():
     cart = api_request("GET", "/cart", token=st.session_state.token)
     
     if cart and cart["items"]:
-        total_amount = 0
-        
         for item in cart["items"]:
             with st.container():
                 col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
@@ -257,7 +288,6 @@ def cart_page():
                 
                 with col3:
                     item_total = item['quantity'] * item['medicine']['price']
-                    total_amount += item_total
                     st.write(f"**₹{item_total}**")
                 
                 with col4:
@@ -266,7 +296,9 @@ def cart_page():
                         st.rerun()
         
         st.divider()
-        st.write(f"**Total Amount: ₹{total_amount}**")
+        st.write(f"**Total Amount: ₹{cart['total_amount']}**")
+        if cart["prescription_required"]:
+            st.warning("⚠️ Some items in your cart require a prescription")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -287,7 +319,8 @@ def orders_page():
     """User orders"""
     st.title("📋 My Orders")
     
-    orders = api_request("GET", "/orders", token=st.session_state.token)
+    # Summaries only; items are fetched per order when asked for
+    orders = api_request("GET", "/orders?view=summary", token=st.session_state.token)
     
     if orders:
         for order in orders:
@@ -297,7 +330,7 @@ def orders_page():
                 with col1:
                     st.write(f"**Order Date:** {order['created_at'][:10]}")
                     st.write(f"**Total Amount:** ₹{order['total_amount']}")
-                    st.write(f"**Delivery Address:** {order['delivery_address']}")
+                    st.write(f"**Items:** {order['item_count']}")
                     st.write(f"**Delivery Type:** {order['delivery_type']}")
                 
                 with col2:
@@ -311,9 +344,13 @@ def orders_page():
                         st.write(f"**Delivered:** {order['actual_delivery_time'][:16]}")
                 
                 # Order items
-                st.subheader("Items:")
-                for item in order['items']:
-                    st.write(f"• {item['medicine']['name']} x{item['quantity']} - ₹{item['total_price']}")
+                if st.button("Show items", key=f"order_items_{order['id']}"):
+                    detail = api_request("GET", f"/orders/{order['id']}", token=st.session_state.token)
+                    if detail:
+                        st.write(f"**Delivery Address:** {detail['delivery_address']}")
+                        st.subheader("Items:")
+                        for item in detail['items']:
+                            st.write(f"• {item['medicine']['name']} x{item['quantity']} - ₹{item['total_price']}")
     else:
         st.info("No orders found.")
 
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+# A fixed snowflake worker id, so tests do not lock files in worker_ids/
+os.environ.setdefault("WORKER_ID", "1")
+
+from backend import auth, cache, crud, migrations, models, schemas, search  # noqa: E402
+from backend.database import SessionLocal  # noqa: E402
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A session on a fresh, fully migrated database.
+
+    ``SessionLocal`` is rebound to it, so background code that opens its own
+    sessions (jobs, stock sync flushes) uses the same database. Files the
+    caches write land in ``tmp_path``, and the in-memory catalog indexes start
+    empty.
+    """
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    migrations.run_migrations(engine)
+    SessionLocal.configure(bind=engine)
+    cache.catalog_cache.clear(signal=False)
+    monkeypatch.setattr(search, "suggest_index", search.SuggestIndex())
+    monkeypatch.setattr(search, "equivalence_index", search.EquivalenceIndex())
+    session = SessionLocal()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def user(db):
+    user = models.User(username="alice", email="alice@example.com", phone="9000000001", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+@pytest.fixture
+def category(db):
+    return crud.create_category(db, schemas.CategoryCreate(name="Pain relief"))
+
+@pytest.fixture
+def make_medicine(db, category):
+    def make(name, stock=100, price=10.0, prescription_required=False, **fields):
+        return crud.create_medicine(db, schemas.MedicineCreate(
+            name=name, category_id=fields.pop("category_id", category.id), price=price,
+            stock_quantity=stock, prescription_required=prescription_required, **fields
+        ))
+    return make
+
+@pytest.fixture
+def order_data():
+    return schemas.OrderCreate(delivery_address="12 MG Road", delivery_city="Bengaluru", delivery_pincode="560001")
+
+@pytest.fixture
+def client(db):
+    # Imported on first use so the app's upload directory lands in tmp_path;
+    # startup tasks only run inside a ``with`` block, which tests do not use
+    from backend.main import app
+    return TestClient(app)
+
+@pytest.fixture
+def admin(db):
+    admin = models.User(username="admin", email="admin@example.com", phone="9000000009", hashed_password="x",
+                        role=models.UserRole.PHARMACY_ADMIN)
+    db.add(admin)
+    db.commit()
+    return admin
+
+@pytest.fixture
+def auth_headers():
+    def headers(user) -> dict:
+        return {"Authorization": f"Bearer {auth.create_access_token({'sub': user.username})}"}
+    return headers
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from backend import config, crud, models, schemas
+
+def place(db, user, medicine, quantity, order_data):
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=quantity))
+    order, _ = crud.create_order(db, user.id, order_data)
+    return order
+
+def test_rollups_follow_the_watermark(db, user, make_medicine, order_data):
+    medicine = make_medicine("Dolo 650", price=100)
+    first = place(db, user, medicine, 1, order_data)
+    result = crud.apply_order_rollups(db)
+    assert (result["processed"], result["changed"]) == (1, 1)
+
+    # Re-reading orders inside the overlap window counts nothing twice
+    assert crud.apply_order_rollups(db)["changed"] == 0
+
+    place(db, user, medicine, 2, order_data)
+    crud.update_order_status(db, first.id, models.OrderStatus.CANCELLED)
+    result = crud.apply_order_rollups(db)
+    assert result["changed"] == 2 and result["watermark"] >= first.created_at
+
+    summary = crud.get_analytics_summary(db, days=1)
+    assert (summary["totals"]["orders"], summary["totals"]["cancelled"]) == (2, 1)
+    # Units of the cancelled order no longer count
+    assert summary["top_medicines"][0]["units"] == 2
+
+def test_orders_are_bucketed_by_local_hour(db, user, make_medicine, order_data):
+    order = place(db, user, make_medicine("Dolo 650"), 1, order_data)
+    order.created_at = datetime(2026, 3, 31, 18, 40)  # 00:10 on 1 April in IST
+    db.commit()
+    crud.apply_order_rollups(db)
+
+    local = datetime(2026, 3, 31, 18, 40) + timedelta(minutes=config.LOCAL_UTC_OFFSET_MINUTES)
+    hour, = db.query(models.SalesRollupHourly.hour).all()
+    day, = db.query(models.SalesRollupDaily.day).all()
+    assert hour[0] == local.replace(minute=0)
+    assert str(day[0]) == str(local.date())
@@ -0,0 +1,38 @@
+import pytest
+from pydantic import ValidationError
+
+from backend import crud, models, schemas
+
+def op(op, medicine_id, **fields):
+    return schemas.CartOperation(op=op, medicine_id=medicine_id, **fields)
+
+def test_batch_operations_upsert_one_line_per_medicine(db, user, make_medicine):
+    first, second = make_medicine("Dolo 650", price=30), make_medicine("Cetzine", price=20)
+    cart = crud.apply_cart_operations(db, user.id, [
+        op("add", first.id, quantity=2), op("add", first.id, quantity=1),
+        op("add", second.id), op("set", second.id, quantity=4), op("remove", 9999)
+    ])
+    assert {item.medicine_id: item.quantity for item in cart["items"]} == {first.id: 3, second.id: 4}
+    assert cart["total_amount"] == 170.0
+
+def test_batch_with_unknown_medicine_changes_nothing(db, user, make_medicine):
+    medicine = make_medicine("Dolo 650")
+    assert crud.apply_cart_operations(db, user.id, [op("add", medicine.id), op("set", 9999, quantity=1)]) is None
+    assert crud.get_cart_quantities(db, user.id) == {}
+
+@pytest.mark.parametrize("quantity", [0, -2])
+def test_non_positive_quantities_are_rejected(quantity):
+    with pytest.raises(ValidationError):
+        op("add", 1, quantity=quantity)
+
+def test_cached_summary_follows_writes_from_other_workers(db, user, make_medicine):
+    medicine = make_medicine("Dolo 650", price=30)
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=1))
+    assert crud.get_cart_summary(db, user.id)["total_amount"] == 30.0
+
+    # A write made through another worker leaves this worker's cache alone
+    # but bumps the cart version in the database
+    db.query(models.CartItem).filter(models.CartItem.user_id == user.id).update({models.CartItem.quantity: 3})
+    crud.bump_cart_version(db, user.id)
+    db.commit()
+    assert crud.get_cart_summary(db, user.id)["total_amount"] == 90.0
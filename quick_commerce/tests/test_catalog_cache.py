@@ -0,0 +1,44 @@
+from backend import cache
+
+def workers(tmp_path, count=2):
+    path = str(tmp_path / "catalog.signal")
+    return [cache.CatalogCache(signal_path=path) for _ in range(count)]
+
+def fill(worker):
+    for medicine_id in (1, 2):
+        worker.set(f"medicine:{medicine_id}", b"{}", {f"medicine:{medicine_id}", "medicines"}, worker.generation)
+    worker.set("categories", b"[]", {"categories"}, worker.generation)
+
+def cached(worker):
+    return sorted(key for key in ("medicine:1", "medicine:2", "categories") if worker.get(key) is not None)
+
+def test_other_workers_evict_only_the_tags_a_write_names(tmp_path):
+    writer, reader = workers(tmp_path)
+    writer.invalidate({"categories"})  # creates the log before the reader fills
+    reader.get("categories")
+    fill(reader)
+
+    writer.invalidate({"medicine:1"})
+    writer.invalidate({"medicine:1"})
+    assert cached(reader) == ["categories", "medicine:2"]
+
+    writer.clear()
+    assert cached(reader) == []
+
+def test_replaced_log_clears_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CATALOG_CACHE_SIGNAL_MAX_BYTES", 200)
+    writer, reader = workers(tmp_path)
+    writer.invalidate({"categories"})
+    reader.get("categories")
+    fill(reader)
+
+    for _ in range(10):
+        writer.invalidate({"medicine:9"})
+    assert cached(reader) == []
+
+    # The writer keeps its own entries, and the new log is followed as before
+    fill(writer)
+    fill(reader)
+    writer.invalidate({"medicine:2"})
+    assert cached(reader) == ["categories", "medicine:1"]
+    assert cached(writer) == ["categories", "medicine:1"]
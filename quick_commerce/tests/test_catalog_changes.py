@@ -0,0 +1,30 @@
+from backend import crud, schemas
+
+def test_change_feed_pages_from_a_cursor(db, client, make_medicine):
+    first, second, third = (make_medicine(name) for name in ("Dolo 650", "Crocin", "Calpol"))
+    page = client.get("/medicines/changes", params={"since": 0, "limit": 2}).json()
+    assert [row["id"] for row in page["upserts"]] == [first.id, second.id]
+    assert page["has_more"] is True
+
+    rest = client.get("/medicines/changes", params={"since": page["next_since"]}).json()
+    assert [row["id"] for row in rest["upserts"]] == [third.id]
+    assert rest["has_more"] is False
+    cursor = rest["next_since"]
+
+    idle = client.get("/medicines/changes", params={"since": cursor}).json()
+    assert (idle["next_since"], idle["upserts"], idle["deleted"]) == (cursor, [], [])
+
+def test_change_feed_reports_latest_state_and_deletions_once(db, make_medicine):
+    first, second = make_medicine("Dolo 650"), make_medicine("Crocin")
+    cursor = crud.get_medicine_changes(db)["next_since"]
+
+    crud.update_medicine_stock(db, first.id, schemas.StockUpdate(stock_quantity=5))
+    crud.update_medicine_stock(db, first.id, schemas.StockUpdate(stock_quantity=7))
+    crud.delete_medicine(db, second.id)
+
+    changes = crud.get_medicine_changes(db, since=cursor)
+    assert [(row.id, row.stock_quantity) for row in changes["upserts"]] == [(first.id, 7)]
+    assert changes["deleted"] == [second.id]
+    # The log keeps one entry per medicine, so a fresh client sees only
+    # the surviving row
+    assert [row.id for row in crud.get_medicine_changes(db)["upserts"]] == [first.id]
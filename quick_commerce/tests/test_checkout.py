@@ -0,0 +1,66 @@
+import pytest
+
+from backend import crud, models, schemas
+
+@pytest.fixture
+def prescription(db, user):
+    return crud.create_prescription(db, user.id, schemas.PrescriptionCreate(), "uploads/rx.jpg")
+
+def add(db, user, medicine, quantity, prescription=None):
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(
+        medicine_id=medicine.id, quantity=quantity, prescription_id=prescription.id if prescription else None
+    ))
+
+def verify(db, prescription, medicines=None):
+    crud.verify_prescription(db, prescription.id, schemas.PrescriptionVerification(
+        is_verified=True, medicines=medicines
+    ), verified_by=prescription.user_id)
+
+def test_order_without_prescription_is_rejected_and_changes_nothing(db, user, make_medicine, order_data):
+    medicine = make_medicine("Amoxicillin 500", prescription_required=True)
+    add(db, user, medicine, 2)
+
+    with pytest.raises(crud.CartPrescriptionError) as error:
+        crud.create_order(db, user.id, order_data)
+
+    assert [issue["reason"] for issue in error.value.issues] == ["prescription_missing"]
+    assert db.query(models.Order).count() == 0
+    assert crud.get_cart_quantities(db, user.id) == {medicine.id: 2}
+    assert crud.get_medicine(db, medicine.id).stock_quantity == 100
+
+def test_emergency_delivery_enforces_prescriptions(db, user, make_medicine, prescription):
+    medicine = make_medicine("Amoxicillin 500", prescription_required=True)
+    add(db, user, medicine, 1, prescription)  # attached but not verified
+
+    with pytest.raises(crud.CartPrescriptionError) as error:
+        crud.create_emergency_delivery(db, user.id, schemas.EmergencyDelivery(
+            medicine_ids=[medicine.id], delivery_address="12 MG Road", delivery_city="Bengaluru",
+            delivery_pincode="560001", urgency_level="high"
+        ))
+
+    assert [issue["reason"] for issue in error.value.issues] == ["prescription_not_verified"]
+    assert db.query(models.Order).count() == 0
+
+def test_itemised_prescription_limits_quantity_across_orders(db, user, make_medicine, prescription, order_data):
+    medicine = make_medicine("Amoxicillin 500", prescription_required=True)
+    verify(db, prescription, [schemas.PrescribedMedicine(medicine_id=medicine.id, quantity=3)])
+
+    add(db, user, medicine, 2, prescription)
+    order, _ = crud.create_order(db, user.id, order_data)
+    assert order is not None and crud.get_cart_quantities(db, user.id) == {}
+
+    # One unit left on the prescription
+    add(db, user, medicine, 2, prescription)
+    with pytest.raises(crud.CartPrescriptionError) as error:
+        crud.create_order(db, user.id, order_data)
+    issue, = error.value.issues
+    assert (issue["reason"], issue["allowed_quantity"]) == ("quantity_exceeds_prescription", 1)
+
+def test_over_the_counter_cart_needs_no_prescription(db, user, make_medicine, order_data):
+    medicine = make_medicine("Paracetamol 650")
+    add(db, user, medicine, 2)
+
+    order, _ = crud.create_order(db, user.id, order_data)
+
+    assert order.items[0].quantity == 2
+    assert crud.get_medicine(db, medicine.id).stock_quantity == 98
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from backend import crud, expiry, ledger, schemas
+
+def test_sweep_retires_expired_stock_and_writes_it_off(db, make_medicine):
+    now = datetime.utcnow()
+    fresh = make_medicine("Dolo 650", stock=10, expiry_date=now + timedelta(days=90))
+    expiring = make_medicine("Crocin", stock=6, expiry_date=now + timedelta(days=2))
+    already_expired = make_medicine("Calpol", stock=4, expiry_date=now - timedelta(days=1))
+    # Writers retire the rows they touch, so this one never became available
+    assert (already_expired.is_available, already_expired.stock_quantity) == (False, 0)
+    cursor = crud.get_medicine_changes(db)["next_since"]
+
+    assert crud.sweep_expired_medicines(db, now + timedelta(days=3)) == [expiring.id]
+    assert crud.sweep_expired_medicines(db, now + timedelta(days=3)) == []
+
+    db.expire_all()
+    expiring = crud.get_medicine(db, expiring.id)
+    assert (expiring.is_available, expiring.stock_quantity) == (False, 0)
+    assert crud.get_medicine(db, fresh.id).is_available is True
+    assert [row.id for row in crud.get_medicine_changes(db, since=cursor)["upserts"]] == [expiring.id]
+    assert ledger.verify(db) == {}
+
+def test_restocking_expired_stock_does_not_make_it_available(db, make_medicine):
+    medicine = make_medicine("Crocin", stock=6, expiry_date=datetime.utcnow() - timedelta(days=1))
+    medicine = crud.update_medicine_stock(db, medicine.id, schemas.StockUpdate(stock_quantity=20))
+    assert (medicine.is_available, medicine.stock_quantity) == (False, 0)
+
+def test_sweep_summary_counts_near_expiry_stock(db, make_medicine):
+    now = datetime.utcnow()
+    make_medicine("Dolo 650", expiry_date=now + timedelta(days=expiry.NEAR_EXPIRY_DAYS - 1))
+    make_medicine("Crocin", expiry_date=now + timedelta(days=expiry.NEAR_EXPIRY_DAYS + 30))
+    summary = expiry.sweep(now)
+    assert (summary["retired"], summary["expiring_soon"]) == (0, 1)
+    assert expiry.last_sweep is summary
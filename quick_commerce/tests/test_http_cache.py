@@ -0,0 +1,47 @@
+from backend import crud, schemas
+
+def test_catalog_reads_answer_304_until_the_catalog_changes(db, client, make_medicine):
+    medicine = make_medicine("Dolo 650")
+    for path in ("/medicines", f"/medicines/{medicine.id}"):
+        response = client.get(path)
+        etag = response.headers["ETag"]
+        assert response.status_code == 200 and response.headers["Last-Modified"]
+
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert (cached.status_code, cached.content, cached.headers["ETag"]) == (304, b"", etag)
+        assert client.get(path, headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+        crud.update_medicine_stock(db, medicine.id, schemas.StockUpdate(stock_quantity=5 + len(path)))
+        changed = client.get(path, headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+def test_order_list_etag_follows_new_orders(db, client, user, make_medicine, order_data, auth_headers):
+    medicine = make_medicine("Dolo 650")
+    headers = auth_headers(user)
+    etag = client.get("/orders", headers=headers).headers["ETag"]
+    assert client.get("/orders", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=1))
+    crud.create_order(db, user.id, order_data)
+    response = client.get("/orders", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()) == 1
+
+def test_medicine_update_with_a_stale_if_match_is_refused(db, client, admin, auth_headers, make_medicine):
+    medicine = make_medicine("Dolo 650")
+    path = f"/medicines/{medicine.id}"
+    headers = auth_headers(admin)
+    etag = client.get(path).headers["ETag"]
+
+    updated = client.put(path, json={"price": 35.0}, headers={**headers, "If-Match": etag})
+    assert updated.status_code == 200 and updated.json()["price"] == 35.0
+    assert updated.headers["ETag"] not in (etag, None)
+
+    stale = client.put(path, json={"price": 40.0}, headers={**headers, "If-Match": etag})
+    assert stale.status_code == 412
+    db.expire_all()
+    assert crud.get_medicine(db, medicine.id).price == 35.0
+
+    stock = client.patch(
+        f"{path}/stock", json={"stock_quantity": 7}, headers={**headers, "If-Match": updated.headers["ETag"]}
+    )
+    assert stock.status_code == 200 and stock.json()["stock_quantity"] == 7
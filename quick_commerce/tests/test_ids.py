@@ -0,0 +1,45 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from backend import ids
+
+def test_ids_are_unique_and_ordered_across_threads():
+    generator = ids.SnowflakeGenerator(worker_id=7)
+    issued = [[] for _ in range(4)]
+
+    def issue(out):
+        for _ in range(5000):
+            out.append(generator.next_id())
+
+    threads = [threading.Thread(target=issue, args=(out,)) for out in issued]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    everything = [value for out in issued for value in out]
+    assert len(set(everything)) == len(everything)
+    assert all(out == sorted(out) for out in issued)
+    assert {value >> ids.SEQUENCE_BITS & (ids.MAX_WORKERS - 1) for value in everything} == {7}
+
+def test_workers_never_collide_within_a_millisecond(monkeypatch):
+    monkeypatch.setattr(ids, "_now_ms", lambda: 1_800_000_000_000)
+    first, second = ids.SnowflakeGenerator(worker_id=1), ids.SnowflakeGenerator(worker_id=2)
+    issued = [generator.next_id() for _ in range(100) for generator in (first, second)]
+    assert len(set(issued)) == len(issued)
+
+def test_clock_stepping_back_keeps_ids_increasing(monkeypatch):
+    clock = [1_800_000_000_000]
+    monkeypatch.setattr(ids, "_now_ms", lambda: clock[0])
+    generator = ids.SnowflakeGenerator(worker_id=1)
+    before = [generator.next_id() for _ in range(ids.MAX_SEQUENCE + 2)]  # overflows into the next ms
+    clock[0] -= 5000
+    after = [generator.next_id() for _ in range(10)]
+    assert before + after == sorted(set(before + after))
+
+def test_order_numbers_sort_like_their_ids():
+    numbers = [ids.next_order_number() for _ in range(1000)]
+    assert numbers == sorted(numbers) and len(set(numbers)) == len(numbers)
+    value = ids.next_id()
+    assert abs(ids.timestamp_of(value) - datetime.now(timezone.utc)) < timedelta(seconds=5)
+    assert ids.encode(value) > numbers[-1][len("ORD-"):]
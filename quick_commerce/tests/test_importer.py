@@ -0,0 +1,42 @@
+import asyncio
+
+from backend import importer, models
+
+async def _chunks(text, size=7):
+    # Small chunks so rows and quoted fields straddle chunk boundaries
+    data = text.encode()
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+def run_import(db, text, fmt="csv", **kwargs):
+    return asyncio.run(importer.import_medicines(db, _chunks(text), fmt, **kwargs))
+
+def test_bad_rows_are_reported_and_the_rest_imported(db, category):
+    report = run_import(db, "\n".join([
+        "name,category,category_id,price,stock_quantity",
+        f'"Dolo 650, strip",Pain relief,,30,10',
+        "Cetzine,,,not-a-price,5",
+        "Avil,Antihistamines,,12,5",
+        f"Crocin,,{category.id + 100},25,5",
+        '"Unterminated,Pain relief,,1,1'
+    ]))
+    assert report["rows_processed"] == 5
+    assert report["inserted"] == 1 and report["failed"] == 4
+    errors = {error["row"]: error["error"] for error in report["errors"]}
+    assert errors[2].startswith("price:")
+    assert errors[3] == "Unknown category: 'Antihistamines'"
+    assert errors[4] == f"Unknown category_id: {category.id + 100}"
+    assert errors[5].startswith("Malformed row")
+    assert [medicine.name for medicine in db.query(models.Medicine)] == ["Dolo 650, strip"]
+
+def test_rows_are_matched_on_the_natural_key(db, category):
+    rows = "\n".join([
+        f'{{"name": "Dolo 650", "strength": "650mg", "category_id": {category.id}, "price": 30, "stock_quantity": 10}}',
+        "[1, 2]",
+        f'{{"name": "Dolo 650", "strength": "650mg", "category_id": {category.id}, "price": 32, "stock_quantity": 0}}'
+    ])
+    first = run_import(db, rows, "ndjson", batch_size=1)
+    assert (first["inserted"], first["updated"], first["failed"]) == (1, 1, 1)
+    medicine = db.query(models.Medicine).one()
+    db.refresh(medicine)
+    assert (medicine.price, medicine.stock_quantity, medicine.is_available) == (32, 0, False)
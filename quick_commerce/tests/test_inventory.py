@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from backend import crud, inventory, ledger, schemas
+
+def entries(*pairs):
+    return [schemas.StockSyncEntry(medicine_id=medicine_id, quantity=quantity) for medicine_id, quantity in pairs]
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buffer = inventory.StockSyncBuffer()
+    monkeypatch.setattr(inventory, "stock_sync_buffer", buffer)
+    return buffer
+
+def test_failed_flush_keeps_entries_for_the_next_flush(db, make_medicine, buffer, monkeypatch):
+    first, second = make_medicine("Dolo 650", stock=10), make_medicine("Cetzine", stock=10)
+    buffer.add(entries((first.id, 5), (second.id, -3)), "delta")
+
+    def locked(db, pending):
+        raise OperationalError("UPDATE medicines", {}, Exception("database is locked"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(crud, "apply_stock_sync", locked)
+        with pytest.raises(OperationalError):
+            inventory.flush_stock_sync_buffer()
+
+    # Entries that arrive before the retry land on top of the restored batch
+    buffer.add(entries((first.id, 2)), "delta")
+    buffer.add(entries((second.id, 40)), "absolute")
+    assert inventory.flush_stock_sync_buffer() == {"applied": 2, "not_found": []}
+
+    db.expire_all()
+    assert crud.get_medicine(db, first.id).stock_quantity == 17
+    assert crud.get_medicine(db, second.id).stock_quantity == 40
+
+def test_restore_keeps_newer_absolute_entries(buffer):
+    buffer.add(entries((1, 20), (2, 5)), "absolute")
+    drained = buffer.drain()
+    buffer.add(entries((1, 50)), "absolute")
+    buffer.add(entries((2, 3)), "delta")
+    buffer.restore(drained)
+    assert buffer.drain() == {1: (50, 0), 2: (5, 3)}
+
+def test_apply_stock_sync_updates_in_one_pass(db, make_medicine):
+    first, second, third = make_medicine("Dolo 650", stock=10), make_medicine("Cetzine", stock=4), make_medicine("Okacet")
+    pending = inventory.coalesce_stock_entries(entries((first.id, 25), (second.id, 0)), "absolute")
+    inventory.coalesce_stock_entries(entries((first.id, -5), (9999, 3)), "delta", pending)
+
+    assert crud.apply_stock_sync(db, pending) == {"applied": 2, "not_found": [9999]}
+
+    db.expire_all()
+    assert crud.get_medicine(db, first.id).stock_quantity == 20
+    emptied = crud.get_medicine(db, second.id)
+    assert (emptied.stock_quantity, emptied.is_available) == (0, False)
+    assert crud.get_medicine(db, third.id).stock_quantity == 100
+    assert ledger.verify(db) == {}
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from backend import crud, jobs, ledger, models, schemas
+
+def place_and_cancel(db, user, medicine, order_data, quantity=4):
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=quantity))
+    order, _ = crud.create_order(db, user.id, order_data)
+    crud.update_order_status(db, order.id, models.OrderStatus.CANCELLED)
+    return order
+
+def test_restock_runs_once_per_cancelled_order(db, user, make_medicine, order_data):
+    medicine = make_medicine("Paracetamol 650", stock=10)
+    order = place_and_cancel(db, user, medicine, order_data)
+    assert crud.get_medicine(db, medicine.id).stock_quantity == 6
+
+    assert crud.restock_cancelled_order(db, order.id) == (None, {medicine.id: 4})
+    # A re-run, as after a worker died between the handler's commit and
+    # finish_job, finds the order already restocked
+    assert crud.restock_cancelled_order(db, order.id) == (None, {})
+
+    db.expire_all()
+    assert crud.get_medicine(db, medicine.id).stock_quantity == 10
+    assert ledger.verify(db) == {}
+
+def test_restock_job_rerun_after_lease_expiry_is_a_no_op(db, user, make_medicine, order_data):
+    medicine = make_medicine("Paracetamol 650", stock=10)
+    order = place_and_cancel(db, user, medicine, order_data)
+    jobs.drain()
+
+    # As if the worker had died after the handler committed but before
+    # finish_job: the job is still running and its lease has expired
+    job = db.query(models.Job).filter(models.Job.kind == "orders.restock_cancelled").one()
+    job.status = models.JobStatus.RUNNING
+    job.run_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert jobs.drain() == 1
+
+    db.expire_all()
+    assert crud.get_medicine(db, medicine.id).stock_quantity == 10
+    assert db.query(models.StockMovement).filter(
+        models.StockMovement.reason == models.StockMovementReason.RESTOCK,
+        models.StockMovement.reference == order.order_number
+    ).count() == 1
+
+def test_enqueue_with_same_dedupe_key_collapses(db):
+    crud.enqueue_job(db, "orders.restock_cancelled", {"order_id": 1}, dedupe_key="restock:1")
+    crud.enqueue_job(db, "orders.restock_cancelled", {"order_id": 1}, dedupe_key="restock:1")
+    db.commit()
+    assert db.query(models.Job).count() == 1
+
+def test_restock_does_not_make_a_withdrawn_medicine_available(db, user, make_medicine, order_data):
+    medicine = make_medicine("Paracetamol 650", stock=4)
+    order = place_and_cancel(db, user, medicine, order_data)
+    assert crud.get_medicine(db, medicine.id).is_available is False
+
+    crud.restock_cancelled_order(db, order.id)
+    db.expire_all()
+    medicine = crud.get_medicine(db, medicine.id)
+    assert (medicine.stock_quantity, medicine.is_available) == (4, False)
@@ -0,0 +1,31 @@
+from backend import crud, ledger, models, schemas
+
+def order(db, user, medicine, quantity, order_data):
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=quantity))
+    placed, _ = crud.create_order(db, user.id, order_data)
+    return placed
+
+def test_replay_matches_the_projection_across_compactions(db, user, make_medicine, order_data):
+    first, second = make_medicine("Dolo 650", stock=20), make_medicine("Cetzine", stock=5)
+    cancelled = order(db, user, first, 4, order_data)
+    assert ledger.compact(db)["medicines"] == 2
+
+    crud.update_order_status(db, cancelled.id, models.OrderStatus.CANCELLED)
+    crud.restock_cancelled_order(db, cancelled.id)
+    order(db, user, second, 2, order_data)
+    crud.update_medicine_stock(db, first.id, schemas.StockUpdate(stock_quantity=15))
+    # A compaction with nothing new writes no snapshot rows
+    ledger.compact(db)
+    assert ledger.compact(db)["medicines"] == 0
+    order(db, user, first, 1, order_data)
+
+    db.expire_all()
+    assert ledger.stock_at(db) == {first.id: 14, second.id: 3}
+    assert ledger.stock_at(db, medicine_ids=[second.id]) == {second.id: 3}
+    assert ledger.verify(db) == {}
+
+    # As of the first order, before any snapshot was taken
+    first_order = db.query(models.StockMovement).filter(
+        models.StockMovement.reason == models.StockMovementReason.ORDER
+    ).order_by(models.StockMovement.id).first()
+    assert ledger.stock_at(db, first_order.created_at)[first.id] == 16
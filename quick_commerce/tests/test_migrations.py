@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, inspect, text
+
+from backend import migrations
+
+def test_fresh_database_applies_every_migration_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    assert migrations.run_migrations(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.run_migrations(engine) == []
+
+def test_duplicate_cart_lines_are_merged_before_the_unique_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    migrations.run_migrations(engine)
+    # Roll back to the pre-migration schema: no unique index, duplicate lines
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_cart_items_user_medicine"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = 1"))
+        conn.execute(text(
+            "INSERT INTO cart_items (user_id, medicine_id, quantity) VALUES (1, 7, 2), (1, 7, 3), (1, 8, 1)"
+        ))
+
+    assert migrations.run_migrations(engine) == [1]
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT medicine_id, quantity FROM cart_items ORDER BY medicine_id")).all()
+    assert [tuple(row) for row in rows] == [(7, 5), (8, 1)]
+    assert "uq_cart_items_user_medicine" in {index["name"] for index in inspect(engine).get_indexes("cart_items")}
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from backend.notifications import Notification, NotificationDispatcher
+
+class ListTransport:
+    def __init__(self):
+        self.batches = []
+
+    def send(self, messages):
+        self.batches.append(messages)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def status(user_id, order_id, value):
+    return Notification(user_id, "order_status", order_id, value, datetime(2026, 1, 1))
+
+def make_dispatcher(**options):
+    transport, clock = ListTransport(), Clock()
+    return NotificationDispatcher(transport, window=2.0, batch_size=2, clock=clock, **options), transport, clock
+
+def test_a_users_updates_coalesce_into_one_message_per_window():
+    dispatcher, transport, clock = make_dispatcher()
+    dispatcher.submit([status(1, 10, "confirmed"), status(1, 11, "confirmed"), status(2, 20, "confirmed")])
+    dispatcher.submit([status(1, 10, "out_for_delivery")])
+    assert dispatcher.flush() == 0
+
+    clock.now += 2.0
+    assert dispatcher.flush() == 2
+    messages = {message.user_id: message for batch in transport.batches for message in batch}
+    assert messages[1].title == "2 updates"
+    # Only the latest status of order 10 survives, after order 11's
+    assert messages[1].body.splitlines() == ["Order 11 is confirmed", "Order 10 is out for delivery"]
+    assert messages[2].title == "Order 20 is confirmed"
+    assert dispatcher.stats()["coalesced"] == 1
+
+def test_messages_go_out_in_batches():
+    dispatcher, transport, clock = make_dispatcher()
+    dispatcher.submit(status(user_id, user_id, "confirmed") for user_id in range(5))
+    clock.now += 2.0
+    assert dispatcher.flush() == 5
+    assert [len(batch) for batch in transport.batches] == [2, 2, 1]
+
+def test_a_user_over_the_rate_limit_keeps_accumulating():
+    dispatcher, transport, clock = make_dispatcher(rate_per_minute=6, burst=1)
+    dispatcher.submit([status(1, 10, "confirmed")])
+    clock.now += 2.0
+    assert dispatcher.flush() == 1
+
+    dispatcher.submit([status(1, 10, "preparing")])
+    clock.now += 2.0
+    assert dispatcher.flush() == 0  # next token in 10s from the first send
+    dispatcher.submit([status(1, 10, "out_for_delivery"), status(1, 11, "confirmed")])
+    clock.now += 8.0
+    assert dispatcher.flush() == 1
+
+    last = transport.batches[-1][0]
+    assert last.body.splitlines() == ["Order 10 is out for delivery", "Order 11 is confirmed"]
+    assert dispatcher.stats()["rate_limited"] == 1
+
+def test_force_flush_ignores_windows_and_limits():
+    dispatcher, transport, clock = make_dispatcher(burst=1)
+    dispatcher.submit([status(1, 10, "confirmed")])
+    assert dispatcher.flush(force=True) == 1
+    assert dispatcher.stats()["pending_users"] == 0
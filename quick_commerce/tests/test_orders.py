@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import crud, models, schemas
+from backend.models import OrderStatus
+
+def make_partner(db, name, phone):
+    partner = models.User(username=name, email=f"{name}@example.com", phone=phone, hashed_password="x",
+                          role=models.UserRole.DELIVERY_PARTNER)
+    db.add(partner)
+    db.commit()
+    return partner
+
+@pytest.fixture
+def place_order(db, user, make_medicine, order_data):
+    medicine = make_medicine("Dolo 650")
+
+    def place(partner=None):
+        crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=1))
+        order, _ = crud.create_order(db, user.id, order_data)
+        if partner:
+            crud.assign_delivery_partner(db, order.id, partner.id)
+        return order
+    return place
+
+def test_partners_only_transition_their_own_orders(db, place_order):
+    mine, theirs = make_partner(db, "ravi", "9000000002"), make_partner(db, "kiran", "9000000003")
+    own, other, unassigned = place_order(mine), place_order(theirs), place_order()
+
+    result = crud.transition_orders(db, {
+        own.id: OrderStatus.CONFIRMED, other.id: OrderStatus.CONFIRMED,
+        unassigned.id: OrderStatus.CANCELLED, 9999: OrderStatus.CONFIRMED
+    }, partner_id=mine.id)
+
+    assert result["applied"] == 1
+    assert [(outcome["outcome"], outcome["status"]) for outcome in result["outcomes"]] == [
+        ("applied", OrderStatus.CONFIRMED), ("forbidden", None), ("forbidden", None), ("not_found", None)
+    ]
+    statuses = dict(db.query(models.Order.id, models.Order.status))
+    assert statuses == {own.id: OrderStatus.CONFIRMED, other.id: OrderStatus.PENDING, unassigned.id: OrderStatus.PENDING}
+
+def test_work_list_merges_active_statuses_by_eta(db, place_order):
+    partner, other = make_partner(db, "ravi", "9000000002"), make_partner(db, "kiran", "9000000003")
+    orders = [place_order(partner) for _ in range(4)]
+    place_order(other)
+    now = datetime.utcnow()
+    for order, minutes, status in zip(orders, (40, 10, 30, 20), (
+        OrderStatus.PENDING, OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.DELIVERED
+    )):
+        order.estimated_delivery_time = now + timedelta(minutes=minutes)
+        order.status = status
+    db.commit()
+
+    work_list = crud.get_delivery_assignments(db, partner.id)
+    assert [row.id for row in work_list] == [orders[1].id, orders[2].id, orders[0].id]
+    assert [row.status for row in work_list] == [OrderStatus.CONFIRMED, OrderStatus.PREPARING, OrderStatus.PENDING]
+    assert work_list[0].item_count == 1
+    assert len(crud.get_delivery_assignments(db, partner.id, limit=2)) == 2
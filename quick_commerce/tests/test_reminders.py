@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from backend import dosing
+from backend.reminders import ReminderScheduler
+
+# 08:00 and 20:00 local (IST) are 02:30 and 14:30 UTC
+TWICE_DAILY = dosing.parse_frequency("1-0-1")
+START = datetime(2026, 1, 1)
+
+def run(scheduler, until, step=timedelta(minutes=1)):
+    fired, now = [], START
+    while now < until:
+        now += step
+        fired.extend(scheduler.tick(now))
+    return fired
+
+def test_courses_fire_at_their_slots_until_they_end():
+    scheduler = ReminderScheduler()
+    scheduler.load([(1, 10, 100, TWICE_DAILY, START + timedelta(days=2))], START)
+    fired = run(scheduler, START + timedelta(days=3))
+    assert [(r.schedule_id, r.user_id, r.medicine_id) for r in fired] == [(1, 10, 100)] * 4
+    assert [r.due_at for r in fired] == [
+        datetime(2026, 1, 1, 2, 30), datetime(2026, 1, 1, 14, 30),
+        datetime(2026, 1, 2, 2, 30), datetime(2026, 1, 2, 14, 30),
+    ]
+    assert scheduler.stats()["active_courses"] == 0
+
+def test_long_courses_cascade_down_the_wheel():
+    # Past the 64 one-day buckets, the course starts on the overflow list
+    scheduler = ReminderScheduler()
+    scheduler.load([(1, 10, 100, dosing.parse_frequency("OD"), START + timedelta(days=90))], START)
+    fired = run(scheduler, START + timedelta(days=91), step=timedelta(hours=1))
+    assert len(fired) == 90
+    assert all(b.due_at - a.due_at == timedelta(days=1) for a, b in zip(fired, fired[1:]))
+
+def test_doses_missed_within_the_grace_period_are_sent_after_a_restart():
+    scheduler = ReminderScheduler(grace_minutes=15)
+    ends = START + timedelta(days=1)
+    scheduler.load([(1, 10, 100, TWICE_DAILY, ends)], datetime(2026, 1, 1, 2, 40))
+    assert [r.due_at for r in scheduler.tick(datetime(2026, 1, 1, 2, 40))] == [datetime(2026, 1, 1, 2, 30)]
+
+    scheduler.load([(1, 10, 100, TWICE_DAILY, ends)], datetime(2026, 1, 1, 2, 50))
+    assert scheduler.tick(datetime(2026, 1, 1, 2, 50)) == []
+
+def test_sync_picks_up_new_and_ended_courses():
+    scheduler = ReminderScheduler()
+    scheduler.load([(1, 10, 100, TWICE_DAILY, START + timedelta(days=5))], START)
+    # Course 1 was stopped early; course 2 was just verified
+    scheduler.sync([(1, 10, 100, TWICE_DAILY, START), (2, 11, 101, TWICE_DAILY, START + timedelta(days=1))])
+    fired = run(scheduler, START + timedelta(days=2))
+    assert [(r.schedule_id, r.due_at.hour) for r in fired] == [(2, 2), (2, 14)]
@@ -0,0 +1,29 @@
+from backend import crud, schemas, search
+
+def alternatives(db, medicine):
+    return [medicine.name for medicine in search.get_alternatives(db, medicine.id)]
+
+def test_unavailable_medicine_gets_same_generic_alternatives(db, make_medicine, monkeypatch):
+    monkeypatch.setattr(search, "equivalence_index", search.EquivalenceIndex())
+    out_of_stock = make_medicine("Crocin 650", stock=0, generic_name="Paracetamol", strength="650 mg",
+                                 dosage_form="Tablet")
+    crud.update_medicine(db, out_of_stock.id, schemas.MedicineUpdate(is_available=False))
+    make_medicine("Dolo 650", price=30, generic_name="paracetamol", strength="650MG", dosage_form="tablet")
+    make_medicine("Calpol 650", price=25, generic_name="Paracetamol", strength="650mg", dosage_form="tablet")
+    make_medicine("Calpol 500", generic_name="Paracetamol", strength="500mg", dosage_form="tablet")
+    make_medicine("Ibuprofen 400", generic_name="Ibuprofen", strength="400mg", dosage_form="tablet")
+
+    # Same generic, strength and form only, cheapest first - not the category
+    assert alternatives(db, out_of_stock) == ["Calpol 650", "Dolo 650"]
+
+def test_medicine_going_unavailable_keeps_its_key(db, make_medicine, monkeypatch):
+    monkeypatch.setattr(search, "equivalence_index", search.EquivalenceIndex())
+    first = make_medicine("Cetzine", generic_name="Cetirizine", strength="10mg", dosage_form="tablet")
+    second = make_medicine("Okacet", generic_name="Cetirizine", strength="10mg", dosage_form="tablet")
+    make_medicine("Allegra", generic_name="Fexofenadine", strength="120mg", dosage_form="tablet")
+    assert alternatives(db, first) == ["Okacet"]
+
+    # Applied from the change log, not a rebuild
+    crud.update_medicine(db, first.id, schemas.MedicineUpdate(is_available=False))
+    assert alternatives(db, first) == ["Okacet"]
+    assert alternatives(db, second) == []
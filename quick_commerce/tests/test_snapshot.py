@@ -0,0 +1,34 @@
+from backend import crud, schemas, snapshot
+
+def rows(snap):
+    return [snap.row(position) for position in range(len(snap))]
+
+def test_snapshot_round_trips_and_follows_changes(db, make_medicine, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "current", None)
+    path = str(tmp_path / "catalog.bin")
+    first = make_medicine("Dolo 650", price=30.5, stock=7)
+    second = make_medicine("Amoxicillin 500", prescription_required=True)
+    written = snapshot.refresh_snapshot(path)
+
+    loaded = snapshot.CatalogSnapshot.load(path)
+    assert (loaded.seq, loaded.catalog_version) == (written.seq, written.catalog_version)
+    assert rows(loaded) == [
+        (first.id, "Dolo 650", 30.5, 7, first.category_id, 0),
+        (second.id, "Amoxicillin 500", 10.0, 100, second.category_id, snapshot.FLAG_PRESCRIPTION_REQUIRED),
+    ]
+    assert snapshot.refresh_snapshot(path) is None
+
+    # Incremental refresh: merged changes equal a fresh build
+    crud.update_medicine(db, first.id, schemas.MedicineUpdate(name="Dolo 650 Forte"))
+    crud.delete_medicine(db, second.id)
+    third = make_medicine("Cetzine")
+    merged = snapshot.refresh_snapshot(path)
+    assert merged.seq > written.seq
+    assert rows(merged) == rows(snapshot.build_snapshot(db)) == rows(snapshot.CatalogSnapshot.load(path))
+    assert [row[0] for row in rows(merged)] == [first.id, third.id]
+
+def test_unreadable_snapshot_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "current", None)
+    path = tmp_path / "catalog.bin"
+    path.write_bytes(b"QCSNAP\x00\x02" + bytes(40))
+    assert snapshot.load_current(str(path)) is None
@@ -0,0 +1,33 @@
+from backend import crud, jobs, models, schemas, stores
+
+def test_store_stock_copy_follows_checkout_and_restock(db, user, make_medicine, order_data, monkeypatch):
+    monkeypatch.setattr(stores, "stock_map", stores.StoreStockMap())
+    medicine = make_medicine("Dolo 650")
+    store = crud.create_store(db, schemas.StoreCreate(
+        name="Indiranagar", address="100 Feet Road", city="Bengaluru", pincode="560038",
+        latitude=12.97, longitude=77.64
+    ))
+    crud.apply_store_stock_sync(db, store.id, {medicine.id: (10, 0)})
+    assert stores.stock_map.stock(db, store.id) == {medicine.id: 10}
+
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=3))
+    order, store_deltas = crud.create_order(db, user.id, order_data, store_id=store.id)
+    assert store_deltas == {medicine.id: -3}
+    stores.stock_map.adjust(store.id, store_deltas)
+    assert stores.stock_map.stock(db, store.id) == crud.get_store_stock(db, store.id) == {medicine.id: 7}
+
+    crud.update_order_status(db, order.id, models.OrderStatus.CANCELLED)
+    jobs.drain()
+    assert stores.stock_map.stock(db, store.id) == crud.get_store_stock(db, store.id) == {medicine.id: 10}
+
+def test_store_that_cannot_cover_the_cart_reserves_nothing(db, user, make_medicine, order_data):
+    medicine = make_medicine("Dolo 650")
+    store = crud.create_store(db, schemas.StoreCreate(
+        name="Indiranagar", address="100 Feet Road", city="Bengaluru", pincode="560038",
+        latitude=12.97, longitude=77.64
+    ))
+    crud.apply_store_stock_sync(db, store.id, {medicine.id: (2, 0)})
+    crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=3))
+
+    assert crud.create_order(db, user.id, order_data, store_id=store.id) == (None, {})
+    assert crud.get_store_stock(db, store.id) == {medicine.id: 2}
@@ -0,0 +1,50 @@
+import array
+
+from backend import crud, schemas, search
+
+def names(prefix, limit=10):
+    return [search.suggest_index.table.payloads[medicine_id][0] for medicine_id in search.suggest_index.suggest(prefix, limit)]
+
+def brute_force(table, prefix, limit):
+    prefix = search.normalize_term(prefix)
+    matches = {medicine_id for term, medicine_id in zip(table.terms, table.ids) if term.startswith(prefix)}
+    return sorted(matches, key=table._rank_key)[:limit]
+
+def test_suggestions_are_ranked_by_units_ordered(db, user, make_medicine, order_data):
+    dolo, crocin, _ = (make_medicine("Dolo 650", generic_name="Paracetamol"), make_medicine("Crocin Advance"),
+                       make_medicine("Calpol", generic_name="Paracetamol"))
+    for medicine, quantity in ((crocin, 3), (dolo, 1)):
+        crud.add_to_cart(db, user.id, schemas.CartItemCreate(medicine_id=medicine.id, quantity=quantity))
+    crud.create_order(db, user.id, order_data)
+
+    search.suggest_index.ensure_current(db)
+    # Word and generic-name matches count; ties fall back to the name
+    assert names("c") == ["Crocin Advance", "Calpol"]
+    assert names("para") == ["Dolo 650", "Calpol"]
+    assert names("adv") == ["Crocin Advance"]
+    assert names("  PARA ", limit=1) == ["Dolo 650"]
+    assert names("") == names("zz") == []
+
+def test_catch_up_publishes_the_same_index_as_a_rebuild(db, make_medicine, monkeypatch):
+    # Every prefix goes through the memoized path
+    monkeypatch.setattr(search, "SUGGEST_SCAN_LIMIT", 2)
+    medicines = [make_medicine(f"Para {index}", generic_name="Paracetamol") for index in range(8)]
+    search.suggest_index.ensure_current(db)
+    before = search.suggest_index.table
+    assert len(search.suggest_index) == 8 and brute_force(before, "p", 20) == before.suggest("p", 20)
+
+    crud.update_medicine(db, medicines[0].id, schemas.MedicineUpdate(name="Zeta"))
+    crud.delete_medicine(db, medicines[1].id)
+    make_medicine("Pan 40", generic_name="Pantoprazole")
+    # Requests keep reading the published table until the catch-up runs
+    assert names("zeta") == []
+
+    search.suggest_index.ensure_current(db)
+    caught_up = search.suggest_index.table
+    assert caught_up is not before
+    rebuilt = search.SuggestTable.build(crud.iter_suggest_rows(db), {})
+    assert caught_up.terms == rebuilt.terms and caught_up.ids == rebuilt.ids
+    assert isinstance(caught_up.ids, array.array)
+    for prefix in ("p", "pa", "para", "paracetamol", "z", "pan"):
+        assert caught_up.suggest(prefix, 20) == brute_force(rebuilt, prefix, 20)
+    assert names("zeta") == ["Zeta"]